@@ -0,0 +1,83 @@
+"""
+API cold-start import benchmark
+Run with: python -m backend.bench_import_time [--repeat N] [--top N]
+
+Imports backend.main in fresh interpreters, reports the wall time and the
+slowest top-level imports, and exits non-zero if a heavy SDK is loaded at
+import time (those must be imported on first use).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Provider SDKs that only request handlers / workers may import
+HEAVY_MODULES = ("fal_client", "openai", "boto3", "botocore", "rq", "redis", "PIL")
+
+
+def _run(code, *flags):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+
+
+def wall_times(repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _run("import backend.main")
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def slowest_imports(top):
+    """Third-party/stdlib packages by cumulative import time (python -X importtime)"""
+    packages = {}
+    for line in _run("import backend.main", "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if "." in name or name == "backend":
+            continue
+        packages[name] = max(packages.get(name, 0), int(cumulative) / 1e6)
+    return sorted(((s, n) for n, s in packages.items()), reverse=True)[:top]
+
+
+def loaded_heavy_modules():
+    code = (
+        "import sys, backend.main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    out = _run(code).stdout.strip()
+    return [m for m in out.split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    times = wall_times(args.repeat)
+    print(f"import backend.main: median {statistics.median(times):.2f}s, "
+          f"min {min(times):.2f}s over {args.repeat} runs (includes interpreter start)")
+
+    print("\nSlowest packages:")
+    for seconds, name in slowest_imports(args.top):
+        print(f"  {seconds:6.3f}s  {name}")
+
+    heavy = loaded_heavy_modules()
+    if heavy:
+        print(f"\n❌ Loaded at import time: {', '.join(heavy)}")
+        sys.exit(1)
+    print("\n✅ No heavy SDKs loaded at import time")
+
+
+if __name__ == "__main__":
+    main()
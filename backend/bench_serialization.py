@@ -0,0 +1,146 @@
+"""
+API response serialization and compression benchmark
+Run with: python -m backend.bench_serialization [--repeat N] [--tasks N]
+
+Builds realistic payloads through the real response models (a fashion
+blogger with its locations/outfits, a podcaster with animation frames, a
+calendar month of tasks) and reports, per payload:
+- render time with the stdlib JSONResponse vs ORJSONResponse (the default)
+- bytes on the wire raw and gzipped at the levels worth considering
+"""
+import argparse
+import gzip
+import statistics
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from backend.routes.bloggers import BloggerOut
+from backend.routes.tasks import TaskOut
+from backend.utils import storage
+from backend.utils.compression import GZIP_LEVEL
+from backend.utils.storage.local import MemoryBackend
+
+LEVELS = (1, GZIP_LEVEL, 9)
+
+
+def _url(backend, folder, i):
+    return backend.url(f"{folder}/{folder}-3f9c2a71-8d4e-4b6a-9e1f-{i:012d}.jpg")
+
+
+def fashion_blogger(backend) -> dict:
+    locations = [
+        {
+            "id": f"loc_{i}",
+            "title": f"Location {i}",
+            "description": "Sunlit rooftop terrace with potted olive trees, wrought-iron railings and a "
+                           "view over terracotta roofs, golden hour, soft long shadows. " * 2,
+            "prompt": "A person standing on a sunlit rooftop terrace, full height, golden hour lighting",
+            "image_url": _url(backend, "locations", i),
+            "thumbnail": _url(backend, "locations", 1000 + i),
+        }
+        for i in range(20)
+    ]
+    outfits = [
+        {
+            "name": f"Outfit {i}",
+            "image_url": _url(backend, "outfits", i),
+            "parts": {part: _url(backend, "parts", i * 10 + j) for j, part in enumerate(["top", "bottom", "shoes", "accessories"])},
+        }
+        for i in range(15)
+    ]
+    return dict(
+        id=1, name="Alina Fashion", type="fashion", image=_url(backend, "avatars", 1),
+        tone_of_voice="Warm, witty, a little ironic; short sentences, lots of emoji",
+        theme="Everyday street style in Moscow", voice_id=None, content_schedule=None, content_types=None,
+        locations=locations, outfits=outfits, editing_types_enabled=["overlay", "static"], subtitles_enabled=1,
+        face_image=None, face_prompt=None, animation_frames=None,
+    )
+
+
+def podcaster_blogger(backend) -> dict:
+    frames = [
+        {
+            "id": f"frame_1730000000000_{i}",
+            "base_location_id": f"loc_{i % 3}",
+            "prompt": "Same person in the same location and pose, surprised expression with raised eyebrows",
+            "image_url": _url(backend, "frames", i),
+            "emotion": ["Joy", "Neutral", "Thinking", "Surprise", "Concern", "Delight", "Sad", "Angry"][i % 8],
+        }
+        for i in range(24)
+    ]
+    data = fashion_blogger(backend)
+    data.update(id=2, name="Pavel Podcast", type="podcaster", voice_id="21m00Tcm4TlvDq8ikWAM",
+                outfits=None, locations=data["locations"][:6], face_image=_url(backend, "faces", 1),
+                face_prompt="Friendly man in his thirties, short beard, studio light", animation_frames=frames)
+    return data
+
+
+def task_list(backend, n: int) -> list:
+    return [
+        dict(
+            id=i, blogger_id=1, date=f"2024-12-{i % 28 + 1:02d}", content_type=["post", "reel", "podcast"][i % 3],
+            idea="Capsule wardrobe for a rainy week: five pieces, ten looks, one umbrella",
+            status=["DRAFT", "SETUP_READY", "REVIEW", "APPROVED"][i % 4],
+            script="Intro hook. Three quick looks with the same trench coat. Call to action. " * 12,
+            preview_url=_url(backend, "previews", i), main_image_url=_url(backend, "fashion", i),
+        )
+        for i in range(n)
+    ]
+
+
+def payloads(tasks: int) -> dict:
+    backend = MemoryBackend()
+    storage.set_backend(backend)
+    return {
+        "fashion blogger": jsonable_encoder(BloggerOut(**fashion_blogger(backend))),
+        "podcaster blogger": jsonable_encoder(BloggerOut(**podcaster_blogger(backend))),
+        f"task list ({tasks})": jsonable_encoder([TaskOut(**t) for t in task_list(backend, tasks)]),
+    }
+
+
+def _median_ms(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def bench(content, repeat: int) -> dict:
+    body = ORJSONResponse(content).body
+    result = {
+        "json_ms": _median_ms(lambda: JSONResponse(content), repeat),
+        "orjson_ms": _median_ms(lambda: ORJSONResponse(content), repeat),
+        "raw_bytes": len(body),
+    }
+    for level in LEVELS:
+        result[f"gzip{level}_bytes"] = len(gzip.compress(body, compresslevel=level))
+        result[f"gzip{level}_ms"] = _median_ms(lambda: gzip.compress(body, compresslevel=level), repeat)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=300, help="Tasks in the list payload")
+    args = parser.parse_args()
+
+    for name, content in payloads(args.tasks).items():
+        r = bench(content, args.repeat)
+        print(f"{name}:")
+        print(f"  render     json {r['json_ms']:7.3f} ms   orjson {r['orjson_ms']:7.3f} ms   "
+              f"({r['json_ms'] / r['orjson_ms']:.1f}x)")
+        print(f"  raw        {r['raw_bytes']:>9,} bytes")
+        for level in LEVELS:
+            size = r[f"gzip{level}_bytes"]
+            print(f"  gzip -{level}    {size:>9,} bytes ({size / r['raw_bytes']:.0%})  {r[f'gzip{level}_ms']:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Shared pytest fixtures.
+
+Module globals (worker engines, provider calls, app dependency overrides)
+are only ever patched through monkeypatch, so every test starts from the
+real modules and nothing leaks into the next test.
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Before backend.utils.storage reads it
+os.environ.setdefault("STORAGE_SIGNING_SECRET", "test-signing-secret")
+
+from backend.db import models
+from backend.utils import governor, storage
+from backend.utils.storage.local import MemoryBackend
+
+
+@pytest.fixture
+def engine():
+    """Fresh in-memory database with every table created"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def use_engine(engine, monkeypatch):
+    """Point the `engine` global of the given modules at the test database: use_engine(video_worker, dedup)"""
+    def apply(*modules):
+        for module in modules:
+            monkeypatch.setattr(module, "engine", engine)
+    return apply
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    """TestClient for the app, with get_db bound to the test database"""
+    from fastapi.testclient import TestClient
+    from backend.db.connection import get_db
+    from backend.main import app
+
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    return TestClient(app)
+
+
+@pytest.fixture
+def memory_storage():
+    """In-memory storage backend for the duration of the test"""
+    backend = MemoryBackend()
+    storage.set_backend(backend)
+    yield backend
+    storage.set_backend(None)
+
+
+@pytest.fixture
+def memory_limiter():
+    """Per-process governor limiter, so tests don't need Redis"""
+    governor.set_limiter(governor.MemoryLimiter())
+    yield
+    governor.set_limiter(None)
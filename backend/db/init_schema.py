@@ -0,0 +1,17 @@
+"""
+Create missing tables: python -m backend.db.init_schema
+
+A deploy step rather than part of API startup, so instances waking from
+sleep don't pay for it. Column changes go in migrations/*.sql.
+"""
+from .connection import engine
+from .models import Base
+
+
+def init_schema():
+    Base.metadata.create_all(bind=engine)
+
+
+if __name__ == "__main__":
+    init_schema()
+    print("✅ Schema up to date")
@@ -1,5 +1,7 @@
+from datetime import datetime
+
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, Text, Date, JSON, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, JSON, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
@@ -54,7 +56,11 @@ class ContentTask(Base):
     outfit = Column(JSON)  # {"top": "url", "bottom": "url", "shoes": "url", "socks": "url", "accessories": "url"} or text descriptions
     main_image_url = Column(String(1024))  # Confirmed main frame URL
     prompts = Column(JSON)  # {"main": "...", "angle1": "...", "angle2": "...", "angle3": "..."}
-    generated_images = Column(JSON)  # {"main": ["url1", "url2"], "angle1": ["url1"], ...} - history of generations
+    # {"main": ["url1", "url2"], "angle1": ["url1"], ...} - latest generations per slot;
+    # the full history is in generated_assets (see workers/asset_worker.py)
+    generated_images = Column(JSON)
+    generation_checkpoint = Column(JSON)  # {"inputs": "<fingerprint>", "stages": ["main", ...]}, see workers/fashion_worker.py
+    job_id = Column(String(64))  # Latest generation job (RQ id), see utils/queue.py
 
     blogger = relationship("Blogger", back_populates="tasks")
 
@@ -74,4 +80,55 @@ class TaskVersion(Base):
     id = Column(Integer, primary_key=True)
     task_id = Column(Integer, ForeignKey("content_tasks.id"), nullable=False, index=True)
     kind = Column(String(50), default="script")
-    content = Column(Text)
+    content = Column(Text)  # Full text - set on snapshots only
+    # Delta against the previous version of the same task/kind (see utils/versioning.py)
+    delta = Column(Text)
+    depth = Column(Integer, default=0)  # Deltas since the last snapshot
+    size = Column(Integer)  # Length of the full text
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (Index("ix_task_versions_task_kind_id", "task_id", "kind", "id"),)
+
+
+class PendingMirror(Base):
+    """FAL result stored on a task but not yet copied to S3 (see workers/mirror_worker.py)"""
+    __tablename__ = "pending_mirrors"
+
+    id = Column(Integer, primary_key=True)
+    # Not a foreign key: a task may be deleted while its mirror is pending
+    task_id = Column(Integer, nullable=False, index=True)
+    fal_url = Column(Text, nullable=False)
+    s3_key = Column(String(1024), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+
+
+class GeneratedAsset(Base):
+    """One generated image/audio/video URL; append-only history (see workers/asset_worker.py)"""
+    __tablename__ = "generated_assets"
+
+    id = Column(Integer, primary_key=True)
+    # Not a foreign key: assets of a deleted task are removed by retention
+    task_id = Column(Integer, nullable=False)
+    slot = Column(String(50), nullable=False)  # "main", "angle1", "audio", ...
+    url = Column(Text, nullable=False)
+    source_url = Column(Text)  # FAL URL the mirrored copy in `url` was made from
+    size = Column(BigInteger)  # Known once the object is in our storage
+    seed = Column(BigInteger)
+    prompt_hash = Column(String(16))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    pruned_at = Column(DateTime)  # Object deleted by retention
+
+    __table_args__ = (Index("ix_generated_assets_task_slot", "task_id", "slot"),)
+
+
+class StoredObject(Base):
+    """Content hash -> object key, so identical uploads are skipped (see utils/storage/dedup.py)"""
+    __tablename__ = "stored_objects"
+
+    sha256 = Column(String(64), primary_key=True)
+    key = Column(String(1024), nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(255))
+    created_at = Column(DateTime, default=datetime.utcnow)
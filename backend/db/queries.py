@@ -0,0 +1,57 @@
+"""
+Per-use-case task loaders.
+
+Each loader fetches, in one statement, exactly the task columns its caller
+touches, so handlers never trigger lazy loads (N+1) or pull the large JSON
+columns they don't need. Blogger fields come from utils/blogger_cache, not
+from joins here. Statement budgets per endpoint are enforced by
+backend/test_query_counts.py.
+"""
+from typing import Optional
+
+from sqlalchemy.orm import Query, Session, load_only
+
+from . import models
+
+Task = models.ContentTask
+
+# Columns serialized by TaskOut (no outfit/prompts/generated_images JSON)
+TASK_LIST_COLUMNS = (
+    Task.id, Task.blogger_id, Task.date, Task.content_type, Task.idea,
+    Task.status, Task.script, Task.preview_url, Task.main_image_url,
+)
+
+
+def task_list_query(db: Session) -> Query:
+    """Task rows for list views, limited to TaskOut columns"""
+    return db.query(Task).options(load_only(*TASK_LIST_COLUMNS))
+
+
+def task_for_dispatch(db: Session, task_id: int) -> Optional[models.ContentTask]:
+    """Task fields trigger_generation routes on"""
+    return (
+        db.query(Task)
+        .options(load_only(Task.id, Task.blogger_id, Task.content_type, Task.script, Task.idea, Task.status, Task.job_id))
+        .filter(Task.id == task_id)
+        .first()
+    )
+
+
+def task_for_meta(db: Session, task_id: int) -> Optional[models.ContentTask]:
+    """Task idea/type for meta suggestions"""
+    return (
+        db.query(Task)
+        .options(load_only(Task.id, Task.blogger_id, Task.idea, Task.content_type))
+        .filter(Task.id == task_id)
+        .first()
+    )
+
+
+def task_for_video(db: Session, task_id: int) -> Optional[models.ContentTask]:
+    """Task fields the video worker reads and updates"""
+    return (
+        db.query(Task)
+        .options(load_only(Task.id, Task.blogger_id, Task.idea, Task.preview_url, Task.status))
+        .filter(Task.id == task_id)
+        .first()
+    )
@@ -1,17 +1,24 @@
 import os
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from .routes.bloggers import router as bloggers_router
 from .routes.tasks import router as tasks_router
 from .routes.assistant import router as assistant_router
 from .routes.upload import router as upload_router
+from .routes.generation import router as generation_router
 
-from .db.connection import engine
-from .db.models import Base
+from .db.connection import DATABASE_URL
+from .db.init_schema import init_schema
+from .utils.compression import CompressionMiddleware
+from .utils.executor import ExecutorBusy
+from .utils.governor import RateLimited
+from .utils.storage import is_configured, signing_secret
 
-app = FastAPI(title="AI Blogger Studio API", version="0.1.0")
+# orjson serializes the large blogger/task payloads several times faster
+# (python -m backend.bench_serialization)
+app = FastAPI(title="AI Blogger Studio API", version="0.1.0", default_response_class=ORJSONResponse)
 
 # Basic CORS (adjust in production)
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "*").split(",")
@@ -22,12 +29,42 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip above GZIP_MIN_SIZE bytes, except event streams and media
+app.add_middleware(CompressionMiddleware)
+
+
+# Tables are created by `python -m backend.db.init_schema` at deploy time;
+# local SQLite keeps creating them on startup unless AUTO_CREATE_TABLES=0
+AUTO_CREATE_TABLES = os.getenv("AUTO_CREATE_TABLES", "1" if DATABASE_URL.startswith("sqlite") else "0") == "1"
 
 
 @app.on_event("startup")
 def on_startup():
-    # Ensure tables exist (for MVP); for migrations use Alembic later
-    Base.metadata.create_all(bind=engine)
+    if AUTO_CREATE_TABLES:
+        init_schema()
+    # Fail now rather than with a 403 on every /upload/complete
+    if is_configured():
+        signing_secret()
+
+
+@app.exception_handler(ExecutorBusy)
+def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    # Backpressure: tell clients to retry instead of queueing unbounded work
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Server is busy, try again shortly"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(RateLimited)
+def rate_limited_handler(request: Request, exc: RateLimited):
+    # Rate or budget governor refused paid work (utils/governor.py)
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 @app.get("/health")
@@ -50,3 +87,4 @@ app.include_router(bloggers_router, prefix="/api/bloggers", tags=["bloggers"])
 app.include_router(tasks_router, prefix="/api/tasks", tags=["tasks"])
 app.include_router(assistant_router, prefix="/api/assistant", tags=["assistant"])
 app.include_router(upload_router, prefix="/api/upload", tags=["upload"])
+app.include_router(generation_router, prefix="/api/generation", tags=["generation"])
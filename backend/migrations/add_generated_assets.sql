@@ -0,0 +1,35 @@
+-- Append-only history of generated URLs; content_tasks.generated_images keeps
+-- only the latest per slot (see backend/workers/asset_worker.py)
+-- Run: psql $DATABASE_URL -f migrations/add_generated_assets.sql
+
+CREATE TABLE IF NOT EXISTS generated_assets (
+    id SERIAL PRIMARY KEY,
+    task_id INTEGER NOT NULL,
+    slot VARCHAR(50) NOT NULL,
+    url TEXT NOT NULL,
+    -- FAL URL the asset was mirrored from, so a candidate can still be approved by the URL generation returned
+    source_url TEXT,
+    size BIGINT,
+    seed BIGINT,
+    prompt_hash VARCHAR(16),
+    created_at TIMESTAMP DEFAULT now(),
+    pruned_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_generated_assets_task_slot ON generated_assets (task_id, slot);
+
+-- Tables created before source_url existed
+ALTER TABLE generated_assets ADD COLUMN IF NOT EXISTS source_url TEXT;
+
+-- Backfill from existing histories (tasks that have no rows yet)
+INSERT INTO generated_assets (task_id, slot, url, created_at)
+SELECT t.id, slot.key, url.value, now()
+FROM content_tasks t
+CROSS JOIN LATERAL json_each(
+    CASE WHEN json_typeof(t.generated_images) = 'object' THEN t.generated_images ELSE '{}'::json END
+) AS slot
+-- Scalar slots (audio_url, lipsync_seed) expand to nothing
+CROSS JOIN LATERAL json_array_elements_text(
+    CASE WHEN json_typeof(slot.value) = 'array' THEN slot.value ELSE '[]'::json END
+) AS url
+WHERE NOT EXISTS (SELECT 1 FROM generated_assets a WHERE a.task_id = t.id);
@@ -0,0 +1,15 @@
+-- FAL results waiting to be copied to S3 (see backend/workers/mirror_worker.py)
+-- Run: psql $DATABASE_URL -f migrations/add_pending_mirrors.sql
+
+CREATE TABLE IF NOT EXISTS pending_mirrors (
+    id SERIAL PRIMARY KEY,
+    task_id INTEGER NOT NULL,
+    fal_url TEXT NOT NULL,
+    s3_key VARCHAR(1024) NOT NULL,
+    created_at TIMESTAMP DEFAULT now(),
+    attempts INTEGER DEFAULT 0,
+    last_error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ix_pending_mirrors_task_id ON pending_mirrors (task_id);
+CREATE INDEX IF NOT EXISTS ix_pending_mirrors_created_at ON pending_mirrors (created_at);
@@ -0,0 +1,13 @@
+-- Content-hash index used to skip uploads of bytes that are already stored
+-- (see backend/utils/storage/dedup.py)
+-- Run: psql $DATABASE_URL -f migrations/add_stored_objects.sql
+
+CREATE TABLE IF NOT EXISTS stored_objects (
+    sha256 VARCHAR(64) PRIMARY KEY,
+    key VARCHAR(1024) NOT NULL,
+    size BIGINT NOT NULL,
+    content_type VARCHAR(255),
+    created_at TIMESTAMP DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_stored_objects_key ON stored_objects (key);
@@ -0,0 +1,4 @@
+-- Resume checkpoint of staged generation jobs (see backend/workers/fashion_worker.py)
+-- Run: psql $DATABASE_URL -f migrations/add_task_generation_checkpoint.sql
+
+ALTER TABLE content_tasks ADD COLUMN IF NOT EXISTS generation_checkpoint JSON;
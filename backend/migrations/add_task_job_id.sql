@@ -0,0 +1,4 @@
+-- Latest generation job of a task, used to cancel it and to skip duplicate enqueues
+-- Run: psql $DATABASE_URL -f migrations/add_task_job_id.sql
+
+ALTER TABLE content_tasks ADD COLUMN IF NOT EXISTS job_id VARCHAR(64);
@@ -0,0 +1,16 @@
+-- Delta-compressed task version history
+-- Run: psql $DATABASE_URL -f migrations/add_task_version_deltas.sql
+
+ALTER TABLE task_versions ADD COLUMN IF NOT EXISTS delta TEXT;
+ALTER TABLE task_versions ADD COLUMN IF NOT EXISTS depth INTEGER DEFAULT 0;
+ALTER TABLE task_versions ADD COLUMN IF NOT EXISTS size INTEGER;
+ALTER TABLE task_versions ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
+
+-- Existing rows hold full content, i.e. they are all snapshots
+UPDATE task_versions SET depth = 0 WHERE depth IS NULL;
+UPDATE task_versions SET size = length(content) WHERE size IS NULL AND content IS NOT NULL;
+
+-- Listing and chain reconstruction walk versions per task/kind by id
+CREATE INDEX IF NOT EXISTS ix_task_versions_task_kind_id ON task_versions (task_id, kind, id);
+
+COMMENT ON COLUMN task_versions.delta IS 'JSON delta against the previous version of the same task/kind; NULL for full snapshots (content set)';
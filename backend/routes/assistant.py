@@ -1,10 +1,17 @@
 import os
-from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from ..utils.openai_chat import generate_text
-from sqlalchemy.orm import Session
-from ..db.connection import get_db
-from ..db import models
+from ..utils.openai_chat import generate_text, stream_text
+from ..utils.executor import run_blocking
+from ..utils.governor import admit
+from ..utils.sse import sse_event
+from ..utils import versioning
+from ..utils.blogger_cache import get_blogger_context
+from sqlalchemy.orm import Session, load_only
+from ..db.connection import get_db, SessionLocal
+from ..db import models, queries
 
 
 class AssistantRequest(BaseModel):
@@ -16,31 +23,78 @@ router = APIRouter()
 
 
 @router.post("/")
-def assistant(req: AssistantRequest):
-    reply = generate_text(req.message)
+async def assistant(req: AssistantRequest):
+    # Redis round trip - off the event loop like the completion itself
+    await run_blocking(admit, "assistant", None, "openai")
+    reply = await run_blocking(generate_text, req.message)
     return {"reply": reply}
 
 
+@router.post("/stream")
+def assistant_stream(req: AssistantRequest, db: Session = Depends(get_db)):
+    """
+    Same as / but relays tokens over SSE as they arrive.
+    With task_id the final reply is saved as an "assistant" TaskVersion.
+    """
+    if req.task_id is not None and not db.query(models.ContentTask).get(req.task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    admit("assistant", None, "openai")
+
+    def events():
+        parts = []
+        try:
+            for delta in stream_text(req.message):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except Exception as e:
+            # Don't keep a partial reply as a version
+            yield sse_event({"detail": f"Assistant failed: {e}"}, event="error")
+            return
+        reply = "".join(parts).strip()
+
+        version_id = None
+        if req.task_id is not None:
+            # The request's session is already closed once the body streams
+            with SessionLocal() as s:
+                v = versioning.save_version(s, req.task_id, "assistant", reply)
+                s.commit()
+                version_id = v.id
+        yield sse_event({"reply": reply, "version_id": version_id}, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 class MetaGenerateRequest(BaseModel):
     task_id: int
 
 
-@router.post("/meta/generate")
-def generate_meta(req: MetaGenerateRequest, db: Session = Depends(get_db)):
-    task = db.query(models.ContentTask).get(req.task_id)
+def _meta_prompt(db: Session, task_id: int) -> str | None:
+    task = queries.task_for_meta(db, task_id)
     if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    blogger = task.blogger
-    prompt = (
+        return None
+    blogger = get_blogger_context(db, task.blogger_id)
+    return (
         f"Для контента '{task.idea or ''}' под тип '{task.content_type}', "
         f"с учётом тона '{blogger.tone_of_voice or ''}' и темы '{blogger.theme or ''}', предложи: "
         "стиль съёмки, одежду, локацию и погоду. Верни краткий JSON со свойствами style, outfit, location, weather."
     )
-    text = generate_text(prompt)
-    meta = models.TaskMeta(task_id=task.id, data={"suggestion": text})
-    db.add(meta)
+
+
+def _save_meta(db: Session, task_id: int, text: str) -> None:
+    db.add(models.TaskMeta(task_id=task_id, data={"suggestion": text}))
     db.commit()
-    return {"ok": True, "task_id": task.id}
+
+
+@router.post("/meta/generate")
+async def generate_meta(req: MetaGenerateRequest, db: Session = Depends(get_db)):
+    # DB access and the (up to 30s) completion are blocking - run them in the bounded pool
+    prompt = await run_blocking(_meta_prompt, db, req.task_id)
+    if prompt is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    await run_blocking(admit, "assistant_meta", None, "openai")
+    text = await run_blocking(generate_text, prompt)
+    await run_blocking(_save_meta, db, req.task_id, text)
+    return {"ok": True, "task_id": req.task_id}
 
 
 class SaveVersionRequest(BaseModel):
@@ -51,15 +105,54 @@ class SaveVersionRequest(BaseModel):
 
 @router.post("/versions")
 def save_version(req: SaveVersionRequest, db: Session = Depends(get_db)):
-    v = models.TaskVersion(task_id=req.task_id, kind=req.kind, content=req.content)
-    db.add(v)
+    v = versioning.save_version(db, req.task_id, req.kind, req.content)
     db.commit()
     return {"ok": True, "id": v.id}
 
 
+class VersionOut(BaseModel):
+    id: int
+    task_id: int
+    kind: str | None = None
+    size: int | None = None
+    created_at: datetime | None = None
+    is_snapshot: bool
+
+
 @router.get("/versions/{task_id}")
-def list_versions(task_id: int, db: Session = Depends(get_db)):
-    return db.query(models.TaskVersion).filter(models.TaskVersion.task_id == task_id).order_by(models.TaskVersion.id.desc()).all()
+def list_versions(
+    task_id: int,
+    kind: str | None = None,
+    before_id: int | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    Version metadata, newest first, without content.
+    Page with before_id=<next_before_id>; fetch text via /versions/{task_id}/{version_id}.
+    """
+    V = models.TaskVersion
+    # depth is 0 exactly for snapshots - no need to load the delta text
+    q = db.query(V).options(load_only(V.id, V.task_id, V.kind, V.size, V.created_at, V.depth)).filter(V.task_id == task_id)
+    if kind:
+        q = q.filter(V.kind == kind)
+    if before_id is not None:
+        q = q.filter(V.id < before_id)
+    rows = q.order_by(V.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    items = [
+        VersionOut(id=v.id, task_id=v.task_id, kind=v.kind, size=v.size, created_at=v.created_at, is_snapshot=not v.depth)
+        for v in page
+    ]
+    return {"items": items, "next_before_id": page[-1].id if len(rows) > limit else None}
+
+
+@router.get("/versions/{task_id}/{version_id}")
+def get_version(task_id: int, version_id: int, db: Session = Depends(get_db)):
+    v = db.query(models.TaskVersion).filter(models.TaskVersion.id == version_id, models.TaskVersion.task_id == task_id).first()
+    if not v:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return {"id": v.id, "task_id": v.task_id, "kind": v.kind, "created_at": v.created_at, "content": versioning.version_content(db, v)}
 
 
 @router.get("/meta/{task_id}")
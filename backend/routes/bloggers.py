@@ -1,11 +1,23 @@
+import hashlib
+import json
+
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 
 from ..db.connection import get_db
 from ..db import models
 from ..utils.image_generation import generate_fashion_frame
+from ..utils.image_processing import derivative_map
+from ..utils.blogger_cache import get_blogger_context
+from ..utils.governor import RateLimited, admit
+from ..utils.queue import enqueue, job_info
+
+# Dotted path so the API doesn't import the worker module (and its SDKs) to enqueue it
+PROCESS_ANIMATION_FRAMES = "backend.workers.animation_worker.process_animation_frames"
+# Frames per batch request - a podcaster's standard set is about 8
+MAX_FRAME_BATCH = 12
 
 
 class BloggerCreate(BaseModel):
@@ -46,6 +58,19 @@ class BloggerOut(BaseModel):
     face_prompt: Optional[str]
     animation_frames: Optional[list]
 
+    @computed_field
+    @property
+    def derivatives(self) -> Dict[str, Dict[str, str]]:
+        """Pre-sized thumbnails keyed by original URL, for grids and tiles"""
+        urls = [self.image, self.face_image]
+        for loc in self.locations or []:
+            if isinstance(loc, dict):
+                urls += [loc.get("thumbnail"), loc.get("image_url")]
+        for item in (self.outfits or []) + (self.animation_frames or []):
+            if isinstance(item, dict):
+                urls.append(item.get("image_url"))
+        return derivative_map(urls)
+
     class Config:
         from_attributes = True
 
@@ -69,7 +94,7 @@ def create_blogger(payload: BloggerCreate, db: Session = Depends(get_db)):
 
 @router.get("/{blogger_id}", response_model=BloggerOut)
 def get_blogger(blogger_id: int, db: Session = Depends(get_db)):
-    blogger = db.query(models.Blogger).get(blogger_id)
+    blogger = get_blogger_context(db, blogger_id)
     if not blogger:
         raise HTTPException(status_code=404, detail="Blogger not found")
     return blogger
@@ -154,10 +179,12 @@ def delete_location(blogger_id: int, location_index: int, db: Session = Depends(
 @router.post("/{blogger_id}/locations/generate")
 def generate_location(blogger_id: int, payload: LocationGenerate, db: Session = Depends(get_db)):
     """Generate a location image using SDXL 4.0"""
-    blogger = db.query(models.Blogger).get(blogger_id)
+    blogger = get_blogger_context(db, blogger_id)
     if not blogger:
         raise HTTPException(status_code=404, detail="Blogger not found")
     
+    admit("generate_location", blogger_id, "fal_image")
+    
     try:
         # Generate using SDXL via FAL.ai (16:9 for landscape location)
         image_url = generate_fashion_frame(payload.prompt, "16:9")
@@ -166,6 +193,8 @@ def generate_location(blogger_id: int, payload: LocationGenerate, db: Session =
             "image_url": image_url,
             "prompt": payload.prompt
         }
+    except RateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
@@ -223,10 +252,12 @@ def delete_outfit(blogger_id: int, outfit_index: int, db: Session = Depends(get_
 @router.post("/{blogger_id}/outfits/generate")
 def generate_outfit(blogger_id: int, payload: OutfitGenerate, db: Session = Depends(get_db)):
     """Generate a full outfit image using Seedream v4 from parts"""
-    blogger = db.query(models.Blogger).get(blogger_id)
+    blogger = get_blogger_context(db, blogger_id)
     if not blogger:
         raise HTTPException(status_code=404, detail="Blogger not found")
     
+    admit("generate_outfit", blogger_id, "fal_image")
+    
     try:
         # Build prompt based on parts provided
         parts_description = []
@@ -249,6 +280,8 @@ def generate_outfit(blogger_id: int, payload: OutfitGenerate, db: Session = Depe
             "image_url": image_url,
             "prompt": prompt
         }
+    except RateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
@@ -268,6 +301,8 @@ def generate_podcaster_face(blogger_id: int, payload: FaceGenerate, db: Session
     if blogger.type != "podcaster":
         raise HTTPException(status_code=400, detail="This endpoint is only for podcaster bloggers")
     
+    admit("generate_face", blogger_id, "fal_image")
+    
     try:
         # Generate face: 1:1 aspect ratio for square portrait
         # Enhance prompt for high-quality face generation
@@ -284,6 +319,8 @@ def generate_podcaster_face(blogger_id: int, payload: FaceGenerate, db: Session
             "image_url": image_url,
             "prompt": payload.prompt
         }
+    except RateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Face generation failed: {str(e)}")
 
@@ -297,13 +334,15 @@ class LocationWithFaceGenerate(BaseModel):
 @router.post("/{blogger_id}/locations/generate-with-face")
 def generate_podcaster_location(blogger_id: int, payload: LocationWithFaceGenerate, db: Session = Depends(get_db)):
     """Generate location with full body using face as reference (Seedream edit mode)"""
-    blogger = db.query(models.Blogger).get(blogger_id)
+    blogger = get_blogger_context(db, blogger_id)
     if not blogger:
         raise HTTPException(status_code=404, detail="Blogger not found")
     
     if blogger.type != "podcaster":
         raise HTTPException(status_code=400, detail="This endpoint is only for podcaster bloggers")
     
+    admit("generate_location_with_face", blogger_id, "fal_image")
+    
     try:
         print(f"[Location Gen] Blogger: {blogger.name}, Prompt: {payload.prompt}")
         print(f"[Location Gen] Face image: {payload.face_image[:80] if payload.face_image else 'None'}...")
@@ -322,6 +361,8 @@ def generate_podcaster_location(blogger_id: int, payload: LocationWithFaceGenera
             "image_url": image_url,
             "prompt": payload.prompt
         }
+    except RateLimited:
+        raise
     except Exception as e:
         print(f"[Location Gen] ERROR: {str(e)}")
         import traceback
@@ -338,13 +379,15 @@ class FrameGenerate(BaseModel):
 @router.post("/{blogger_id}/frames/generate")
 def generate_animation_frame(blogger_id: int, payload: FrameGenerate, db: Session = Depends(get_db)):
     """Generate animation frame variation from base image"""
-    blogger = db.query(models.Blogger).get(blogger_id)
+    blogger = get_blogger_context(db, blogger_id)
     if not blogger:
         raise HTTPException(status_code=404, detail="Blogger not found")
     
     if blogger.type != "podcaster":
         raise HTTPException(status_code=400, detail="This endpoint is only for podcaster bloggers")
     
+    admit("generate_frame", blogger_id, "fal_image")
+    
     try:
         print(f"[Frame Gen] Blogger: {blogger.name}, Emotion/Prompt: {payload.prompt}")
         print(f"[Frame Gen] Base image: {payload.base_image[:80]}...")
@@ -357,7 +400,8 @@ def generate_animation_frame(blogger_id: int, payload: FrameGenerate, db: Sessio
         image_url = generate_fashion_frame(
             enhanced_prompt,
             "3:4",  # Same aspect ratio as base location
-            reference_image=payload.base_image
+            reference_image=payload.base_image,
+            enhance=False,  # Already enhanced for frames above
         )
         
         print(f"[Frame Gen] Success! URL: {image_url[:80]}...")
@@ -366,9 +410,66 @@ def generate_animation_frame(blogger_id: int, payload: FrameGenerate, db: Sessio
             "image_url": image_url,
             "prompt": payload.prompt
         }
+    except RateLimited:
+        raise
     except Exception as e:
         print(f"[Frame Gen] ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Frame generation failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Frame generation failed: {str(e)}")
+
+
+class FrameSpec(BaseModel):
+    prompt: str
+    emotion: Optional[str] = None
+
+
+class FrameBatchGenerate(BaseModel):
+    base_image: str
+    frames: List[FrameSpec]
+    base_location_id: Optional[str] = None
+
+
+@router.post("/{blogger_id}/frames/generate-batch")
+def generate_animation_frames(blogger_id: int, payload: FrameBatchGenerate, db: Session = Depends(get_db)):
+    """
+    Queue a whole set of animation frames from one base image (see
+    workers/animation_worker.py). The frames are added to the blogger's
+    animation_frames when the job finishes; poll /frames/jobs/{job_id}.
+    """
+    blogger = get_blogger_context(db, blogger_id)
+    if not blogger:
+        raise HTTPException(status_code=404, detail="Blogger not found")
+    
+    if blogger.type != "podcaster":
+        raise HTTPException(status_code=400, detail="This endpoint is only for podcaster bloggers")
+    
+    if not 1 <= len(payload.frames) <= MAX_FRAME_BATCH:
+        raise HTTPException(status_code=400, detail=f"frames must contain 1 to {MAX_FRAME_BATCH} items")
+    
+    admit("generate_frames", blogger_id, "fal_image", len(payload.frames))
+    
+    frames = [frame.model_dump() for frame in payload.frames]
+    # The same set submitted twice (double click) is queued once
+    digest = hashlib.sha256(
+        json.dumps([payload.base_image, payload.base_location_id, frames], sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+    job_id = enqueue(
+        PROCESS_ANIMATION_FRAMES,
+        blogger_id,
+        payload.base_image,
+        frames,
+        payload.base_location_id,
+        idempotency_key=f"blogger:{blogger_id}:frames:{digest}",
+        job_timeout=900,
+    )
+    return {"queued": True, "blogger_id": blogger_id, "job_id": job_id, "frames": len(frames)}
+
+
+@router.get("/{blogger_id}/frames/jobs/{job_id}")
+def animation_frames_job(blogger_id: int, job_id: str):
+    """Status of a frame set job; when finished, result lists the generated and failed frames"""
+    info = job_info(job_id)
+    if info is None or info["func"] != PROCESS_ANIMATION_FRAMES or info["args"][:1] != [blogger_id]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, "status": info["status"], "result": info["result"]}
@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from ..db.connection import get_db
+from ..utils import governor
+from ..utils.blogger_cache import get_blogger_context
+from ..utils.content_plan import plan_calls
+from ..utils.queue import enqueue
+
+# Enqueued by dotted path, like the other worker jobs
+PROCESS_CONTENT_PLAN = "backend.workers.content_plan_worker.process_content_plan"
+
+
+class ContentPlanRequest(BaseModel):
+    blogger_id: int
+    start_date: Optional[str] = None  # YYYY-MM-DD, defaults to tomorrow
+    days: int = 30
+    content_type: Optional[str] = None  # defaults by blogger type
+
+
+router = APIRouter()
+
+
+@router.post("/content-plan")
+def generate_content_plan(payload: ContentPlanRequest, db: Session = Depends(get_db)):
+    """Queue a batched content plan (one idea per day) for a blogger"""
+    blogger = get_blogger_context(db, payload.blogger_id)
+    if not blogger:
+        raise HTTPException(status_code=404, detail="Blogger not found")
+
+    if not 1 <= payload.days <= 62:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 62")
+
+    try:
+        start = date.fromisoformat(payload.start_date) if payload.start_date else date.today() + timedelta(days=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date must be YYYY-MM-DD")
+
+    governor.admit("content_plan", blogger.id, "openai", plan_calls(payload.days))
+    job_id = enqueue(
+        PROCESS_CONTENT_PLAN,
+        blogger.id,
+        start.isoformat(),
+        payload.days,
+        payload.content_type,
+        job_timeout=600,
+    )
+    return {"queued": True, "blogger_id": blogger.id, "start_date": start.isoformat(), "days": payload.days, "job_id": job_id}
+
+
+@router.get("/budget")
+def generation_budget(blogger_id: Optional[int] = None):
+    """Estimated spend today against the daily generation budgets (0 = no limit)"""
+    result = {"spent_usd": round(governor.spent_today(), 4), "limit_usd": governor.DAILY_BUDGET_USD}
+    if blogger_id is not None:
+        result["blogger"] = {
+            "blogger_id": blogger_id,
+            "spent_usd": round(governor.spent_today(blogger_id), 4),
+            "limit_usd": governor.BLOGGER_DAILY_BUDGET_USD,
+        }
+    return result
@@ -1,16 +1,43 @@
+import json
+from collections import defaultdict
+from datetime import date as Date
+from uuid import uuid4
+
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, computed_field, field_validator
+from typing import Dict, List, Literal, Optional
+from sqlalchemy import delete, insert, update
 from sqlalchemy.orm import Session
 
-from ..db.connection import get_db
-from ..db import models
-from ..utils.queue import enqueue
-from ..workers.image_worker import process_image
-from ..workers.video_worker import process_video
-from ..workers.voice_worker import process_voice
-from ..workers.fashion_worker import process_fashion_post
-from ..utils.openai_chat import generate_text
+from ..db.connection import get_db, SessionLocal
+from ..db import models, queries
+from ..utils.queue import ACTIVE_STATUSES, PENDING_STATUSES, cancel_job, job_status
+from ..utils.task_jobs import enqueue_generation, generate_key
+from ..utils.openai_chat import generate_text, stream_text
+from ..utils.sse import sse_event
+from ..utils.image_processing import derivative_map
+from ..utils.blogger_cache import BloggerContext, get_blogger_context
+from ..workers.mirror_worker import enqueue_mirrors, record_mirrors
+from ..workers.asset_worker import current_asset_url, record_asset_rows, record_assets
+from ..utils.governor import RateLimited, admit
+
+# Task lifecycle; PLANNED and SCRIPT_READY are kept for older rows
+TaskStatus = Literal[
+    "DRAFT", "PLANNED", "SCRIPT_READY", "SETUP_READY", "GENERATING", "REVIEW", "APPROVED", "PUBLISHED",
+]
+
+
+def _iso_date(value: Optional[str]) -> Optional[str]:
+    """Dates are stored as YYYY-MM-DD strings and compared as strings (calendar, stats, pregeneration)"""
+    if value is None:
+        return value
+    try:
+        if Date.fromisoformat(value).isoformat() == value:
+            return value
+    except ValueError:
+        pass
+    raise ValueError("date must be an ISO date (YYYY-MM-DD)")
 
 
 class TaskCreate(BaseModel):
@@ -18,7 +45,9 @@ class TaskCreate(BaseModel):
     date: str  # ISO date string
     content_type: str
     idea: Optional[str] = None
-    status: Optional[str] = "DRAFT"
+    status: Optional[TaskStatus] = "DRAFT"
+
+    _check_date = field_validator("date")(_iso_date)
 
 
 class TaskOut(BaseModel):
@@ -30,13 +59,20 @@ class TaskOut(BaseModel):
     status: str
     script: Optional[str]
     preview_url: Optional[str]
+    main_image_url: Optional[str] = None
+
+    @computed_field
+    @property
+    def derivatives(self) -> Dict[str, Dict[str, str]]:
+        """Pre-sized thumbnails keyed by original URL (images only)"""
+        return derivative_map([self.preview_url, self.main_image_url])
 
     class Config:
         from_attributes = True
 
 
 class TaskStatusUpdate(BaseModel):
-    status: str
+    status: TaskStatus
 
 
 router = APIRouter()
@@ -44,7 +80,7 @@ router = APIRouter()
 
 @router.get("/", response_model=List[TaskOut])
 def list_tasks(blogger_id: Optional[int] = None, date: Optional[str] = None, db: Session = Depends(get_db)):
-    q = db.query(models.ContentTask)
+    q = queries.task_list_query(db)
     if blogger_id:
         q = q.filter(models.ContentTask.blogger_id == blogger_id)
     if date:
@@ -82,46 +118,61 @@ def update_task_status(task_id: int, payload: TaskStatusUpdate, db: Session = De
 
 @router.post("/{task_id}/generate")
 def trigger_generation(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(models.ContentTask).get(task_id)
+    task = queries.task_for_dispatch(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # Get blogger to check type
-    blogger = db.query(models.Blogger).get(task.blogger_id)
-    
-    # Pick worker based on blogger type and content_type
-    ct = (task.content_type or "").lower()
-    
-    # Fashion blogger with post type → fashion worker
-    if blogger and blogger.type == "fashion" and ct == "post":
-        job_id = enqueue(process_fashion_post, task.id)
-    # Video content
-    elif any(k in ct for k in ["video", "reel", "short"]):
-        job_id = enqueue(process_video, task.id)
-    # Voice/audio content
-    elif any(k in ct for k in ["voice", "podcast", "audio"]):
-        job_id = enqueue(process_voice, task.id, text=task.script or task.idea or "", voice_id=task.blogger.voice_id if hasattr(task.blogger, "voice_id") else None)
-    # Default: image
-    else:
-        job_id = enqueue(process_image, task.id)
+    # Re-clicks while a job is queued or running get that job, not a duplicate
+    if task.job_id and task.status == "GENERATING" and job_status(task.job_id) in ACTIVE_STATUSES:
+        return {"queued": True, "task_id": task_id, "job_id": task.job_id, "duplicate": True}
     
-    task.status = "GENERATING"  # Worker will update to REVIEW when done
+    job_id = enqueue_generation(task, get_blogger_context(db, task.blogger_id), "task_generate")
     db.commit()
-    return {"queued": True, "task_id": task.id, "job_id": job_id}
+    # task_id, not task.id: attributes are expired after commit and would reload the row
+    return {"queued": True, "task_id": task_id, "job_id": job_id}
 
 
-@router.post("/{task_id}/script")
-def generate_script(task_id: int, db: Session = Depends(get_db)):
+@router.post("/{task_id}/cancel")
+def cancel_generation(task_id: int, db: Session = Depends(get_db)):
+    """
+    Cancel the task's generation job. A queued job is dropped and the task goes
+    back to its previous status; a running one stops at its next stage boundary
+    (the worker resets the status) - "stopping" in the response.
+    """
     task = db.query(models.ContentTask).get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    blogger = db.query(models.Blogger).get(task.blogger_id)
-    if not blogger:
-        raise HTTPException(status_code=404, detail="Blogger not found")
-    
-    # Generate full script based on idea and blogger info
-    prompt = f"""Create a detailed content script for a {blogger.type} blogger.
+    if not task.job_id:
+        return {"cancelled": False, "task_id": task_id, "job_status": None}
+
+    job_id = task.job_id
+    status, meta = cancel_job(job_id, idempotency_key=generate_key(task_id))
+    # Unknown job (expired, Redis flushed) can't finish either: unstick the task
+    if task.status == "GENERATING" and (status in PENDING_STATUSES or status is None):
+        task.status = meta.get("previous_status") or "DRAFT"
+        db.commit()
+    return {
+        "cancelled": status in ACTIVE_STATUSES,
+        "stopping": status == "started",
+        "task_id": task_id,
+        "job_id": job_id,
+        "job_status": status,
+    }
+
+
+def _cancel_jobs(jobs) -> None:
+    """Best effort: stop the generation jobs of deleted tasks, (task_id, job_id) pairs"""
+    for task_id, job_id in jobs:
+        if not job_id:
+            continue
+        try:
+            cancel_job(job_id, idempotency_key=generate_key(task_id))
+        except Exception as e:
+            print(f"[Tasks] Could not cancel job {job_id} of deleted task #{task_id}: {e}")
+
+
+def _script_prompt(task: models.ContentTask, blogger: BloggerContext) -> str:
+    return f"""Create a detailed content script for a {blogger.type} blogger.
 
 Blogger: {blogger.name}
 Theme: {blogger.theme or 'general'}
@@ -140,16 +191,16 @@ Return in JSON format:
   "voiceover_text": "Only the spoken text..."
 }}
 """
-    
-    result = generate_text(prompt)
-    
+
+
+def _apply_script(task: models.ContentTask, blogger_type: str, result: str) -> tuple:
+    """Parse the model output and store it on the task; returns (full_script, voiceover_text)"""
     # Try to parse as JSON, fallback to treating as plain script
     try:
-        import json
         parsed = json.loads(result)
         full_script = parsed.get("full_script", result)
         voiceover_text = parsed.get("voiceover_text", full_script)
-    except:
+    except Exception:
         # If not JSON, use as-is
         full_script = result
         voiceover_text = result
@@ -157,12 +208,30 @@ Return in JSON format:
     task.script = full_script
     
     # Store voiceover text in prompts for podcaster
-    if blogger.type == "podcaster":
-        if not task.prompts:
-            task.prompts = {}
-        task.prompts["voiceover_text"] = voiceover_text
+    if blogger_type == "podcaster":
+        prompts = dict(task.prompts or {})
+        prompts["voiceover_text"] = voiceover_text
+        task.prompts = prompts
     
     task.status = "SETUP_READY"  # Script готов, можно настраивать
+    return full_script, voiceover_text
+
+
+@router.post("/{task_id}/script")
+def generate_script(task_id: int, db: Session = Depends(get_db)):
+    task = db.query(models.ContentTask).get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    blogger = get_blogger_context(db, task.blogger_id)
+    if not blogger:
+        raise HTTPException(status_code=404, detail="Blogger not found")
+    
+    admit("task_script", task.blogger_id, "openai")
+    
+    # Generate full script based on idea and blogger info
+    result = generate_text(_script_prompt(task, blogger))
+    full_script, voiceover_text = _apply_script(task, blogger.type, result)
     db.commit()
     db.refresh(task)
     
@@ -175,6 +244,51 @@ Return in JSON format:
     }
 
 
+@router.post("/{task_id}/script/stream")
+def generate_script_stream(task_id: int, db: Session = Depends(get_db)):
+    """Streaming variant of /script: relays tokens over SSE, then saves the script"""
+    task = db.query(models.ContentTask).get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    blogger = get_blogger_context(db, task.blogger_id)
+    if not blogger:
+        raise HTTPException(status_code=404, detail="Blogger not found")
+    
+    admit("task_script", task.blogger_id, "openai")
+    prompt = _script_prompt(task, blogger)
+    blogger_type = blogger.type
+    
+    def events():
+        parts = []
+        try:
+            for delta in stream_text(prompt):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except Exception as e:
+            # A partial script must not overwrite the saved one
+            yield sse_event({"detail": f"Script generation failed: {e}"}, event="error")
+            return
+        
+        # The request's session is already closed once the body streams
+        with SessionLocal() as s:
+            t = s.query(models.ContentTask).get(task_id)
+            if not t:
+                yield sse_event({"detail": "Task not found"}, event="error")
+                return
+            full_script, voiceover_text = _apply_script(t, blogger_type, "".join(parts).strip())
+            s.commit()
+            yield sse_event({
+                "ok": True,
+                "task_id": task_id,
+                "status": t.status,
+                "full_script": full_script,
+                "voiceover_text": voiceover_text if blogger_type == "podcaster" else None
+            }, event="done")
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 class TaskContentUpdate(BaseModel):
     idea: Optional[str] = None
     script: Optional[str] = None
@@ -201,11 +315,139 @@ def delete_task(task_id: int, db: Session = Depends(get_db)):
     task = db.query(models.ContentTask).get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    job_id = task.job_id
     db.delete(task)
     db.commit()
+    _cancel_jobs([(task_id, job_id)])
     return {"ok": True}
 
 
+# Bulk endpoints: one request, one transaction, set-based statements
+
+MAX_BULK_ITEMS = 500
+
+
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate]
+
+
+class TaskBulkUpdateItem(BaseModel):
+    id: int
+    status: Optional[TaskStatus] = None
+    date: Optional[str] = None  # calendar drag-and-drop
+
+    _check_date = field_validator("date")(_iso_date)
+
+
+class TaskBulkUpdate(BaseModel):
+    items: List[TaskBulkUpdateItem]
+
+
+class TaskBulkDelete(BaseModel):
+    ids: List[int]
+
+
+def _check_bulk_size(n: int):
+    if n > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items per request")
+
+
+def _existing_task_ids(db: Session, ids) -> set:
+    rows = db.query(models.ContentTask.id).filter(models.ContentTask.id.in_(set(ids))).all()
+    return {row.id for row in rows}
+
+
+@router.post("/bulk")
+def bulk_create_tasks(payload: TaskBulkCreate, db: Session = Depends(get_db)):
+    """Create many tasks with one multi-row INSERT; results are in request order"""
+    _check_bulk_size(len(payload.tasks))
+    blogger_ids = {t.blogger_id for t in payload.tasks}
+    known = {row.id for row in db.query(models.Blogger.id).filter(models.Blogger.id.in_(blogger_ids)).all()}
+    
+    results = [None] * len(payload.tasks)
+    rows, positions = [], []
+    for i, t in enumerate(payload.tasks):
+        if t.blogger_id not in known:
+            results[i] = {"index": i, "ok": False, "error": "Blogger not found"}
+            continue
+        row = t.model_dump()
+        row["status"] = row["status"] or "DRAFT"  # NULLs are rendered below, so apply the default here
+        rows.append(row)
+        positions.append(i)
+    
+    if rows:
+        # render_nulls: rows with and without an idea go into the same INSERT
+        # instead of one batch per set of non-null columns
+        stmt = (
+            insert(models.ContentTask)
+            .returning(models.ContentTask.id, sort_by_parameter_order=True)
+            .execution_options(render_nulls=True)
+        )
+        ids = db.scalars(stmt, rows).all()
+        for i, task_id in zip(positions, ids):
+            results[i] = {"index": i, "ok": True, "id": task_id}
+    db.commit()
+    return {"results": results, "created": len(rows)}
+
+
+@router.patch("/bulk")
+def bulk_update_tasks(payload: TaskBulkUpdate, db: Session = Depends(get_db)):
+    """Update status and/or date for many tasks; one UPDATE per distinct value set"""
+    _check_bulk_size(len(payload.items))
+    found = _existing_task_ids(db, [item.id for item in payload.items])
+    
+    groups = defaultdict(list)
+    results = []
+    for item in payload.items:
+        values = item.model_dump(exclude={"id"}, exclude_none=True)
+        if item.id not in found:
+            results.append({"id": item.id, "ok": False, "error": "Task not found"})
+        elif not values:
+            results.append({"id": item.id, "ok": False, "error": "Nothing to update"})
+        else:
+            groups[tuple(sorted(values.items()))].append(item.id)
+            results.append({"id": item.id, "ok": True})
+    
+    for values, ids in groups.items():
+        db.execute(
+            update(models.ContentTask)
+            .where(models.ContentTask.id.in_(ids))
+            .values(**dict(values))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return {"results": results, "updated": sum(len(ids) for ids in groups.values())}
+
+
+@router.post("/bulk/delete")
+def bulk_delete_tasks(payload: TaskBulkDelete, db: Session = Depends(get_db)):
+    """Delete many tasks (and their meta/versions) with set-based DELETEs"""
+    _check_bulk_size(len(payload.ids))
+    # Job ids come along so the deleted tasks' generation jobs can be cancelled
+    jobs = (
+        db.query(models.ContentTask.id, models.ContentTask.job_id)
+        .filter(models.ContentTask.id.in_(set(payload.ids)))
+        .all()
+    )
+    found = {row.id for row in jobs}
+    
+    if found:
+        for model in (models.TaskMeta, models.TaskVersion):
+            db.execute(delete(model).where(model.task_id.in_(found)).execution_options(synchronize_session=False))
+        db.execute(
+            delete(models.ContentTask)
+            .where(models.ContentTask.id.in_(found))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    _cancel_jobs(jobs)
+    results = [
+        {"id": task_id, "ok": True} if task_id in found else {"id": task_id, "ok": False, "error": "Task not found"}
+        for task_id in payload.ids
+    ]
+    return {"results": results, "deleted": len(found)}
+
+
 # Fashion Post Generation Endpoints
 
 class FashionSetupUpdate(BaseModel):
@@ -236,25 +478,32 @@ def update_fashion_setup(task_id: int, payload: FashionSetupUpdate, db: Session
 class MainFrameRequest(BaseModel):
     prompt: Optional[str] = None
     custom_instructions: Optional[str] = None
+    candidates: int = 1  # Images from one Seedream call (max MAX_CANDIDATES)
+    rank: bool = False  # Order candidates best-first with a vision model
 
 
 @router.post("/{task_id}/fashion/generate-main-frame")
 def generate_main_frame(task_id: int, payload: MainFrameRequest, db: Session = Depends(get_db)):
     """Generate the main full-height fashion frame with SDXL"""
-    from ..utils.image_generation import generate_fashion_frame
+    from ..utils.image_generation import MAX_CANDIDATES, generate_fashion_frames, rank_candidates
+    
+    if not 1 <= payload.candidates <= MAX_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"candidates must be between 1 and {MAX_CANDIDATES}")
     
     task = db.query(models.ContentTask).get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    blogger = db.query(models.Blogger).get(task.blogger_id)
+    blogger = get_blogger_context(db, task.blogger_id)
     if not blogger:
         raise HTTPException(status_code=404, detail="Blogger not found")
     
+    admit("fashion_main_frame", task.blogger_id, "fal_image", payload.candidates)
+    
     # Build context for prompt generation
     location = None
     if task.location_id is not None and blogger.locations:
-        location = blogger.locations[task.location_id] if task.location_id < len(blogger.locations) else None
+        location = blogger.location(task.location_id)
     elif task.location_description:
         location = {"description": task.location_description}
     
@@ -294,25 +543,29 @@ Return the updated prompt only.""")
                     reference_image = part_value
                     break
     
-    # Generate image with Seedream v4 (edit mode if reference_image, text-to-image otherwise)
-    image_url = generate_fashion_frame(prompt, aspect_ratio="9:16", reference_image=reference_image)
+    # Generate image(s) with Seedream v4 (edit mode if reference_image, text-to-image otherwise)
+    # S3 copies are made in the background (workers/mirror_worker.py)
+    candidates = generate_fashion_frames(
+        prompt, aspect_ratio="9:16", reference_image=reference_image, num_images=payload.candidates, mirror=False
+    )
+    if payload.rank:
+        candidates = rank_candidates(candidates, prompt)
     
-    # Store in generated_images history
-    if not task.generated_images:
-        task.generated_images = {}
-    if "main" not in task.generated_images:
-        task.generated_images["main"] = []
-    task.generated_images["main"].append(image_url)
+    # Store in generated_images history; best candidate last, since approval takes the latest
+    record_assets(db, task, "main", candidates[::-1], prompt=prompt)
     
     # Store prompt
-    if not task.prompts:
-        task.prompts = {}
-    task.prompts["main"] = prompt
+    prompts = dict(task.prompts or {})
+    prompts["main"] = prompt
+    task.prompts = prompts
     
+    mirror_ids = record_mirrors(db, task.id, candidates)
     db.commit()
+    enqueue_mirrors(mirror_ids)
     
     return {
-        "image_url": image_url,
+        "image_url": candidates[0],
+        "candidates": candidates,
         "prompt": prompt,
         "task_id": task.id
     }
@@ -320,6 +573,7 @@ Return the updated prompt only.""")
 
 class ApproveFrameRequest(BaseModel):
     frame_type: str  # "main", "angle1", "angle2", "angle3"
+    image_url: Optional[str] = None  # A specific main candidate; defaults to the latest
 
 
 @router.post("/{task_id}/fashion/approve-frame")
@@ -332,7 +586,13 @@ def approve_frame(task_id: int, payload: ApproveFrameRequest, db: Session = Depe
     # For main frame, save to main_image_url
     if payload.frame_type == "main":
         if task.generated_images and "main" in task.generated_images and task.generated_images["main"]:
-            task.main_image_url = task.generated_images["main"][-1]  # Latest generated
+            image_url = payload.image_url
+            if image_url and image_url not in task.generated_images["main"]:
+                # The candidate may have been mirrored to S3 since generate-main-frame returned it
+                image_url = current_asset_url(db, task.id, "main", image_url)
+                if image_url not in task.generated_images["main"]:
+                    raise HTTPException(status_code=400, detail="image_url is not a generated main frame")
+            task.main_image_url = image_url or task.generated_images["main"][-1]  # Latest generated
             task.status = "REVIEW"  # Main frame approved, still need angles
     
     db.commit()
@@ -355,6 +615,8 @@ def generate_additional_frames(task_id: int, payload: AdditionalFramesRequest, d
     if not task.main_image_url:
         raise HTTPException(status_code=400, detail="Main frame must be approved first")
     
+    admit("fashion_additional_frames", task.blogger_id, "fal_image", 3)
+    
     base_prompt = payload.base_prompt or task.prompts.get("main") if task.prompts else ""
     
     # Use main frame as reference image for Seedream v4 edit mode
@@ -381,16 +643,15 @@ Keep same style, lighting, location. Only change: {angle_desc}
 Return updated prompt only.""")
         
         # Generate image using main frame as reference (Seedream v4 edit mode)
-        image_url = generate_fashion_frame(prompt, aspect_ratio="4:5", reference_image=reference_image)
+        # S3 copies are made in the background (workers/mirror_worker.py)
+        image_url = generate_fashion_frame(prompt, aspect_ratio="4:5", reference_image=reference_image, mirror=False)
         
-        # Store
-        if angle_key not in task.generated_images:
-            task.generated_images[angle_key] = []
-        task.generated_images[angle_key].append(image_url)
+        # Store (JSON columns are reassigned so SQLAlchemy sees the change)
+        record_assets(db, task, angle_key, [image_url], prompt=prompt)
         
-        if not task.prompts:
-            task.prompts = {}
-        task.prompts[angle_key] = prompt
+        prompts = dict(task.prompts or {})
+        prompts[angle_key] = prompt
+        task.prompts = prompts
         
         results.append({
             "angle": angle_key,
@@ -398,7 +659,9 @@ Return updated prompt only.""")
             "prompt": prompt
         })
     
+    mirror_ids = record_mirrors(db, task.id, [r["image_url"] for r in results])
     db.commit()
+    enqueue_mirrors(mirror_ids)
     
     return {
         "frames": results,
@@ -526,14 +789,18 @@ def generate_audio(task_id: int, payload: AudioGenerationRequest, db: Session =
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    # One TTS request per ~1000 characters
+    admit("podcaster_audio", task.blogger_id, "elevenlabs", max(1, len(payload.script) // 1000 + 1))
+    
     try:
-        # Generate audio with ElevenLabs
-        audio_url = generate_audio_elevenlabs(payload.script, payload.voice_id)
+        # Generate audio with ElevenLabs (chunks synthesized concurrently, streamed to S3)
+        audio_url = generate_audio_elevenlabs(payload.script, payload.voice_id, key=f"audio/task-{task.id}-{uuid4()}.mp3")
         
-        # Store audio URL
-        if not task.generated_images:
-            task.generated_images = {}
-        task.generated_images["audio_url"] = audio_url
+        # Store audio URL (reassign so SQLAlchemy sees the JSON change)
+        generated = dict(task.generated_images or {})
+        generated["audio_url"] = audio_url
+        task.generated_images = generated
+        record_asset_rows(db, task.id, "audio", [audio_url], prompt=payload.script)
         
         db.commit()
         
@@ -541,6 +808,8 @@ def generate_audio(task_id: int, payload: AudioGenerationRequest, db: Session =
             "audio_url": audio_url,
             "task_id": task.id
         }
+    except RateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audio generation failed: {str(e)}")
 
@@ -560,13 +829,15 @@ def generate_lipsync(task_id: int, payload: LipsyncGenerationRequest, db: Sessio
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    admit("podcaster_lipsync", task.blogger_id, "fal_video")
+    
     try:
         # Generate talking avatar with InfiniTalk
         # Use higher frame count for longer audio (up to 721 frames)
         num_frames = 145  # Default, ~6 seconds at 24fps
         
         # Build prompt for video generation
-        blogger = db.query(models.Blogger).get(task.blogger_id)
+        blogger = get_blogger_context(db, task.blogger_id)
         prompt = f"A person talking naturally"
         if blogger:
             if blogger.theme:
@@ -587,10 +858,11 @@ def generate_lipsync(task_id: int, payload: LipsyncGenerationRequest, db: Sessio
         video_url = result["video_url"]
         
         # Store video URL
-        if not task.generated_images:
-            task.generated_images = {}
-        task.generated_images["lipsync_video_url"] = video_url
-        task.generated_images["lipsync_seed"] = result.get("seed")
+        generated = dict(task.generated_images or {})
+        generated["lipsync_video_url"] = video_url
+        generated["lipsync_seed"] = result.get("seed")
+        task.generated_images = generated
+        record_asset_rows(db, task.id, "lipsync_video", [video_url], prompt=prompt, seed=result.get("seed"))
         
         # Update task status and preview URL
         task.preview_url = video_url
@@ -603,5 +875,7 @@ def generate_lipsync(task_id: int, payload: LipsyncGenerationRequest, db: Sessio
             "task_id": task.id,
             "seed": result.get("seed")
         }
+    except RateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lipsync generation failed: {str(e)}")
@@ -1,32 +1,181 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from ..utils.storage import upload_bytes_to_s3
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from pydantic import BaseModel
+from typing import Optional
+from ..utils.storage import (
+    presign_post, head_object, delete_object, public_url, stream_object,
+    get_backend, is_configured, sign_upload_key, verify_upload_key, verify_upload_policy,
+)
+from ..utils.storage.dedup import store_bytes
+from ..utils.executor import run_blocking, ExecutorBusy
+from ..utils.image_processing import sniff_image_format
+from ..workers.derivative_worker import enqueue_derivatives
 import os
 import uuid
 
 router = APIRouter()
 
+# Largest image accepted through a presigned upload
+MAX_UPLOAD_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_PREFIX = "bloggers/"
+# Time the browser has to upload and call /complete after /presign
+PRESIGN_EXPIRES = 900
+# Leading bytes read to check an upload really is an image
+SNIFF_BYTES = 64 * 1024
+
+
+def _new_key(filename: Optional[str]) -> str:
+    ext = filename.split(".")[-1].lower() if filename and "." in filename else "jpg"
+    return f"{UPLOAD_PREFIX}{uuid.uuid4()}.{ext}"
+
 
 @router.post("/image")
 async def upload_image(file: UploadFile = File(...)):
     """Upload image to S3 and return URL"""
-    
+
     # Check file type
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
-    
-    # Check S3 is configured
-    if not os.getenv("AWS_S3_BUCKET"):
+
+    # Check storage is configured
+    if not is_configured():
         raise HTTPException(status_code=500, detail="S3 not configured")
-    
+
     # Read file
     contents = await file.read()
-    
+
     # Generate unique filename
-    ext = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-    key = f"bloggers/{uuid.uuid4()}.{ext}"
-    
+    key = _new_key(file.filename)
+
     try:
-        url = upload_bytes_to_s3(contents, key)
-        return {"url": url, "filename": file.filename}
+        # boto3 is blocking - keep it off the event loop
+        # Re-uploading an image that is already stored returns the existing URL
+        url, uploaded = await run_blocking(store_bytes, contents, key, content_type=file.content_type)
+    except ExecutorBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+    # Thumbnails are rendered by the worker; their keys are predictable from `key`
+    if uploaded:
+        # Best effort and the upload has already landed: a saturated pool must
+        # not turn it into a 429 the client would retry
+        await run_in_threadpool(enqueue_derivatives, key)
+    return {"url": url, "filename": file.filename}
+
+
+# Direct-to-S3 uploads: the browser sends the bytes, the API only signs and verifies
+
+class PresignRequest(BaseModel):
+    filename: str
+    content_type: str
+    size: Optional[int] = None
+
+
+@router.post("/presign")
+def presign_upload(payload: PresignRequest):
+    """Issue a presigned POST so the browser can upload straight to S3"""
+    if not payload.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    if payload.size is not None and payload.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File is larger than {MAX_UPLOAD_BYTES} bytes")
+    if not is_configured():
+        raise HTTPException(status_code=500, detail="S3 not configured")
+
+    key = _new_key(payload.filename)
+    try:
+        post = presign_post(key, payload.content_type, MAX_UPLOAD_BYTES, PRESIGN_EXPIRES)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Presign failed: {str(e)}")
+
+    return {"url": post["url"], "fields": post["fields"], "key": key, "token": sign_upload_key(key, PRESIGN_EXPIRES)}
+
+
+class UploadComplete(BaseModel):
+    key: str
+    token: str
+    filename: Optional[str] = None
+
+
+def _leading_bytes(key: str) -> bytes:
+    head = b""
+    chunks = stream_object(key)
+    try:
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= SNIFF_BYTES:
+                break
+    finally:
+        # Stop reading (and release the S3 connection) once the header is in
+        chunks.close()
+    return head[:SNIFF_BYTES]
+
+
+@router.post("/complete")
+def complete_upload(payload: UploadComplete):
+    """Verify a direct upload landed in S3 and register it (derivatives etc.)"""
+    key = payload.key
+    # Only keys issued by /presign can be registered
+    if not key.startswith(UPLOAD_PREFIX) or ".." in key:
+        raise HTTPException(status_code=400, detail="Invalid upload key")
+    try:
+        verify_upload_key(key, payload.token)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+    try:
+        meta = head_object(key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload check failed: {str(e)}")
+    if not meta:
+        raise HTTPException(status_code=404, detail="Uploaded object not found")
+
+    # The declared Content-Type is the client's word; check the bytes themselves
+    if meta["size"] > MAX_UPLOAD_BYTES or not sniff_image_format(_leading_bytes(key)):
+        delete_object(key)
+        raise HTTPException(status_code=400, detail="Uploaded object is not a valid image")
+
+    enqueue_derivatives(key)
+    return {"url": public_url(key), "filename": payload.filename, "key": key, "size": meta["size"]}
+
+
+# Local/memory storage backends: the browser posts here instead of to S3,
+# and stored objects are served from /files
+
+@router.post("/direct")
+async def direct_upload(
+    key: str = Form(...),
+    content_type: str = Form(..., alias="Content-Type"),
+    policy: str = Form(...),
+    signature: str = Form(...),
+    file: UploadFile = File(...),
+):
+    """Form upload matching a policy signed by presign_post (non-S3 backends only)"""
+    try:
+        signed = verify_upload_policy(policy, signature)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    if signed["key"] != key or signed["content_type"] != content_type:
+        raise HTTPException(status_code=403, detail="Upload does not match policy")
+
+    contents = await file.read()
+    if not 1 <= len(contents) <= signed["max_bytes"]:
+        raise HTTPException(status_code=413, detail="Upload size outside policy limits")
+    await run_blocking(get_backend().put, key, contents, content_type)
+    return Response(status_code=204)
+
+
+@router.get("/files/{key:path}")
+def serve_file(key: str):
+    """Serve objects of the local/memory backends (S3 objects are served by S3)"""
+    backend = get_backend()
+    if backend.name == "s3":
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        meta = backend.head(key)
+    except ValueError:
+        meta = None
+    if not meta:
+        raise HTTPException(status_code=404, detail="Not found")
+    return Response(content=backend.get(key), media_type=meta.get("content_type") or "application/octet-stream")
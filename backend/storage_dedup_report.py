@@ -0,0 +1,84 @@
+"""
+Duplicate objects in the configured storage (STORAGE_BACKEND / AWS_S3_BUCKET).
+
+Run with: python -m backend.storage_dedup_report [--prefix fashion/] [--index]
+
+Only objects sharing a size are downloaded and hashed. Derivatives are
+skipped - they duplicate whenever their originals do. --index hashes every
+object and fills the stored_objects table, so later uploads of bytes that are
+already in the bucket are skipped.
+"""
+import argparse
+import sys
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.storage import download_bytes, list_objects
+from backend.utils.storage.base import BATCH_CONCURRENCY, guess_content_type
+from backend.utils.storage.dedup import index_object, sha256_hex
+
+
+def _hash_objects(objects):
+    def hash_one(obj):
+        return obj, sha256_hex(download_bytes(obj["key"]))
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as pool:
+        return list(pool.map(hash_one, objects))
+
+
+def dedup_report(prefix: str = "", index: bool = False) -> dict:
+    objects = [o for o in list_objects(prefix) if not o["key"].startswith("derivatives/")]
+    by_size = defaultdict(list)
+    for obj in objects:
+        by_size[obj["size"]].append(obj)
+
+    to_hash = objects if index else [o for group in by_size.values() if len(group) > 1 for o in group]
+    by_hash = defaultdict(list)
+    for obj, digest in _hash_objects(to_hash):
+        by_hash[digest].append(obj)
+
+    groups = []
+    for digest, group in by_hash.items():
+        group.sort(key=lambda o: o["key"])
+        if index:
+            index_object(digest, group[0]["key"], group[0]["size"], guess_content_type(group[0]["key"]))
+        if len(group) > 1:
+            groups.append({"sha256": digest, "size": group[0]["size"], "keys": [o["key"] for o in group]})
+    groups.sort(key=lambda g: g["size"] * (len(g["keys"]) - 1), reverse=True)
+
+    return {
+        "objects": len(objects),
+        "bytes": sum(o["size"] for o in objects),
+        "hashed": len(to_hash),
+        "duplicate_groups": len(groups),
+        "redundant_objects": sum(len(g["keys"]) - 1 for g in groups),
+        "redundant_bytes": sum(g["size"] * (len(g["keys"]) - 1) for g in groups),
+        "groups": groups,
+    }
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prefix", default="", help="Only objects under this key prefix")
+    parser.add_argument("--index", action="store_true", help="Hash every object and fill the dedup index")
+    parser.add_argument("--top", type=int, default=20, help="Duplicate groups to list")
+    args = parser.parse_args()
+
+    report = dedup_report(args.prefix, args.index)
+    print(f"Objects:            {report['objects']} ({_mb(report['bytes'])})")
+    print(f"Hashed:             {report['hashed']}")
+    print(f"Duplicate groups:   {report['duplicate_groups']}")
+    print(f"Redundant copies:   {report['redundant_objects']} ({_mb(report['redundant_bytes'])})")
+    for group in report["groups"][:args.top]:
+        print(f"\n{group['sha256'][:16]}  {_mb(group['size'])} x {len(group['keys'])}")
+        for key in group["keys"]:
+            print(f"  {key}")
+
+
+if __name__ == "__main__":
+    main()
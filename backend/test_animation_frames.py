@@ -0,0 +1,95 @@
+"""
+Test batch generation of a podcaster's animation frame set
+Run with: python -m backend.test_animation_frames
+"""
+import sys
+import os
+import threading
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.utils import image_generation
+from backend.workers import animation_worker
+
+
+@pytest.fixture
+def blogger_id(engine, use_engine, monkeypatch):
+    use_engine(animation_worker)
+    # The copy of the "think" frame fails and keeps its FAL URL
+    monkeypatch.setattr(animation_worker, "mirror_fal_images", lambda urls: [
+        url if "think" in url else url.replace("fal.media", "s3.example.com") for url in urls
+    ])
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Podcaster", type="podcaster", animation_frames=[
+            {"id": "old-joy", "base_location_id": "loc1", "prompt": "smile", "image_url": "https://x/joy.jpg", "emotion": "Joy"},
+            {"id": "custom", "base_location_id": "loc1", "prompt": "wave", "image_url": "https://x/wave.jpg"},
+        ])
+        s.add(blogger)
+        s.commit()
+        return blogger.id
+
+
+def test_frame_set_in_one_job(engine, blogger_id, monkeypatch):
+    calls = {"upload": 0, "enhance": 0}
+    lock = threading.Lock()
+    seen = []
+
+    def upload_reference(url):
+        calls["upload"] += 1
+        return "https://v3.fal.media/files/base.png"
+
+    def enhance_frame_prompts(prompts):
+        calls["enhance"] += 1
+        return [f"enhanced {p}" for p in prompts]
+
+    def generate_fashion_frame(prompt, aspect_ratio, reference_image=None, mirror=True, enhance=True):
+        assert reference_image == "https://v3.fal.media/files/base.png" and not mirror and not enhance
+        with lock:
+            seen.append(prompt)
+        if prompt == "enhanced frown":
+            raise RuntimeError("safety filter")
+        return f"https://fal.media/{prompt.split()[-1]}.png"
+
+    monkeypatch.setattr(animation_worker, "upload_reference", upload_reference)
+    monkeypatch.setattr(animation_worker, "enhance_frame_prompts", enhance_frame_prompts)
+    monkeypatch.setattr(animation_worker, "generate_fashion_frame", generate_fashion_frame)
+
+    frames = [{"prompt": p, "emotion": e} for p, e in [("smile", "Joy"), ("frown", "Sad"), ("think", "Thinking")]]
+    result = animation_worker.process_animation_frames(blogger_id, "https://s3.example.com/loc1.jpg", frames, "loc1")
+
+    assert calls == {"upload": 1, "enhance": 1}
+    assert sorted(seen) == ["enhanced frown", "enhanced smile", "enhanced think"]
+    assert [f["emotion"] for f in result["generated"]] == ["Joy"]
+    assert result["failed"] == [
+        {"prompt": "frown", "emotion": "Sad", "error": "safety filter"},
+        {"prompt": "think", "emotion": "Thinking", "error": "S3 upload failed"},
+    ]
+
+    with Session(engine) as s:
+        stored = s.get(models.Blogger, blogger_id).animation_frames
+    # New frames are appended; existing ones, even for the same emotion, stay
+    assert [f["id"] for f in stored[:2]] == ["old-joy", "custom"]
+    assert [f.get("emotion") for f in stored] == ["Joy", None, "Joy"]
+    assert stored[2]["image_url"] == "https://s3.example.com/smile.png"
+    assert all(f["base_location_id"] == "loc1" for f in stored)
+
+
+def test_batch_enhancement_falls_back_to_originals(monkeypatch):
+    replies = iter(['["one", "two"]', "not json"])
+
+    def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=next(replies)))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(image_generation, "_openai_client", lambda: client)
+    monkeypatch.setattr(image_generation, "throttle", lambda provider, units=1, max_wait=None: None)
+    assert image_generation.enhance_frame_prompts(["a", "b"]) == ["one", "two"]
+    assert image_generation.enhance_frame_prompts(["a", "b"]) == ["a", "b"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,75 @@
+"""
+Test bounded generated_images history and retention of rejected variants
+Run with: python -m backend.test_asset_retention
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.utils.image_processing import derivative_key
+from backend.utils.storage import dedup
+from backend.workers import asset_worker
+
+
+@pytest.fixture
+def backend(use_engine, memory_storage):
+    use_engine(asset_worker, dedup)
+    return memory_storage
+
+
+def test_history_is_bounded_and_rejected_variants_pruned(engine, backend):
+    keys = [f"fashion/frame-{i}.jpg" for i in range(12)]
+    urls = [backend.put(key, f"frame {i}".encode()) for i, key in enumerate(keys)]
+    backend.put(derivative_key(keys[0], "thumb"), b"thumb")
+
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Retention", type="fashion")
+        s.add(blogger)
+        s.flush()
+        task = models.ContentTask(blogger_id=blogger.id, date="2024-12-01", content_type="post")
+        # Another task uses frame 1 (e.g. handed out by the dedup index)
+        other = models.ContentTask(blogger_id=blogger.id, date="2024-12-02", content_type="post",
+                                   main_image_url=urls[1])
+        s.add_all([task, other])
+        s.flush()
+        for url in urls:
+            asset_worker.record_assets(s, task, "main", [url], prompt="p")
+        assert task.generated_images["main"] == urls[-asset_worker.HISTORY_KEEP:]
+        asset_worker.record_asset_rows(s, 999, "main", [urls[5]])  # task since deleted
+        s.commit()
+        task_id = task.id
+
+    # Nothing is old enough yet
+    assert asset_worker.prune_assets()["pruned"] == 0
+
+    later = datetime.utcnow() + asset_worker.RETENTION_AGE + timedelta(hours=1)
+    result = asset_worker.prune_assets(now=later)
+    # Frames 0 and 1 fell out of the history, plus the deleted task's frame
+    assert result["pruned"] == 3
+    assert not backend.exists(keys[0]) and not backend.exists(derivative_key(keys[0], "thumb"))
+    assert backend.exists(keys[1])
+    # Frame 5 is still in the live task's history
+    assert backend.exists(keys[5])
+
+    with Session(engine) as s:
+        task = s.get(models.ContentTask, task_id)
+        task.status = "APPROVED"
+        task.main_image_url = urls[7]
+        s.commit()
+
+    result = asset_worker.prune_assets(now=later)
+    assert result["pruned"] == 9
+    with Session(engine) as s:
+        assert s.get(models.ContentTask, task_id).generated_images["main"] == [urls[7]]
+    assert [k for k in keys if backend.exists(k)] == [keys[1], keys[7]]
+
+    assert asset_worker.prune_assets(now=later)["pruned"] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,42 @@
+"""
+Test that committed Blogger changes invalidate the cached blogger context
+Run with: python -m backend.test_blogger_cache
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.utils.blogger_cache import get_blogger_context
+
+
+def test_commit_invalidates_context(engine):
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Cached", type="fashion", locations=[{"title": "Park"}])
+        s.add(blogger)
+        s.commit()
+        blogger_id = blogger.id
+        assert get_blogger_context(s, blogger_id).locations == [{"title": "Park"}]
+
+        # Rolled back changes keep the cached copy
+        s.get(models.Blogger, blogger_id).theme = "draft"
+        s.flush()
+        s.rollback()
+        assert get_blogger_context(s, blogger_id).theme is None
+
+        # JSON reassignment, no explicit invalidate_blogger() call
+        b = s.get(models.Blogger, blogger_id)
+        b.locations = b.locations + [{"title": "Cafe"}]
+        s.commit()
+        assert [loc["title"] for loc in get_blogger_context(s, blogger_id).locations] == ["Park", "Cafe"]
+
+        s.delete(s.get(models.Blogger, blogger_id))
+        s.commit()
+        assert get_blogger_context(s, blogger_id) is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
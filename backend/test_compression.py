@@ -0,0 +1,53 @@
+"""
+Test response compression: large JSON is gzipped, small bodies and event streams are not
+Run with: python -m backend.test_compression
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.utils.compression import CompressionMiddleware
+
+app = FastAPI(default_response_class=ORJSONResponse)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+
+@app.get("/large")
+def large():
+    return {"items": [{"id": i, "image_url": f"https://cdn.example.com/img-{i}.jpg"} for i in range(200)]}
+
+
+@app.get("/small")
+def small():
+    return {"status": "ok"}
+
+
+@app.get("/stream")
+def stream():
+    def events():
+        for i in range(50):
+            yield f"data: {'token ' * 20}{i}\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def test_compression():
+    client = TestClient(app)
+    resp = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert int(resp.headers["content-length"]) < len(resp.content) / 4
+    assert resp.json()["items"][199]["id"] == 199
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+
+    resp = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+    assert resp.text.count("data: ") == 50
+
+
+if __name__ == "__main__":
+    test_compression()
+    print("✅ Compression OK")
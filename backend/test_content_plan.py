@@ -0,0 +1,70 @@
+"""
+Test content plan batching: one LLM call per DAYS_PER_CALL dates, near-duplicates skipped
+Run with: python -m backend.test_content_plan
+"""
+import sys
+import os
+import re
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.workers import content_plan_worker
+
+EXISTING_IDEA = "Autumn capsule wardrobe with five neutral pieces"
+
+
+@pytest.fixture
+def blogger_id(engine, use_engine):
+    use_engine(content_plan_worker)
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Planner", type="fashion")
+        s.add(blogger)
+        s.flush()
+        s.add(models.ContentTask(blogger_id=blogger.id, date="2024-11-01", content_type="post", idea=EXISTING_IDEA))
+        s.commit()
+        return blogger.id
+
+
+def _plan(blogger_id, monkeypatch, reply_for):
+    calls = []
+
+    def generate_text(prompt, max_tokens=500, system_prompt=None, timeout=30):
+        dates = re.search(r"these dates:\n(.*)\n", prompt).group(1).split(", ")
+        calls.append((dates, max_tokens, timeout))
+        return reply_for(dates)
+
+    monkeypatch.setattr(content_plan_worker, "generate_text", generate_text)
+    return content_plan_worker.process_content_plan(blogger_id, "2024-12-01", days=25), calls
+
+
+def test_batches_and_dedupe(engine, blogger_id, monkeypatch):
+    def reply_for(dates):
+        items = [{"date": d, "idea": f"Topic {d.replace('-', 'x')} exploration"} for d in dates]
+        # Paraphrase of an existing task, and an idea for a date that wasn't asked for
+        items[0]["idea"] = "Autumn capsule wardrobe: five neutral pieces"
+        items.append({"date": "2030-01-01", "idea": "Out of range"})
+        return f"```json\n{items}\n```".replace("'", '"')
+
+    result, calls = _plan(blogger_id, monkeypatch, reply_for)
+    per_call = content_plan_worker.DAYS_PER_CALL
+    assert [len(dates) for dates, _, _ in calls] == [per_call, per_call, 25 - 2 * per_call]
+    assert all(timeout == content_plan_worker.PLAN_TIMEOUT for _, _, timeout in calls)
+    assert result == {"created": 22, "skipped_duplicates": 3, "empty_batches": []}
+
+    with Session(engine) as s:
+        dates = [d for (d,) in s.query(models.ContentTask.date).filter(models.ContentTask.date >= "2024-12-01")]
+    assert len(dates) == 22 and "2030-01-01" not in dates
+
+
+def test_empty_plan_fails_the_job(engine, blogger_id, monkeypatch):
+    with pytest.raises(RuntimeError):
+        _plan(blogger_id, monkeypatch, lambda dates: "[AI Draft] timed out")
+    with Session(engine) as s:
+        assert s.query(models.ContentTask).count() == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,102 @@
+"""
+Test ElevenLabs chunking and concurrent synthesis against a local fake server
+Run with: python -m backend.test_eleven_labs
+"""
+import sys
+import os
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from backend.utils import eleven_labs
+
+
+class FakeTTSHandler(BaseHTTPRequestHandler):
+    """Echoes the requested text back as 'audio' after a short delay"""
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(0.05)
+        audio = f"<{body['text']}>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(audio)))
+        self.end_headers()
+        self.wfile.write(audio)
+        with cls.lock:
+            cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def test_chunk_text_keeps_sentences_whole():
+    text = "First sentence. Second one! Third?\n\nNew paragraph here."
+    assert eleven_labs.split_sentences(text) == ["First sentence.", "Second one!", "Third?", "New paragraph here."]
+    chunks = eleven_labs.chunk_text(text, max_chars=30)
+    assert chunks == ["First sentence. Second one!", "Third? New paragraph here."]
+    assert all(len(c) <= 30 for c in eleven_labs.chunk_text("word " * 50, max_chars=30))
+
+
+def test_retry_delay_accepts_seconds_and_dates():
+    assert eleven_labs.retry_delay("2", 0) == 2.0
+    assert eleven_labs.retry_delay(None, 2) == 2.0
+    assert eleven_labs.retry_delay("Wed, 21 Oct 2015 07:28:00 GMT", 0) == 0.0
+    assert eleven_labs.retry_delay("soon", 1) == 1.0
+
+
+def test_synthesize_chunks_in_order_and_concurrent(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTTSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(eleven_labs, "API_BASE", f"http://127.0.0.1:{server.server_port}")
+    try:
+        chunks = [f"chunk {i}." for i in range(8)]
+        audio = b"".join(eleven_labs.synthesize_chunks(chunks, "voice", concurrency=3))
+        assert audio == "".join(f"<{c}>" for c in chunks).encode("utf-8")
+        assert 1 < FakeTTSHandler.max_in_flight <= 3
+    finally:
+        server.shutdown()
+
+
+def test_sentence_cache_reuses_unchanged_sentences(memory_storage, use_engine, monkeypatch):
+    from backend.utils.storage import dedup
+    use_engine(dedup)
+    synthesized, lookups = [], []
+
+    def synthesize_chunk(text, voice_id, model=eleven_labs.DEFAULT_MODEL):
+        synthesized.append(text)
+        return f"<{text}>".encode("utf-8")
+
+    def indexed_keys(keys):
+        lookups.append(len(keys))
+        return real_indexed_keys(keys)
+
+    real_indexed_keys = dedup.indexed_keys
+    monkeypatch.setattr(eleven_labs, "synthesize_chunk", synthesize_chunk)
+    monkeypatch.setattr(dedup, "indexed_keys", indexed_keys)
+
+    def voice(sentences):
+        cache = eleven_labs.SentenceCache("voice", "model")
+        cache.lookup(sentences)
+        return [cache.audio_for(s) for s in sentences], cache.hits
+
+    assert voice(["One.", "Two."]) == ([b"<One.>", b"<Two.>"], 0)
+    # A later job (own instance, no shared state) only synthesizes the edited sentence
+    assert voice(["One.", "Two  edited."]) == ([b"<One.>", b"<Two edited.>"], 1)
+    assert synthesized == ["One.", "Two.", "Two edited."]
+    # One index query per script, not a request per sentence
+    assert lookups == [2, 2]
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,124 @@
+"""
+Test that an interrupted fashion job resumes at the failed stage
+Run with: python -m backend.test_fashion_resume
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.utils.queue import JobCancelled
+from backend.workers import fashion_worker
+
+
+class FakeFrames:
+    """generate_fashion_frame stand-in that can fail on the Nth call"""
+
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    def __call__(self, prompt, aspect_ratio, reference_image=None, mirror=True):
+        self.calls.append(aspect_ratio)
+        if len(self.calls) == self.fail_on:
+            raise RuntimeError("provider timeout")
+        return f"https://cdn.example.com/frame-{len(self.calls)}-{aspect_ratio}.png"
+
+
+@pytest.fixture
+def task_id(engine, use_engine, monkeypatch):
+    use_engine(fashion_worker)
+    monkeypatch.setattr(fashion_worker, "check_cancelled", lambda: None)
+    monkeypatch.setattr(fashion_worker, "generate_text", lambda prompt, **kwargs: "prompt")
+    monkeypatch.setattr(fashion_worker, "enqueue_mirrors", lambda ids: None)
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Resume", type="fashion", locations=[{"description": "park"}])
+        s.add(blogger)
+        s.flush()
+        task = models.ContentTask(blogger_id=blogger.id, date="2024-12-01", content_type="post", location_id=0)
+        s.add(task)
+        s.commit()
+        return task.id
+
+
+def _task(engine, task_id):
+    with Session(engine) as s:
+        return s.get(models.ContentTask, task_id)
+
+
+def _frames(monkeypatch, fail_on=None):
+    frames = FakeFrames(fail_on)
+    monkeypatch.setattr(fashion_worker, "generate_fashion_frame", frames)
+    return frames
+
+
+def test_resume_after_failed_angle(engine, task_id, monkeypatch):
+    # Main + angle1 + angle2 succeed, angle3 fails
+    _frames(monkeypatch, fail_on=4)
+    assert fashion_worker.process_fashion_post(task_id) is False
+    task = _task(engine, task_id)
+    assert task.status == "DRAFT"
+    assert task.prompts["failed_stage"] == "angle3"
+    assert task.generation_checkpoint["stages"] == ["main", "angle1", "angle2"]
+    main_url = task.main_image_url
+
+    # Rerun only generates angle3
+    frames = _frames(monkeypatch)
+    assert fashion_worker.process_fashion_post(task_id) is True
+    assert frames.calls == ["4:5"]
+    task = _task(engine, task_id)
+    assert task.status == "REVIEW"
+    assert task.main_image_url == main_url
+    assert all(len(task.generated_images[k]) == 1 for k in fashion_worker.STAGES)
+    assert task.generation_checkpoint is None and "error" not in task.prompts
+    assert set(task.prompts) == set(fashion_worker.STAGES)
+
+    # A finished post regenerates from scratch
+    frames = _frames(monkeypatch)
+    assert fashion_worker.process_fashion_post(task_id) is True
+    assert len(frames.calls) == 4
+
+
+def test_changed_inputs_restart(engine, task_id, monkeypatch):
+    _frames(monkeypatch, fail_on=2)
+    assert fashion_worker.process_fashion_post(task_id) is False
+
+    with Session(engine) as s:
+        s.get(models.ContentTask, task_id).location_description = "beach"
+        s.commit()
+
+    frames = _frames(monkeypatch)
+    assert fashion_worker.process_fashion_post(task_id) is True
+    assert len(frames.calls) == 4
+
+
+def test_cancel_stops_at_stage_boundary(engine, task_id, monkeypatch):
+    checks = []
+
+    def check_cancelled():
+        # Cancel requested while angle1 was generating
+        checks.append(1)
+        if len(checks) == 3:
+            raise JobCancelled("job-1", {"previous_status": "SETUP_READY"})
+
+    monkeypatch.setattr(fashion_worker, "check_cancelled", check_cancelled)
+    frames = _frames(monkeypatch)
+    assert fashion_worker.process_fashion_post(task_id) is False
+    assert frames.calls == ["9:16", "4:5"]
+    task = _task(engine, task_id)
+    assert task.status == "SETUP_READY"
+    assert "error" not in task.prompts
+    assert task.generation_checkpoint["stages"] == ["main", "angle1"]
+
+    # Generating again resumes at angle2
+    monkeypatch.setattr(fashion_worker, "check_cancelled", lambda: None)
+    frames = _frames(monkeypatch)
+    assert fashion_worker.process_fashion_post(task_id) is True
+    assert frames.calls == ["4:5", "4:5"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,64 @@
+"""
+Test the generation rate/budget governor and its 429 response
+Run with: python -m backend.test_governor
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.utils import governor
+
+
+def test_blogger_bucket_is_per_blogger(memory_limiter, monkeypatch):
+    monkeypatch.setattr(governor, "BLOGGER_RATE", (1 / 60, 2))
+    governor.admit("generate_location", 1, "fal_image")
+    governor.admit("generate_location", 1, "fal_image")
+    try:
+        governor.admit("generate_location", 1, "fal_image")
+        assert False, "third request admitted"
+    except governor.RateLimited as e:
+        assert "blogger" in e.reason and 50 <= e.retry_after <= 60
+    # Other bloggers are unaffected
+    governor.admit("generate_location", 2, "fal_image")
+
+
+def test_daily_budget(memory_limiter, monkeypatch):
+    monkeypatch.setattr(governor, "BLOGGER_DAILY_BUDGET_USD", 0.10)
+    governor.admit("fashion_main_frame", 7, "fal_image", units=3)  # $0.09
+    try:
+        governor.admit("fashion_main_frame", 7, "fal_image", units=1)
+        assert False, "budget overrun admitted"
+    except governor.RateLimited as e:
+        assert "budget" in e.reason and e.retry_after <= 24 * 3600
+    assert abs(governor.spent_today(7) - 0.09) < 1e-9
+    # Refused requests are not charged
+    assert abs(governor.spent_today() - 0.09) < 1e-9
+
+
+def test_throttle_waits_then_gives_up(memory_limiter, monkeypatch):
+    monkeypatch.setattr(governor, "PROVIDER_RATES", {"fal": (20.0, 1)})
+    governor.throttle("fal")
+    governor.throttle("fal")  # waits ~50ms for the next token
+    governor.throttle("fal")
+    try:
+        governor.throttle("fal", max_wait=0)
+        assert False, "throttle did not refuse"
+    except governor.RateLimited:
+        pass
+
+
+def test_api_answers_429_with_retry_after(memory_limiter, monkeypatch):
+    monkeypatch.setattr(governor, "ENDPOINT_RATE", (1 / 60, 1))
+    client = TestClient(app)
+    assert client.post("/api/assistant/", json={"message": "hi"}).status_code == 200
+    r = client.post("/api/assistant/", json={"message": "hi"})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,128 @@
+"""
+Test main-frame candidates: one multi-image call, vision ranking and approving a candidate
+Run with: python -m backend.test_main_frame
+"""
+import sys
+import os
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.routes import tasks
+from backend.utils import image_generation
+
+CANDIDATES = [f"https://v3.fal.media/files/abc/frame{i}.png" for i in range(1, 4)]
+
+
+class FakeOpenAI:
+    """Chat client whose vision ranking reply is fixed"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def task_id(engine):
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Frame", type="fashion")
+        s.add(blogger)
+        s.flush()
+        task = models.ContentTask(blogger_id=blogger.id, date="2024-12-01", content_type="post", status="DRAFT")
+        s.add(task)
+        s.commit()
+        return task.id
+
+
+@pytest.fixture
+def frames(monkeypatch, memory_limiter):
+    calls = []
+
+    def fake_frames(prompt, aspect_ratio, reference_image=None, num_images=1, mirror=True, enhance=True):
+        calls.append({"num_images": num_images, "mirror": mirror})
+        return CANDIDATES[:num_images]
+
+    monkeypatch.setattr(image_generation, "generate_fashion_frames", fake_frames)
+    monkeypatch.setattr(image_generation, "throttle", lambda provider: None)
+    monkeypatch.setattr(tasks, "generate_text", lambda prompt, **kwargs: "red coat on a bridge")
+    monkeypatch.setattr(tasks, "enqueue_mirrors", lambda ids: None)
+    return calls
+
+
+def test_candidates_from_one_call_ranked_and_approved(client, engine, task_id, frames, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(image_generation, "_openai_client", lambda: FakeOpenAI("Best first: [3, 1]"))
+
+    r = client.post(f"/api/tasks/{task_id}/fashion/generate-main-frame", json={"candidates": 3, "rank": True})
+    assert r.status_code == 200
+    body = r.json()
+    # One provider call for every candidate, mirrored in the background
+    assert frames == [{"num_images": 3, "mirror": False}]
+    # The model's order, with the candidate it left out at the end
+    ranked = [CANDIDATES[2], CANDIDATES[0], CANDIDATES[1]]
+    assert body["candidates"] == ranked
+    assert body["image_url"] == ranked[0]
+
+    with Session(engine) as s:
+        task = s.get(models.ContentTask, task_id)
+        # Best candidate last, so approving the latest picks it
+        assert task.generated_images["main"] == ranked[::-1]
+        assert s.query(models.PendingMirror).count() == 3
+
+    r = client.post(
+        f"/api/tasks/{task_id}/fashion/approve-frame", json={"frame_type": "main", "image_url": ranked[2]}
+    )
+    assert r.status_code == 200
+    with Session(engine) as s:
+        task = s.get(models.ContentTask, task_id)
+        assert task.main_image_url == ranked[2]
+        assert task.status == "REVIEW"
+
+
+def test_failed_ranking_keeps_generation_order(client, task_id, frames, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(image_generation, "_openai_client", lambda: FakeOpenAI("I can't rank these"))
+
+    r = client.post(f"/api/tasks/{task_id}/fashion/generate-main-frame", json={"candidates": 2, "rank": True})
+    assert r.json()["candidates"] == CANDIDATES[:2]
+
+
+def test_unknown_candidate_is_not_approved(client, task_id, frames):
+    client.post(f"/api/tasks/{task_id}/fashion/generate-main-frame", json={"candidates": 2})
+    r = client.post(
+        f"/api/tasks/{task_id}/fashion/approve-frame",
+        json={"frame_type": "main", "image_url": "https://example.com/other.png"},
+    )
+    assert r.status_code == 400
+
+
+def test_additional_frames_are_mirrored_in_background(client, engine, task_id, frames, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(tasks, "enqueue_mirrors", enqueued.extend)
+    with Session(engine) as s:
+        s.get(models.ContentTask, task_id).main_image_url = CANDIDATES[0]
+        s.commit()
+
+    r = client.post(f"/api/tasks/{task_id}/fashion/generate-additional-frames", json={})
+    assert r.status_code == 200
+    assert frames == [{"num_images": 1, "mirror": False}] * 3
+    with Session(engine) as s:
+        assert sorted(m.id for m in s.query(models.PendingMirror)) == sorted(enqueued)
+        assert len(enqueued) == 3
+
+
+def test_candidates_out_of_range(client, task_id, frames):
+    r = client.post(f"/api/tasks/{task_id}/fashion/generate-main-frame", json={"candidates": 0})
+    assert r.status_code == 400
+    assert frames == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,112 @@
+"""
+Test background FAL -> S3 mirroring and the reconciler
+Run with: python -m backend.test_mirror_worker
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.workers import mirror_worker
+from backend.workers.asset_worker import record_assets
+
+FAL_URL = "https://v3.fal.media/files/abc/frame.png"
+
+
+def _s3_upload(row):
+    return f"https://bucket.s3.amazonaws.com/{row.s3_key}"
+
+
+def _failing_upload(row):
+    raise RuntimeError("S3 down")
+
+
+@pytest.fixture
+def mirrors(engine, use_engine, monkeypatch):
+    use_engine(mirror_worker)
+    monkeypatch.setattr(mirror_worker, "_upload", _s3_upload)
+    return lambda: _add_task(engine)
+
+
+def _add_task(engine):
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Mirror", type="fashion")
+        s.add(blogger)
+        s.flush()
+        task = models.ContentTask(
+            blogger_id=blogger.id, date="2024-12-01", content_type="post",
+            main_image_url=FAL_URL, generated_images={"main": ["https://old.png", FAL_URL], "angle1": [FAL_URL]},
+        )
+        s.add(task)
+        s.flush()
+        mirror_ids = mirror_worker.record_mirrors(s, task.id, [FAL_URL])
+        s.commit()
+        return task.id, mirror_ids[0]
+
+
+def test_process_mirror_swaps_url(engine, mirrors):
+    task_id, mirror_id = mirrors()
+    s3_url = mirror_worker.process_mirror(mirror_id)
+    assert s3_url.startswith("https://bucket.s3.amazonaws.com/fashion/")
+
+    with Session(engine) as s:
+        task = s.get(models.ContentTask, task_id)
+        assert task.main_image_url == s3_url
+        assert task.generated_images == {"main": ["https://old.png", s3_url], "angle1": [s3_url]}
+        assert s.query(models.PendingMirror).count() == 0
+    # Already done: a duplicate job is a no-op
+    assert mirror_worker.process_mirror(mirror_id) is None
+
+
+def test_approve_candidate_after_mirror(engine, mirrors, client):
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Approve", type="fashion")
+        s.add(blogger)
+        s.flush()
+        task = models.ContentTask(blogger_id=blogger.id, date="2024-12-01", content_type="post")
+        s.add(task)
+        s.flush()
+        # As generate-main-frame stores a batch of candidates
+        record_assets(s, task, "main", [FAL_URL, "https://v3.fal.media/files/abc/other.png"], prompt="p")
+        mirror_id = mirror_worker.record_mirrors(s, task.id, [FAL_URL])[0]
+        s.commit()
+        task_id = task.id
+    s3_url = mirror_worker.process_mirror(mirror_id)
+
+    # The client still holds the FAL URL generate-main-frame returned
+    r = client.post(f"/api/tasks/{task_id}/fashion/approve-frame", json={"frame_type": "main", "image_url": FAL_URL})
+    assert r.status_code == 200, r.text
+    with Session(engine) as s:
+        assert s.get(models.ContentTask, task_id).main_image_url == s3_url
+
+    r = client.post(f"/api/tasks/{task_id}/fashion/approve-frame", json={"frame_type": "main", "image_url": "https://elsewhere.png"})
+    assert r.status_code == 400
+
+
+def test_reconciler_retries_and_expires(engine, mirrors, monkeypatch):
+    task_id, mirror_id = mirrors()
+    monkeypatch.setattr(mirror_worker, "_upload", _failing_upload)
+
+    # Fresh rows belong to their queued job
+    assert mirror_worker.reconcile_mirrors()["checked"] == 0
+
+    later = datetime.utcnow() + timedelta(minutes=10)
+    assert mirror_worker.reconcile_mirrors(now=later) == {"checked": 1, "mirrored": 0, "expired": 0}
+    with Session(engine) as s:
+        assert s.get(models.PendingMirror, mirror_id).attempts == 1
+
+    monkeypatch.setattr(mirror_worker, "_upload", _s3_upload)
+    assert mirror_worker.reconcile_mirrors(now=later)["mirrored"] == 1
+
+    mirrors()
+    monkeypatch.setattr(mirror_worker, "_upload", _failing_upload)
+    result = mirror_worker.reconcile_mirrors(now=datetime.utcnow() + timedelta(hours=25))
+    assert result["expired"] == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
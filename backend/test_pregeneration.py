@@ -0,0 +1,104 @@
+"""
+Test off-peak pre-generation of upcoming SETUP_READY tasks
+Run with: python -m backend.test_pregeneration
+"""
+import sys
+import os
+from datetime import datetime, timezone
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.utils import governor, task_jobs
+from backend.workers import pregeneration_worker as pregen
+
+NIGHT = datetime(2024, 12, 1, 2, 30, tzinfo=timezone.utc)
+NOON = datetime(2024, 12, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def calls(engine, use_engine, memory_limiter, monkeypatch):
+    """Due and not-due tasks; returns the list enqueue() calls are recorded in"""
+    use_engine(pregen)
+    monkeypatch.setattr(pregen, "PREGENERATE_ENABLED", True)
+    monkeypatch.setattr(pregen, "PREGENERATE_WINDOWS", "01:00-06:00")
+    monkeypatch.setattr(pregen, "PREGENERATE_TZ", "UTC")
+    monkeypatch.setattr(pregen, "PREGENERATE_DAYS", 3)
+    calls = []
+    monkeypatch.setattr(task_jobs, "active_job", lambda key: None)
+    monkeypatch.setattr(task_jobs, "enqueue", lambda job, *args, **kwargs: calls.append((job, args, kwargs)) or f"job-{len(calls)}")
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Pregen", type="fashion")
+        s.add(blogger)
+        s.flush()
+        s.add_all([
+            models.ContentTask(blogger_id=blogger.id, date=d, content_type="post", status=status)
+            for d, status in [
+                ("2024-12-03", "SETUP_READY"),
+                ("2024-12-01", "SETUP_READY"),
+                ("2024-11-30", "SETUP_READY"),  # past
+                ("2024-12-09", "SETUP_READY"),  # beyond the horizon
+                ("2024-12-02", "DRAFT"),
+                ("2024-12-02", "REVIEW"),
+            ]
+        ])
+        s.commit()
+    return calls
+
+
+def _statuses(engine):
+    with Session(engine) as s:
+        return {t.date: (t.status, t.job_id) for t in s.query(models.ContentTask)}
+
+
+def test_windows():
+    windows = pregen.parse_windows("22:00-04:00, 13:00-14:00")
+    assert pregen.in_window(datetime(2024, 1, 1, 23, 0).time(), windows)
+    assert pregen.in_window(datetime(2024, 1, 1, 3, 59).time(), windows)
+    assert pregen.in_window(datetime(2024, 1, 1, 13, 30).time(), windows)
+    assert not pregen.in_window(datetime(2024, 1, 1, 4, 0).time(), windows)
+    assert not pregen.in_window(datetime(2024, 1, 1, 12, 0).time(), windows)
+
+
+def test_pregenerates_due_tasks_off_peak(engine, calls):
+    assert pregen.pregenerate(now=NOON)["skipped"] == "outside off-peak window"
+    assert calls == []
+
+    result = pregen.pregenerate(now=NIGHT)
+    assert result["enqueued"] == 2 and result["stopped"] is None
+    # Nearest first, fashion posts to the fashion worker on the low-priority queue
+    assert [args for _, args, _ in calls] == [(result["task_ids"][0],), (result["task_ids"][1],)]
+    assert all(job == task_jobs.PROCESS_FASHION_POST for job, _, _ in calls)
+    assert all(kwargs["queue_name"] == "pregenerate" for _, _, kwargs in calls)
+    assert all(kwargs["meta"] == {"previous_status": "SETUP_READY"} for _, _, kwargs in calls)
+    statuses = _statuses(engine)
+    assert statuses["2024-12-01"] == ("GENERATING", "job-1")
+    assert statuses["2024-12-03"] == ("GENERATING", "job-2")
+    assert statuses["2024-11-30"][0] == statuses["2024-12-09"][0] == "SETUP_READY"
+
+    # Nothing left to do
+    assert pregen.pregenerate(now=NIGHT)["enqueued"] == 0
+
+
+def test_stops_at_budget_share(calls, monkeypatch):
+    # One fashion post (4 images) uses up the share
+    monkeypatch.setattr(governor, "DAILY_BUDGET_USD", governor.estimate_cost("fal_image", 4) * 2)
+    monkeypatch.setattr(pregen, "PREGENERATE_BUDGET_SHARE", 0.5)
+    result = pregen.pregenerate(now=NIGHT)
+    assert result["enqueued"] == 1 and len(calls) == 1
+    assert result["stopped"] == "pre-generation budget share used"
+
+
+def test_running_job_is_not_charged_again(engine, calls, monkeypatch):
+    monkeypatch.setattr(task_jobs, "active_job", lambda key: "job-running")
+    with Session(engine) as s:
+        task = s.query(models.ContentTask).filter_by(date="2024-12-01").one()
+        assert task_jobs.enqueue_generation(task, None, "task_generate") == "job-running"
+        assert task.status == "GENERATING" and task.job_id == "job-running"
+    assert calls == [] and governor.spent_today() == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,166 @@
+"""
+SQL statement budgets per endpoint - fails when a change adds queries (N+1, lazy loads)
+Run with: python -m backend.test_query_counts  (or pytest backend/test_query_counts.py)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.utils import task_jobs
+from backend.utils.blogger_cache import get_blogger_context
+from backend.workers import video_worker
+
+# Max statements per request; lower them when an endpoint gets cheaper
+BUDGETS = {
+    "GET /api/tasks/": 1,
+    "GET /api/tasks/{id}": 1,
+    "POST /api/tasks/{id}/generate": 2,
+    "POST /api/assistant/meta/generate": 2,
+    "PATCH /api/tasks/bulk": 2,
+    # 2 created rows: SQLite inserts one row per statement when RETURNING must
+    # keep parameter order; PostgreSQL sends a single INSERT
+    "POST /api/tasks/bulk": 3,
+    "POST /api/tasks/bulk/delete": 4,
+    "process_video": 2,
+}
+
+
+class QueryCounter:
+    """Collects every SQL statement sent to the engine while active"""
+
+    def __init__(self, bind):
+        self.bind = bind
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def task_ids(engine):
+    with Session(engine) as s:
+        blogger = models.Blogger(
+            name="Budget Blogger", type="podcaster", voice_id="voice",
+            locations=[{"title": f"Loc {i}", "description": "x" * 200} for i in range(20)],
+        )
+        s.add(blogger)
+        s.flush()
+        tasks = [
+            models.ContentTask(blogger_id=blogger.id, date=f"2024-12-{i + 1:02d}", content_type=ct, idea=f"Idea {i}")
+            for i, ct in enumerate(["podcast", "video", "post"])
+        ]
+        s.add_all(tasks)
+        s.commit()
+        # Budgets are for the steady state, where the blogger context is cached
+        get_blogger_context(s, blogger.id)
+        return [t.id for t in tasks]
+
+
+def _assert_budget(name, counter):
+    budget = BUDGETS[name]
+    assert counter.count <= budget, (
+        f"{name}: {counter.count} statements (budget {budget}):\n" + "\n".join(counter.statements)
+    )
+
+
+def test_endpoint_statement_budgets(engine, client, task_ids, monkeypatch):
+    monkeypatch.setattr(task_jobs, "active_job", lambda key: None)
+    monkeypatch.setattr(task_jobs, "enqueue", lambda *args, **kwargs: "job-test")
+
+    cases = [
+        ("GET /api/tasks/", "get", "/api/tasks/", None),
+        ("GET /api/tasks/{id}", "get", f"/api/tasks/{task_ids[0]}", None),
+        ("POST /api/tasks/{id}/generate", "post", f"/api/tasks/{task_ids[0]}/generate", None),
+        ("POST /api/assistant/meta/generate", "post", "/api/assistant/meta/generate", {"task_id": task_ids[0]}),
+        ("PATCH /api/tasks/bulk", "patch", "/api/tasks/bulk", {"items": [{"id": t, "status": "APPROVED"} for t in task_ids]}),
+    ]
+    for name, method, url, body in cases:
+        with QueryCounter(engine) as counter:
+            resp = getattr(client, method)(url, json=body) if body is not None else getattr(client, method)(url)
+        assert resp.status_code == 200, f"{name}: {resp.status_code} {resp.text}"
+        _assert_budget(name, counter)
+
+    # Invalid values are rejected before any statement runs
+    for item in ({"id": task_ids[0], "status": "DONE?"}, {"id": task_ids[0], "date": "12/05/2024"}):
+        with QueryCounter(engine) as counter:
+            assert client.patch("/api/tasks/bulk", json={"items": [item]}).status_code == 422
+        assert counter.count == 0
+
+
+def test_bulk_create_and_delete(engine, client, task_ids):
+    with Session(engine) as s:
+        blogger_id = s.get(models.ContentTask, task_ids[0]).blogger_id
+    tasks = [
+        {"blogger_id": blogger_id, "date": "2025-01-02", "content_type": "post", "idea": "Second"},
+        {"blogger_id": 999, "date": "2025-01-03", "content_type": "post"},
+        {"blogger_id": blogger_id, "date": "2025-01-01", "content_type": "reel", "status": "PLANNED"},
+    ]
+    with QueryCounter(engine) as counter:
+        resp = client.post("/api/tasks/bulk", json={"tasks": tasks})
+    assert resp.status_code == 200
+    _assert_budget("POST /api/tasks/bulk", counter)
+    body = resp.json()
+    assert body["created"] == 2
+    assert [r["ok"] for r in body["results"]] == [True, False, True]
+    assert body["results"][1] == {"index": 1, "ok": False, "error": "Blogger not found"}
+    created = [body["results"][0]["id"], body["results"][2]["id"]]
+    with Session(engine) as s:
+        rows = [s.get(models.ContentTask, task_id) for task_id in created]
+        assert [(t.date, t.content_type, t.status, t.idea) for t in rows] == [
+            ("2025-01-02", "post", "DRAFT", "Second"),
+            ("2025-01-01", "reel", "PLANNED", None),
+        ]
+
+    # One invalid item rejects the whole request before any statement runs
+    for bad in ({"date": "01/04/2025"}, {"status": "DONE?"}):
+        with QueryCounter(engine) as counter:
+            resp = client.post("/api/tasks/bulk", json={"tasks": [tasks[0], {**tasks[0], **bad}]})
+        assert resp.status_code == 422 and counter.count == 0
+
+    with Session(engine) as s:
+        s.add(models.TaskVersion(task_id=created[0], kind="script", content="v1"))
+        s.add(models.TaskMeta(task_id=created[0], data={"style": "x"}))
+        s.commit()
+    with QueryCounter(engine) as counter:
+        resp = client.post("/api/tasks/bulk/delete", json={"ids": [created[0], 12345, task_ids[0]]})
+    assert resp.status_code == 200
+    _assert_budget("POST /api/tasks/bulk/delete", counter)
+    assert resp.json() == {
+        "results": [
+            {"id": created[0], "ok": True},
+            {"id": 12345, "ok": False, "error": "Task not found"},
+            {"id": task_ids[0], "ok": True},
+        ],
+        "deleted": 2,
+    }
+    with Session(engine) as s:
+        remaining = {task_id for (task_id,) in s.query(models.ContentTask.id)}
+        assert remaining == {task_ids[1], task_ids[2], created[1]}
+        assert s.query(models.TaskVersion).count() == s.query(models.TaskMeta).count() == 0
+
+
+def test_video_worker_statement_budget(engine, use_engine, task_ids):
+    use_engine(video_worker)
+    with QueryCounter(engine) as counter:
+        assert video_worker.process_video(task_ids[1]) is True
+    _assert_budget("process_video", counter)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,163 @@
+"""
+Test the local-disk and in-memory storage backends
+Run with: python -m backend.test_storage_backends
+"""
+import sys
+import os
+import io
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routes import upload
+from backend.utils import storage
+from backend.utils.storage.local import LocalBackend, MemoryBackend
+
+
+def _round_trip(backend):
+    url = backend.put("a/one.png", b"png-bytes", "image/png")
+    assert backend.key_from_url(url) == "a/one.png"
+    assert backend.key_from_url("https://v3.fal.media/files/x.png") is None
+
+    payload = bytearray(b"0123456789")
+    backend.put("a/view.bin", memoryview(payload)[2:6])
+    backend.put("a/file.bin", io.BytesIO(b"x" * 3000))
+    assert backend.get("a/one.png") == b"png-bytes"
+    assert backend.get("a/view.bin") == b"2345"
+    assert b"".join(backend.stream("a/file.bin", chunk_size=1024)) == b"x" * 3000
+    assert backend.head("a/one.png")["size"] == 9
+    assert backend.head("a/missing.png") is None
+
+    results = backend.put_many(
+        [("b/1.txt", b"1", None), ("../escape", b"2", None), ("b/3.txt", b"3", None)],
+        return_exceptions=True,
+    )
+    assert isinstance(results[1], ValueError)
+    assert backend.get_many(["b/1.txt", "b/3.txt"]) == [b"1", b"3"]
+
+    backend.delete_many(["a/one.png", "b/1.txt", "b/never.txt"])
+    assert not backend.exists("a/one.png")
+    assert backend.exists("b/3.txt")
+
+
+def test_memory_backend():
+    _round_trip(MemoryBackend())
+
+
+def test_local_backend():
+    with tempfile.TemporaryDirectory() as root:
+        _round_trip(LocalBackend(root=root))
+
+
+def test_facade_and_upload_policy():
+    storage.set_backend(MemoryBackend())
+    try:
+        url = storage.upload_bytes("c/img.jpg", b"jpeg")
+        assert storage.download_bytes(storage.key_from_url(url)) == b"jpeg"
+
+        form = storage.presign_post("c/new.jpg", "image/jpeg", 1024)
+        fields = form["fields"]
+        policy = storage.verify_upload_policy(fields["policy"], fields["signature"])
+        assert policy["key"] == "c/new.jpg" and policy["max_bytes"] == 1024
+        try:
+            storage.verify_upload_policy(fields["policy"], "0" * 64)
+            assert False, "forged signature accepted"
+        except ValueError:
+            pass
+    finally:
+        storage.set_backend(None)
+
+
+def test_signing_secret_is_never_random(monkeypatch):
+    from backend.utils.storage import base
+    monkeypatch.delenv("STORAGE_SIGNING_SECRET", raising=False)
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "aws-secret")
+    # Derived from the S3 key: the same in every process
+    assert base._load_signing_secret() == base._load_signing_secret() != b"aws-secret"
+
+    monkeypatch.delenv("AWS_SECRET_ACCESS_KEY")
+    monkeypatch.setattr(base, "_SIGNING_SECRET", base._load_signing_secret())
+    with pytest.raises(RuntimeError):
+        storage.sign_upload_key("uploads/a.jpg")
+
+
+def test_upload_url_stream_overwrites_stable_key(memory_storage):
+    with tempfile.TemporaryDirectory() as root:
+        for body in (b"first video", b"second"):
+            path = os.path.join(root, "clip.mp4")
+            with open(path, "wb") as f:
+                f.write(body)
+            url = storage.upload_url_stream(f"file://{path}", "previews/task-1.mp4", "video/mp4")
+        assert storage.download_bytes(storage.key_from_url(url)) == b"second"
+        assert [o["key"] for o in storage.list_objects("previews/")] == ["previews/task-1.mp4"]
+
+
+def test_complete_upload_checks_token_and_bytes(memory_storage, monkeypatch):
+    from PIL import Image
+
+    backend = memory_storage
+    enqueued = []
+    monkeypatch.setattr(upload, "enqueue_derivatives", enqueued.append)
+    app = FastAPI()
+    app.include_router(upload.router, prefix="/api/upload")
+    client = TestClient(app)
+
+    png = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(png, format="PNG")
+    presigned = client.post("/api/upload/presign", json={"filename": "a.png", "content_type": "image/png"}).json()
+    backend.put(presigned["key"], png.getvalue(), "image/png")
+    # A key the API never presigned can't be registered
+    backend.put("bloggers/planted.png", png.getvalue(), "image/png")
+    forged = client.post("/api/upload/complete", json={"key": "bloggers/planted.png", "token": presigned["token"]})
+    assert forged.status_code == 403
+
+    done = client.post("/api/upload/complete", json={"key": presigned["key"], "token": presigned["token"]})
+    assert done.status_code == 200 and enqueued == [presigned["key"]]
+
+    # Declared as an image, but the bytes aren't one
+    fake = client.post("/api/upload/presign", json={"filename": "b.png", "content_type": "image/png"}).json()
+    backend.put(fake["key"], b"<html>not an image</html>", "image/png")
+    rejected = client.post("/api/upload/complete", json={"key": fake["key"], "token": fake["token"]})
+    assert rejected.status_code == 400 and not backend.exists(fake["key"])
+
+
+@pytest.fixture
+def small_pool(memory_storage, use_engine, monkeypatch):
+    """A one-slot blocking pool for the real app"""
+    from backend.utils import executor
+    from backend.utils.storage import dedup
+    use_engine(dedup)
+    pool = executor.BoundedExecutor("test", max_workers=1, max_queued=0)
+    monkeypatch.setattr(executor, "blocking_pool", pool)
+    return pool
+
+
+def test_saturated_pool_answers_429(client, small_pool):
+    small_pool._slots.acquire()
+    r = client.post("/api/upload/image", files={"file": ("a.png", b"png bytes", "image/png")})
+    assert r.status_code == 429 and r.headers["Retry-After"] == "5"
+
+
+def test_landed_upload_is_not_answered_429(client, small_pool, monkeypatch):
+    from backend.utils import executor
+    enqueued = []
+    monkeypatch.setattr(upload, "enqueue_derivatives", enqueued.append)
+
+    async def run_then_saturate(func, *args, **kwargs):
+        result = await executor.run_blocking(func, *args, **kwargs)
+        # Other requests take the whole pool right after the upload lands
+        while small_pool._slots.acquire(blocking=False):
+            pass
+        return result
+
+    monkeypatch.setattr(upload, "run_blocking", run_then_saturate)
+    r = client.post("/api/upload/image", files={"file": ("a.png", b"png bytes", "image/png")})
+    assert r.status_code == 200
+    assert enqueued == [storage.key_from_url(r.json()["url"])]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,84 @@
+"""
+Test content-hash upload dedup and the duplicate report
+Run with: python -m backend.test_storage_dedup
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.db import models
+from backend.utils.storage import dedup
+from backend import storage_dedup_report
+
+
+@pytest.fixture
+def backend(use_engine, memory_storage):
+    use_engine(dedup)
+    return memory_storage
+
+
+def test_identical_bytes_upload_once(engine, backend):
+    url, uploaded = dedup.store_bytes(b"frame", key="fashion/a.jpg", content_type="image/jpeg")
+    assert uploaded
+    again, uploaded = dedup.store_bytes(b"frame", key="fashion/b.jpg", content_type="image/jpeg")
+    assert again == url and not uploaded
+    assert not backend.exists("fashion/b.jpg")
+
+    preview, uploaded = dedup.store_bytes(b"preview", prefix="previews", content_type="image/jpeg")
+    assert uploaded and preview.endswith(f"previews/{dedup.sha256_hex(b'preview')}.jpg")
+
+    # Object removed outside the index: uploaded again
+    backend.delete("fashion/a.jpg")
+    url, uploaded = dedup.store_bytes(b"frame", key="fashion/c.jpg")
+    assert uploaded and url.endswith("fashion/c.jpg")
+    with Session(engine) as s:
+        assert s.get(models.StoredObject, dedup.sha256_hex(b"frame")).key == "fashion/c.jpg"
+
+    dedup.forget(["fashion/c.jpg"])
+    with Session(engine) as s:
+        assert s.get(models.StoredObject, dedup.sha256_hex(b"frame")) is None
+
+
+def test_stable_key_rewritten_only_when_bytes_change(engine, backend, monkeypatch):
+    puts = []
+    put = backend.put
+    monkeypatch.setattr(backend, "put", lambda key, data, ctype=None: puts.append(key) or put(key, data, ctype))
+    key = "previews/task-1.mp4"
+
+    url, uploaded = dedup.store_stream([b"vid", b"eo-1"], key, "video/mp4")
+    assert uploaded and backend.get(key) == b"video-1"
+    # Same bytes again (a retried job): no PUT
+    again, uploaded = dedup.store_stream([b"video-1"], key, "video/mp4")
+    assert again == url and not uploaded and puts == [key]
+
+    # Regenerated: overwritten, and the old digest no longer points at the key
+    _, uploaded = dedup.store_stream([b"video-2"], key, "video/mp4")
+    assert uploaded and backend.get(key) == b"video-2"
+    with Session(engine) as s:
+        assert s.get(models.StoredObject, dedup.sha256_hex(b"video-1")) is None
+        assert s.get(models.StoredObject, dedup.sha256_hex(b"video-2")).key == key
+    _, uploaded = dedup.store_stream([b"video-1"], key, "video/mp4")
+    assert uploaded and backend.get(key) == b"video-1"
+
+
+def test_report_finds_duplicates(backend):
+    backend.put("fashion/1.jpg", b"same")
+    backend.put("fashion/2.jpg", b"same")
+    backend.put("fashion/3.jpg", b"diff")
+    backend.put("derivatives/fashion/1/thumb.webp", b"same")
+    report = storage_dedup_report.dedup_report(index=True)
+    assert report["objects"] == 3
+    assert report["duplicate_groups"] == 1
+    assert report["groups"][0]["keys"] == ["fashion/1.jpg", "fashion/2.jpg"]
+    assert report["redundant_bytes"] == 4
+
+    # The index now short-circuits uploads of existing bytes
+    url, uploaded = dedup.store_bytes(b"diff", key="fashion/4.jpg")
+    assert not uploaded and url.endswith("fashion/3.jpg")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
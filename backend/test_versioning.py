@@ -0,0 +1,103 @@
+"""
+Test delta-compressed task versions: round trips, snapshot cadence and paging
+Run with: python -m backend.test_versioning
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.db import models
+from backend.routes import assistant
+from backend.utils import versioning
+
+SCRIPT = "\n".join(f"Line {i}: the host talks about topic number {i} in some detail." for i in range(60))
+
+
+@pytest.fixture
+def task_id(engine):
+    with Session(engine) as s:
+        blogger = models.Blogger(name="Versions", type="podcaster")
+        s.add(blogger)
+        s.flush()
+        task = models.ContentTask(blogger_id=blogger.id, date="2024-12-01", content_type="podcast")
+        s.add(task)
+        s.commit()
+        return task.id
+
+
+def test_delta_round_trip():
+    old = "Привет, мир!  Second line.\nThird"
+    new = "Привет, дорогой мир! Second line.\nThird and fourth"
+    assert versioning.apply_delta(old, versioning.make_delta(old, new)) == new
+    assert versioning.apply_delta("", versioning.make_delta("", new)) == new
+    assert versioning.apply_delta(old, versioning.make_delta(old, "")) == ""
+
+
+def test_versions_api(engine, client, task_id):
+    texts, ids = [], []
+    text = SCRIPT
+    for i in range(versioning.SNAPSHOT_EVERY + 5):
+        text = text.replace(f"topic number {i} ", f"edited topic {i} ")
+        texts.append(text)
+        resp = client.post("/api/assistant/versions", json={"task_id": task_id, "content": text})
+        assert resp.status_code == 200
+        ids.append(resp.json()["id"])
+
+    with Session(engine) as s:
+        rows = s.query(models.TaskVersion).order_by(models.TaskVersion.id).all()
+        snapshots = [v.id for v in rows if v.delta is None]
+        assert snapshots == [ids[0], ids[versioning.SNAPSHOT_EVERY]]
+        stored = sum(len(v.content or v.delta) for v in rows)
+        assert stored < 3 * len(SCRIPT), stored
+
+    # Saving the same text again doesn't add a version
+    resp = client.post("/api/assistant/versions", json={"task_id": task_id, "content": texts[-1]})
+    assert resp.json()["id"] == ids[-1]
+
+    seen, seen_snapshots = [], []
+    before_id = None
+    while True:
+        params = {"limit": 10, **({"before_id": before_id} if before_id else {})}
+        page = client.get(f"/api/assistant/versions/{task_id}", params=params).json()
+        assert all("content" not in item for item in page["items"])
+        seen += [item["id"] for item in page["items"]]
+        seen_snapshots += [item["id"] for item in page["items"] if item["is_snapshot"]]
+        before_id = page["next_before_id"]
+        if before_id is None:
+            break
+    assert seen == ids[::-1]
+    assert seen_snapshots == snapshots[::-1]
+
+    for idx in (0, 7, versioning.SNAPSHOT_EVERY - 1, versioning.SNAPSHOT_EVERY, len(ids) - 1):
+        body = client.get(f"/api/assistant/versions/{task_id}/{ids[idx]}").json()
+        assert body["content"] == texts[idx]
+    assert client.get(f"/api/assistant/versions/{task_id}/999999").status_code == 404
+
+
+@pytest.mark.parametrize("fails", [False, True])
+def test_streamed_reply_saved_only_when_complete(engine, client, task_id, memory_limiter, monkeypatch, fails):
+    def stream_text(prompt, **kwargs):
+        yield "Hello"
+        yield ", world"
+        if fails:
+            raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(assistant, "stream_text", stream_text)
+    monkeypatch.setattr(assistant, "SessionLocal", sessionmaker(bind=engine))
+    r = client.post("/api/assistant/stream", json={"message": "hi", "task_id": task_id})
+    assert r.status_code == 200
+    assert r.text.count("event: error") == int(fails) and r.text.count("event: done") == int(not fails)
+
+    with Session(engine) as s:
+        versions = s.query(models.TaskVersion).filter_by(task_id=task_id, kind="assistant").all()
+        if fails:
+            assert versions == []  # The partial "Hello, world" is not kept
+        else:
+            assert [versioning.version_content(s, v) for v in versions] == ["Hello, world"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
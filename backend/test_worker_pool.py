@@ -0,0 +1,100 @@
+"""
+Test the threaded worker pool: drain on SIGTERM, slot respawn and the periodic lock
+Run with: python -m backend.test_worker_pool
+"""
+import sys
+import os
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fakeredis import FakeStrictRedis
+from rq import Queue
+
+from backend.workers import asset_worker, mirror_worker, pregeneration_worker, worker_entry
+
+STARTED = threading.Event()
+FINISHED = []
+
+
+def slow_job(name):
+    STARTED.set()
+    time.sleep(1)
+    FINISHED.append(name)
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setattr(worker_entry, "POLL_INTERVAL", 1)
+    for module, name in (
+        (mirror_worker, "reconcile_mirrors"),
+        (asset_worker, "prune_assets"),
+        (pregeneration_worker, "pregenerate"),
+    ):
+        monkeypatch.setattr(module, name, lambda: None)
+    STARTED.clear()
+    FINISHED.clear()
+    return FakeStrictRedis()
+
+
+def test_drain_finishes_running_job_and_takes_no_new_ones(conn):
+    queue = Queue("default", connection=conn)
+    queue.enqueue(slow_job, "first")
+    pool = worker_entry.WorkerPool(conn, 1)
+    pool.start()
+    assert STARTED.wait(10)
+    queue.enqueue(slow_job, "second")
+
+    pool.drain()
+    pool.wait()
+
+    assert FINISHED == ["first"]
+    assert len(queue) == 1
+    assert not any(t.is_alive() for t in pool.threads)
+
+
+def test_dead_slot_is_respawned(conn, monkeypatch):
+    pool = worker_entry.WorkerPool(conn, 2)
+    pool.start()
+    dead = pool.threads[0]
+    pool.workers[0].drain()
+    dead.join(10)
+
+    pool.supervise()
+    assert pool.threads[0] is not dead and pool.threads[0].is_alive()
+    assert pool.threads[0].name != dead.name
+
+    Queue("default", connection=conn).enqueue(slow_job, "after-respawn")
+    _wait_for(lambda: FINISHED)
+    pool.drain()
+    pool.wait()
+    assert not any(t.is_alive() for t in pool.threads)
+
+
+def test_periodic_task_runs_once_per_interval_across_pools(conn, monkeypatch):
+    calls = []
+    monkeypatch.setattr(mirror_worker, "reconcile_mirrors", lambda: calls.append(1))
+    pools = [worker_entry.WorkerPool(conn, 1) for _ in range(3)]
+    for pool in pools:
+        pool.start()
+    _wait_for(lambda: conn.exists(worker_entry.RECONCILE_LOCK))
+    time.sleep(0.2)
+    assert calls == [1]
+    assert 0 < conn.ttl(worker_entry.RECONCILE_LOCK) <= worker_entry.MIRROR_RECONCILE_INTERVAL
+
+    for pool in pools:
+        pool.drain()
+    for pool in pools:
+        pool.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,179 @@
+"""
+Versioned blogger context cache shared by routes and workers.
+
+Blogger rows carry large JSON columns (locations, outfits, animation frames)
+that nearly every generation endpoint re-reads. The parsed row is cached:
+
+- in-process: {blogger_id: (version, context)}
+- in Redis:   blogger_ctx:{id}:v          -> current version (INCR on change)
+              blogger_ctx:{id}:{version}  -> JSON context (expires after CONTEXT_TTL)
+
+A lookup costs one Redis GET for the version; the local copy is used if the
+version matches. Any ORM insert/update/delete of a Blogger bumps the version
+once its session commits (listeners at the bottom of this module), so every
+process drops its stale copy. Without Redis the local copy is trusted for
+LOCAL_TTL seconds only.
+
+Routes and workers read blogger fields from here; db/queries.py loaders only
+load task columns.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from ..db import models
+
+CONTEXT_TTL = 3600
+LOCAL_TTL = 30
+# After a Redis error, don't retry it for this many seconds
+REDIS_BACKOFF = 30
+
+
+@dataclass(frozen=True)
+class BloggerContext:
+    """Read-only snapshot of a Blogger row (do not mutate the lists/dicts)"""
+    id: int
+    name: str
+    type: str
+    image: Optional[str] = None
+    tone_of_voice: Optional[str] = None
+    theme: Optional[str] = None
+    voice_id: Optional[str] = None
+    locations: Optional[list] = None
+    outfits: Optional[list] = None
+    editing_types_enabled: Optional[list] = None
+    subtitles_enabled: Optional[int] = None
+    face_image: Optional[str] = None
+    face_prompt: Optional[str] = None
+    animation_frames: Optional[list] = None
+    content_schedule: Optional[dict] = None
+    content_types: Optional[dict] = None
+
+    @classmethod
+    def from_model(cls, blogger: models.Blogger) -> "BloggerContext":
+        return cls(**{f.name: getattr(blogger, f.name) for f in fields(cls)})
+
+    def location(self, index: Optional[int]) -> Optional[dict]:
+        if index is None or not self.locations or not 0 <= index < len(self.locations):
+            return None
+        return self.locations[index]
+
+
+_local = {}
+_local_lock = threading.Lock()
+_redis = None
+_redis_down_until = 0.0
+
+
+def _redis_client():
+    global _redis
+    if time.monotonic() < _redis_down_until:
+        return None
+    if _redis is None:
+        from redis import Redis
+        url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        # Short timeouts: a slow cache must never be slower than the DB it replaces
+        _redis = Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+    return _redis
+
+
+def _redis_failed(e: Exception) -> None:
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + REDIS_BACKOFF
+    print(f"[Blogger Cache] Redis unavailable, using local cache only: {e}")
+
+
+def _version_key(blogger_id: int) -> str:
+    return f"blogger_ctx:{blogger_id}:v"
+
+
+def get_blogger_context(db: Session, blogger_id: int) -> Optional[BloggerContext]:
+    """Cached context for a blogger, loading the row only on a miss"""
+    redis = _redis_client()
+    version = None
+    if redis is not None:
+        try:
+            version = int(redis.get(_version_key(blogger_id)) or 0)
+        except Exception as e:
+            _redis_failed(e)
+            redis = None
+
+    with _local_lock:
+        cached = _local.get(blogger_id)
+    if cached:
+        cached_version, ctx, loaded_at = cached
+        if version is not None and cached_version == version:
+            return ctx
+        if version is None and time.monotonic() - loaded_at < LOCAL_TTL:
+            return ctx
+
+    ctx = None
+    if redis is not None:
+        try:
+            raw = redis.get(f"blogger_ctx:{blogger_id}:{version}")
+            if raw:
+                ctx = BloggerContext(**json.loads(raw))
+        except Exception as e:
+            _redis_failed(e)
+            redis = None
+
+    if ctx is None:
+        blogger = db.query(models.Blogger).get(blogger_id)
+        if not blogger:
+            return None
+        ctx = BloggerContext.from_model(blogger)
+        if redis is not None:
+            try:
+                redis.set(f"blogger_ctx:{blogger_id}:{version}", json.dumps(asdict(ctx)), ex=CONTEXT_TTL)
+            except Exception as e:
+                _redis_failed(e)
+
+    with _local_lock:
+        _local[blogger_id] = (version, ctx, time.monotonic())
+    return ctx
+
+
+def invalidate_blogger(blogger_id: int) -> None:
+    """Drop the cached context; runs automatically when a session commits a Blogger change"""
+    with _local_lock:
+        _local.pop(blogger_id, None)
+    redis = _redis_client()
+    if redis is None:
+        return
+    try:
+        redis.incr(_version_key(blogger_id))
+    except Exception as e:
+        _redis_failed(e)
+
+
+# Invalidation on commit: changed ids are collected per session while it
+# flushes and dropped from the cache only once the change is visible
+
+_CHANGED = "blogger_cache_changed"
+
+
+def _blogger_changed(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None and target.id is not None:
+        session.info.setdefault(_CHANGED, set()).add(target.id)
+
+
+def _session_committed(session) -> None:
+    for blogger_id in session.info.pop(_CHANGED, ()):
+        invalidate_blogger(blogger_id)
+
+
+def _session_rolled_back(session) -> None:
+    session.info.pop(_CHANGED, None)
+
+
+for _name in ("after_insert", "after_update", "after_delete"):
+    event.listen(models.Blogger, _name, _blogger_changed)
+event.listen(Session, "after_commit", _session_committed)
+event.listen(Session, "after_rollback", _session_rolled_back)
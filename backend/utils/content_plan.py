@@ -0,0 +1,15 @@
+"""
+Content plan batching, shared by POST /api/generate/content-plan (governor
+admission) and workers/content_plan_worker.py (the batched LLM calls).
+
+Lives here so the route can size its admission without importing the worker.
+"""
+import math
+
+# Dates planned per LLM call - a month takes three calls
+DAYS_PER_CALL = 10
+
+
+def plan_calls(days: int) -> int:
+    """LLM calls needed to plan `days` dates"""
+    return math.ceil(days / DAYS_PER_CALL)
@@ -1,3 +1,251 @@
-def generate_voice(text: str, voice_id: str | None = None) -> str:
-    # TODO: call ElevenLabs
-    return "https://example.com/voice-demo.mp3"
+"""
+Text-to-speech via ElevenLabs: long scripts are split at sentence boundaries,
+chunks are synthesized concurrently and streamed into S3 in order.
+Sentence audio is cached in S3 so re-generating an edited script only
+synthesizes the sentences that changed.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+import urllib.error
+import urllib.request
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+from uuid import uuid4
+
+from .governor import throttle
+
+DEMO_VOICE_URL = "https://example.com/voice-demo.mp3"
+
+# Overridable so tests can point at a local fake server
+API_BASE = os.getenv("ELEVENLABS_API_BASE", "https://api.elevenlabs.io")
+DEFAULT_MODEL = os.getenv("ELEVENLABS_MODEL", "eleven_multilingual_v2")
+DEFAULT_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
+OUTPUT_FORMAT = "mp3_44100_128"
+
+# Characters per request; shorter chunks start playing sooner and parallelize better
+MAX_CHUNK_CHARS = int(os.getenv("ELEVENLABS_CHUNK_CHARS", "1000"))
+# Concurrent requests allowed by the subscription tier
+CONCURRENCY = int(os.getenv("ELEVENLABS_CONCURRENCY", "3"))
+MAX_RETRIES = 4
+# Sentence-level audio cache in S3; ELEVENLABS_CACHE=0 synthesizes whole
+# chunks instead (fewer requests, prosody carried across sentences)
+CACHE_ENABLED = os.getenv("ELEVENLABS_CACHE", "1") == "1"
+CACHE_PREFIX = "tts-cache"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split on sentence-ending punctuation and paragraph breaks"""
+    sentences = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        for sentence in _SENTENCE_END.split(paragraph.strip()):
+            sentence = " ".join(sentence.split())
+            if sentence:
+                sentences.append(sentence)
+    return sentences
+
+
+def chunk_text(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """Group whole sentences into chunks of at most max_chars (overlong sentences split at spaces)"""
+    chunks = []
+    current = ""
+    for sentence in split_sentences(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """Seconds to wait before a retry: Retry-After as seconds or an HTTP date, else exponential backoff"""
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return 0.5 * 2 ** attempt
+
+
+def synthesize_chunk(text: str, voice_id: str, model: str = DEFAULT_MODEL) -> bytes:
+    """One TTS request; retries with backoff when the account's concurrency limit is hit"""
+    throttle("elevenlabs")
+    req = urllib.request.Request(
+        f"{API_BASE}/v1/text-to-speech/{voice_id}/stream?output_format={OUTPUT_FORMAT}",
+        data=json.dumps({"text": text, "model_id": model}).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "audio/mpeg",
+            "xi-api-key": os.getenv("ELEVENLABS_API_KEY", ""),
+        },
+        method="POST",
+    )
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                return resp.read()
+        except urllib.error.HTTPError as e:
+            if e.code not in (429, 503) or attempt == MAX_RETRIES:
+                raise
+            time.sleep(retry_delay(e.headers.get("Retry-After"), attempt))
+
+
+def _ordered_map(func, items: Iterable, concurrency: int) -> Iterator:
+    """
+    Run func over items in a thread pool, yielding results in input order.
+    At most `concurrency` calls are in flight, so finished-but-not-yet-yielded
+    results never grow beyond that window.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="tts") as pool:
+        pending = deque()
+        for item in items:
+            if len(pending) >= concurrency:
+                yield pending.popleft().result()
+            pending.append(pool.submit(func, item))
+        while pending:
+            yield pending.popleft().result()
+
+
+def synthesize_chunks(
+    chunks: Iterable[str],
+    voice_id: str,
+    model: str = DEFAULT_MODEL,
+    concurrency: int = CONCURRENCY,
+) -> Iterator[bytes]:
+    """Synthesize chunks concurrently, yielding audio in script order"""
+    return _ordered_map(lambda chunk: synthesize_chunk(chunk, voice_id, model), chunks, concurrency)
+
+
+def normalize_sentence(sentence: str) -> str:
+    """Cache-key form of a sentence: NFC, collapsed whitespace (case and punctuation affect prosody)"""
+    return " ".join(unicodedata.normalize("NFC", sentence).split())
+
+
+def sentence_units(script: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """One unit per sentence; only sentences longer than max_chars are split further"""
+    return [piece for sentence in split_sentences(script) for piece in chunk_text(sentence, max_chars)]
+
+
+class SentenceCache:
+    """
+    Audio segments in S3 keyed by (voice_id, model, normalized sentence):
+    tts-cache/{voice_id}/{model}/{sha256}.mp3, one object per sentence.
+
+    Segments are registered in stored_objects like other uploads, so lookup()
+    finds the hits of a whole script in one query instead of a request per
+    sentence. Parallel jobs never overwrite each other's entries.
+    """
+
+    def __init__(self, voice_id: str, model: str):
+        self.prefix = f"{CACHE_PREFIX}/{voice_id}/{model}"
+        self.voice_id = voice_id
+        self.model = model
+        self.hits = 0
+        self._cached = set()
+        self._lock = threading.Lock()
+
+    def key_for(self, sentence: str) -> str:
+        raw = f"{self.voice_id}\x00{self.model}\x00{normalize_sentence(sentence)}"
+        return f"{self.prefix}/{hashlib.sha256(raw.encode('utf-8')).hexdigest()}.mp3"
+
+    def lookup(self, sentences: Iterable[str]) -> None:
+        """Find which of the sentences are cached (one index query)"""
+        from .storage.dedup import indexed_keys
+        self._cached = indexed_keys({self.key_for(s) for s in sentences})
+
+    def audio_for(self, sentence: str) -> bytes:
+        """Cached segment if lookup() found it, otherwise synthesize and store it"""
+        from .storage import download_bytes, upload_bytes
+        from .storage.dedup import index_object, sha256_hex
+
+        key = self.key_for(sentence)
+        if key in self._cached:
+            try:
+                audio = download_bytes(key)
+                with self._lock:
+                    self.hits += 1
+                return audio
+            except Exception as e:
+                print(f"[ElevenLabs] Cached segment {key} unreadable, re-synthesizing: {e}")
+
+        audio = synthesize_chunk(normalize_sentence(sentence), self.voice_id, self.model)
+        upload_bytes(key, audio, "audio/mpeg")
+        index_object(sha256_hex(audio), key, len(audio), "audio/mpeg")
+        return audio
+
+
+def generate_audio_elevenlabs(
+    script: str,
+    voice_id: Optional[str] = None,
+    key: Optional[str] = None,
+    model: Optional[str] = None,
+) -> str:
+    """
+    Synthesize a script and stream the concatenated MP3 into S3. A caller's
+    fixed key goes through the dedup index (storage.dedup.store_stream).
+
+    Returns:
+        Public URL of the audio (demo URL when ElevenLabs is not configured)
+    """
+    if not os.getenv("ELEVENLABS_API_KEY"):
+        return DEMO_VOICE_URL
+
+    from .storage import upload_stream
+    from .storage.dedup import store_stream
+
+    voice_id = voice_id or DEFAULT_VOICE_ID
+    model = model or DEFAULT_MODEL
+    fixed_key = key is not None
+    key = key or f"audio/{uuid4()}.mp3"
+    started = time.monotonic()
+
+    def upload(chunks: Iterable[bytes]) -> str:
+        if fixed_key:
+            # Per-task keys are overwritten; identical audio (same script and voice) is not sent again
+            return store_stream(chunks, key, "audio/mpeg")[0]
+        return upload_stream(key, chunks, "audio/mpeg")
+
+    if CACHE_ENABLED:
+        # Sentence units: unchanged sentences are spliced in from the cache
+        units = sentence_units(script)
+        if not units:
+            raise ValueError("Script is empty")
+        cache = SentenceCache(voice_id, model)
+        cache.lookup(units)
+        url = upload(_ordered_map(cache.audio_for, units, CONCURRENCY))
+        print(f"[ElevenLabs] {len(units)} sentences ({cache.hits} cached), {len(script)} chars -> {key} in {time.monotonic() - started:.1f}s")
+        return url
+
+    chunks = chunk_text(script)
+    if not chunks:
+        raise ValueError("Script is empty")
+    url = upload(synthesize_chunks(chunks, voice_id, model))
+    print(f"[ElevenLabs] {len(chunks)} chunks, {len(script)} chars -> {key} in {time.monotonic() - started:.1f}s")
+    return url
+
+
+def generate_voice(text: str, voice_id: str | None = None, key: str | None = None) -> str:
+    return generate_audio_elevenlabs(text, voice_id, key=key)
@@ -0,0 +1,52 @@
+"""
+Bounded thread pool for blocking calls (S3, OpenAI) made from async route handlers
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorBusy(RuntimeError):
+    """Every worker thread and queue slot is taken - the API answers 429"""
+
+    def __init__(self, name: str, retry_after: int = 5):
+        super().__init__(f"{name} pool is saturated")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a hard cap on in-flight work (running + waiting).
+    When the cap is reached new calls fail fast with ExecutorBusy instead of
+    piling up behind slow providers.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queued: int):
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+
+    async def run(self, func, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusy(self.name)
+        try:
+            future = self._pool.submit(func, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        # Release when the thread finishes, not when the awaiting request goes away
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+
+blocking_pool = BoundedExecutor(
+    "blocking",
+    max_workers=int(os.getenv("BLOCKING_POOL_SIZE", "16")),
+    max_queued=int(os.getenv("BLOCKING_POOL_QUEUE", "32")),
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call off the event loop; raises ExecutorBusy when saturated"""
+    return await blocking_pool.run(func, *args, **kwargs)
@@ -2,11 +2,14 @@ import os
 import json
 import urllib.request
 
+from .governor import throttle
+
 
 def _fal_call(path: str, payload: dict) -> dict | None:
     api_key = os.getenv("FAL_API_KEY")
     if not api_key:
         return None
+    throttle("fal")
     url = f"https://fal.run/{path}"
     req = urllib.request.Request(
         url,
@@ -0,0 +1,301 @@
+"""
+Rate and budget governor for paid provider calls (FAL, OpenAI, ElevenLabs).
+
+Two layers:
+- admit(): called by routes before starting paid work. Token buckets per
+  blogger, per endpoint and global, plus daily cost budgets (global and
+  per blogger) charged with an estimated cost. Raises RateLimited, which
+  the API answers with 429 + Retry-After.
+- throttle(): called right before each provider request (routes and
+  workers alike). Paces calls per provider, waiting up to MAX_WAIT for a
+  token instead of sending bursts that come back as provider 429s.
+
+State lives in Redis (one Lua script per decision, so concurrent API
+processes and workers share the buckets). If Redis is unreachable a
+process-local limiter with the same rules takes over.
+"""
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+ENABLED = os.getenv("GOVERNOR_ENABLED", "1") == "1"
+# Longest throttle() waits for a provider token before giving up
+MAX_WAIT = float(os.getenv("GOVERNOR_MAX_WAIT", "30"))
+
+
+def _rate(name: str, per_minute: str, burst: str) -> Tuple[float, float]:
+    """(tokens per second, bucket capacity) from GOVERNOR_<NAME>_PER_MIN / _BURST"""
+    return (
+        float(os.getenv(f"GOVERNOR_{name}_PER_MIN", per_minute)) / 60,
+        float(os.getenv(f"GOVERNOR_{name}_BURST", burst)),
+    )
+
+
+GLOBAL_RATE = _rate("GLOBAL", "120", "30")
+ENDPOINT_RATE = _rate("ENDPOINT", "30", "10")
+BLOGGER_RATE = _rate("BLOGGER", "12", "4")
+PROVIDER_RATES = {
+    "fal": _rate("FAL", "60", "10"),
+    "openai": _rate("OPENAI", "300", "50"),
+    "elevenlabs": _rate("ELEVENLABS", "60", "10"),
+}
+
+# Estimated USD per unit (one image, one video, one completion, one TTS chunk)
+COSTS = {
+    "fal_image": float(os.getenv("GOVERNOR_COST_FAL_IMAGE", "0.03")),
+    "fal_video": float(os.getenv("GOVERNOR_COST_FAL_VIDEO", "0.40")),
+    "openai": float(os.getenv("GOVERNOR_COST_OPENAI", "0.002")),
+    "elevenlabs": float(os.getenv("GOVERNOR_COST_ELEVENLABS", "0.03")),
+}
+# 0 disables a budget
+DAILY_BUDGET_USD = float(os.getenv("GOVERNOR_DAILY_BUDGET_USD", "50"))
+BLOGGER_DAILY_BUDGET_USD = float(os.getenv("GOVERNOR_BLOGGER_DAILY_BUDGET_USD", "15"))
+
+# Budgets are counted in micro-dollars so Redis can use integer INCRBY
+_MICROS = 1_000_000
+_BUDGET_TTL = 2 * 24 * 3600
+
+
+class RateLimited(RuntimeError):
+    """A bucket is empty or a daily budget is spent - the API answers 429"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+# (key, tokens per second, capacity, units)
+Bucket = Tuple[str, float, float, float]
+# (key, cost, limit) in micro-dollars
+Budget = Tuple[str, int, int]
+
+
+class MemoryLimiter:
+    """Process-local buckets and budgets (tests, and fallback when Redis is down)"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._spend = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets: List[Bucket], budgets: List[Budget], now: float) -> Tuple[str, int, float]:
+        """("ok", 0, 0), ("budget", index, 0) or ("rate", index, seconds to wait)"""
+        with self._lock:
+            levels = []
+            wait, blocked = 0.0, -1
+            for i, (key, rate, capacity, units) in enumerate(buckets):
+                tokens, ts = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+                levels.append(tokens)
+                if tokens < units and (units - tokens) / rate > wait:
+                    wait, blocked = (units - tokens) / rate, i
+            for i, (key, cost, limit) in enumerate(budgets):
+                if limit > 0 and self._spend.get(key, 0) + cost > limit:
+                    return "budget", i, 0.0
+            if blocked >= 0:
+                return "rate", blocked, wait
+            for (key, _, _, units), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - units, now)
+            for key, cost, _ in budgets:
+                self._spend[key] = self._spend.get(key, 0) + cost
+            return "ok", 0, 0.0
+
+    def spent(self, key: str) -> int:
+        with self._lock:
+            return self._spend.get(key, 0)
+
+
+# Same decision as MemoryLimiter.take, atomically in Redis.
+# KEYS: bucket keys then budget keys. ARGV: now, bucket count,
+# (rate, capacity, units) per bucket, (cost, limit) per budget, budget ttl.
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local nb = tonumber(ARGV[2])
+local levels = {}
+local wait, blocked = 0, -1
+for k = 1, nb do
+  local a = 3 + (k - 1) * 3
+  local rate, cap, units = tonumber(ARGV[a]), tonumber(ARGV[a + 1]), tonumber(ARGV[a + 2])
+  local state = redis.call('HMGET', KEYS[k], 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or cap
+  local ts = tonumber(state[2]) or now
+  tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+  levels[k] = tokens
+  if tokens < units and (units - tokens) / rate > wait then
+    wait, blocked = (units - tokens) / rate, k - 1
+  end
+end
+local b = 3 + nb * 3
+for k = nb + 1, #KEYS do
+  local a = b + (k - nb - 1) * 2
+  local cost, limit = tonumber(ARGV[a]), tonumber(ARGV[a + 1])
+  local spent = tonumber(redis.call('GET', KEYS[k]) or '0')
+  if limit > 0 and spent + cost > limit then
+    return {'budget', k - nb - 1, '0'}
+  end
+end
+if blocked >= 0 then
+  return {'rate', blocked, tostring(wait)}
+end
+for k = 1, nb do
+  local a = 3 + (k - 1) * 3
+  local rate, cap, units = tonumber(ARGV[a]), tonumber(ARGV[a + 1]), tonumber(ARGV[a + 2])
+  redis.call('HSET', KEYS[k], 'tokens', tostring(levels[k] - units), 'ts', tostring(now))
+  redis.call('EXPIRE', KEYS[k], math.ceil(cap / rate) + 60)
+end
+local ttl = tonumber(ARGV[#ARGV])
+for k = nb + 1, #KEYS do
+  local a = b + (k - nb - 1) * 2
+  redis.call('INCRBY', KEYS[k], tonumber(ARGV[a]))
+  redis.call('EXPIRE', KEYS[k], ttl)
+end
+return {'ok', 0, '0'}
+"""
+
+
+class RedisLimiter:
+    def __init__(self, url: Optional[str] = None):
+        from redis import Redis
+        # Short timeouts: a slow Redis must not stall requests, the fallback takes over
+        self._redis = Redis.from_url(
+            url or os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            socket_timeout=0.5, socket_connect_timeout=0.5,
+        )
+        self._script = self._redis.register_script(_TAKE_SCRIPT)
+
+    def take(self, buckets: List[Bucket], budgets: List[Budget], now: float) -> Tuple[str, int, float]:
+        args = [now, len(buckets)]
+        for _, rate, capacity, units in buckets:
+            args += [rate, capacity, units]
+        for _, cost, limit in budgets:
+            args += [cost, limit]
+        args.append(_BUDGET_TTL)
+        status, index, wait = self._script(keys=[b[0] for b in buckets] + [b[0] for b in budgets], args=args)
+        return status.decode() if isinstance(status, bytes) else status, int(index), float(wait)
+
+    def spent(self, key: str) -> int:
+        return int(self._redis.get(key) or 0)
+
+
+# After a Redis error the process-local limiter is used for this long
+REDIS_RETRY_AFTER = 30
+
+_limiter = None
+_fallback = MemoryLimiter()
+_limiter_lock = threading.Lock()
+_redis_down_until = 0.0
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RedisLimiter()
+    return _limiter
+
+
+def set_limiter(limiter) -> None:
+    """Swap the shared limiter (tests); None goes back to Redis"""
+    global _limiter, _redis_down_until
+    with _limiter_lock:
+        _limiter = limiter
+        _redis_down_until = 0.0
+
+
+def _take(buckets: List[Bucket], budgets: List[Budget]) -> Tuple[str, int, float]:
+    global _redis_down_until
+    now = time.time()
+    if now >= _redis_down_until:
+        try:
+            return get_limiter().take(buckets, budgets, now)
+        except Exception as e:
+            # Don't pay a connect timeout on every request while Redis is down
+            _redis_down_until = now + REDIS_RETRY_AFTER
+            print(f"[Governor] Redis unavailable, limiting per process for {REDIS_RETRY_AFTER}s: {e}")
+    return _fallback.take(buckets, budgets, now)
+
+
+def _bucket(key: str, rate: Tuple[float, float], units: float) -> Bucket:
+    per_second, capacity = rate
+    # A request larger than the bucket could never be admitted
+    return (key, per_second, capacity, min(units, capacity))
+
+
+def _seconds_to_midnight() -> float:
+    now = datetime.utcnow()
+    return (datetime(now.year, now.month, now.day) + timedelta(days=1) - now).total_seconds()
+
+
+def spend_key(blogger_id: Optional[int] = None, day: Optional[str] = None) -> str:
+    day = day or datetime.utcnow().strftime("%Y%m%d")
+    return f"gov:spend:{day}:" + (f"blogger:{blogger_id}" if blogger_id is not None else "global")
+
+
+def estimate_cost(cost_kind: Optional[str], units: int = 1) -> float:
+    return COSTS.get(cost_kind, 0.0) * units if cost_kind else 0.0
+
+
+def admit(endpoint: str, blogger_id: Optional[int] = None, cost_kind: Optional[str] = None, units: int = 1) -> None:
+    """
+    Admit one request that will start paid work, or raise RateLimited.
+
+    Args:
+        endpoint: Name of the calling endpoint (its own bucket)
+        blogger_id: Blogger the work is for (own bucket and daily budget)
+        cost_kind: Key of COSTS, used to charge the daily budgets
+        units: Number of images/videos/calls the request will produce
+    """
+    if not ENABLED:
+        return
+    buckets = [
+        _bucket("gov:bucket:global", GLOBAL_RATE, 1),
+        _bucket(f"gov:bucket:endpoint:{endpoint}", ENDPOINT_RATE, 1),
+    ]
+    if blogger_id is not None:
+        buckets.append(_bucket(f"gov:bucket:blogger:{blogger_id}", BLOGGER_RATE, 1))
+
+    cost = int(estimate_cost(cost_kind, units) * _MICROS)
+    budgets = []
+    if cost:
+        budgets.append((spend_key(), cost, int(DAILY_BUDGET_USD * _MICROS)))
+        if blogger_id is not None:
+            budgets.append((spend_key(blogger_id), cost, int(BLOGGER_DAILY_BUDGET_USD * _MICROS)))
+
+    status, index, wait = _take(buckets, budgets)
+    if status == "budget":
+        scope = "Daily generation budget" if budgets[index][0] == spend_key() else "Daily budget for this blogger"
+        raise RateLimited(f"{scope} is used up", _seconds_to_midnight())
+    if status == "rate":
+        scope = ("Too many generation requests", "Too many requests to this endpoint",
+                 "Too many requests for this blogger")[index]
+        raise RateLimited(scope, wait)
+
+
+def throttle(provider: str, units: int = 1, max_wait: Optional[float] = None) -> None:
+    """Wait for a provider token; raises RateLimited if none frees up within max_wait (default MAX_WAIT)"""
+    if not ENABLED or provider not in PROVIDER_RATES:
+        return
+    max_wait = MAX_WAIT if max_wait is None else max_wait
+    deadline = time.monotonic() + max_wait
+    bucket = _bucket(f"gov:bucket:provider:{provider}", PROVIDER_RATES[provider], units)
+    while True:
+        status, _, wait = _take([bucket], [])
+        if status == "ok":
+            return
+        if time.monotonic() + wait > deadline:
+            raise RateLimited(f"{provider} is at its rate limit", wait)
+        time.sleep(wait)
+
+
+def spent_today(blogger_id: Optional[int] = None) -> float:
+    """Estimated USD admitted today, globally or for one blogger"""
+    try:
+        micros = get_limiter().spent(spend_key(blogger_id))
+    except Exception:
+        micros = _fallback.spent(spend_key(blogger_id))
+    return micros / _MICROS
@@ -1,17 +1,64 @@
 """
 Image generation utilities using FAL.ai Seedream v4
 """
+import json
 import os
-import fal_client
-from typing import Optional
+from typing import List, Optional
+from urllib.parse import urlparse
 from uuid import uuid4
-from openai import OpenAI
 
-# Configure FAL client globally
-FAL_API_KEY = os.getenv("FAL_API_KEY")
-if FAL_API_KEY:
-    os.environ["FAL_KEY"] = FAL_API_KEY
-    fal_client.api_key = FAL_API_KEY
+from .governor import RateLimited, throttle
+from .image_processing import normalize_reference_image
+from .storage import download_bytes, key_from_url
+from .storage.dedup import store_url, store_urls
+
+# Seedream v4 returns at most this many images per call
+MAX_CANDIDATES = 6
+
+# SDKs are imported on first use: importing this module (every API process
+# does, via routes/bloggers) must not cost the ~1s fal_client + openai load.
+_fal_client = None
+_openai = None
+
+
+def _fal():
+    """fal_client, configured with FAL_API_KEY"""
+    global _fal_client
+    if _fal_client is None:
+        import fal_client
+        api_key = os.getenv("FAL_API_KEY")
+        if api_key:
+            os.environ["FAL_KEY"] = api_key
+            fal_client.api_key = api_key
+        _fal_client = fal_client
+    return _fal_client
+
+
+def _openai_client():
+    """Shared client so concurrent jobs reuse one HTTP connection pool"""
+    global _openai
+    if _openai is None:
+        from openai import OpenAI
+        _openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai
+
+
+def _is_fal_url(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return host == "fal.media" or host.endswith(".fal.media")
+
+
+_FRAME_SYSTEM_PROMPT = """Ты эксперт по генерации промптов для AI image generation (Seedream v4 edit mode).
+
+Пользователь даст описание эмоции/изменения для кадра анимации. Твоя задача:
+1. Расширить это в детальный промпт для вариации кадра
+2. Сохранить композицию и локацию (same location and pose)
+3. Изменить только выражение лица, жесты, эмоцию
+4. Промпт на английском
+
+Пример:
+Вход: "удивленное выражение"
+Выход: "Same person in the same location and pose, surprised expression with raised eyebrows and slightly open mouth, animated gesture, maintaining overall composition, high quality\""""
 
 
 def enhance_prompt_with_gpt(user_prompt: str, mode: str = "location") -> str:
@@ -25,7 +72,7 @@ def enhance_prompt_with_gpt(user_prompt: str, mode: str = "location") -> str:
     Returns:
         Enhanced detailed prompt for image generation
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = _openai_client()
     
     if mode == "location":
         system_prompt = """Ты эксперт по генерации промптов для AI image generation (Seedream v4 edit mode).
@@ -47,21 +94,10 @@ def enhance_prompt_with_gpt(user_prompt: str, mode: str = "location") -> str:
 
 Верни ТОЛЬКО итоговый промпт, без объяснений."""
     else:  # frame
-        system_prompt = """Ты эксперт по генерации промптов для AI image generation (Seedream v4 edit mode).
-
-Пользователь даст описание эмоции/изменения для кадра анимации. Твоя задача:
-1. Расширить это в детальный промпт для вариации кадра
-2. Сохранить композицию и локацию (same location and pose)
-3. Изменить только выражение лица, жесты, эмоцию
-4. Промпт на английском
-
-Пример:
-Вход: "удивленное выражение"
-Выход: "Same person in the same location and pose, surprised expression with raised eyebrows and slightly open mouth, animated gesture, maintaining overall composition, high quality"
-
-Верни ТОЛЬКО итоговый промпт, без объяснений."""
+        system_prompt = _FRAME_SYSTEM_PROMPT + "\n\nВерни ТОЛЬКО итоговый промпт, без объяснений."
     
     try:
+        throttle("openai")
         response = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
@@ -80,13 +116,105 @@ def enhance_prompt_with_gpt(user_prompt: str, mode: str = "location") -> str:
         return user_prompt
 
 
+def enhance_frame_prompts(user_prompts: List[str]) -> List[str]:
+    """
+    enhance_prompt_with_gpt(mode="frame") for a whole set of animation frames
+    in one GPT call. Prompts the model drops or mangles stay as given.
+    """
+    if len(user_prompts) == 1:
+        return [enhance_prompt_with_gpt(user_prompts[0], mode="frame")]
+    system_prompt = _FRAME_SYSTEM_PROMPT + f"""
+
+Пользователь пришлёт JSON-массив из {len(user_prompts)} описаний. Верни ТОЛЬКО JSON-массив итоговых промптов той же длины и в том же порядке, без объяснений."""
+    try:
+        throttle("openai")
+        response = _openai_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": json.dumps(user_prompts, ensure_ascii=False)}
+            ],
+            temperature=0.7,
+            max_tokens=300 * len(user_prompts)
+        )
+        text = response.choices[0].message.content
+        enhanced = json.loads(text[text.index("["):text.rindex("]") + 1])
+        if len(enhanced) != len(user_prompts):
+            raise ValueError(f"expected {len(user_prompts)} prompts, got {len(enhanced)}")
+        result = [e.strip() if isinstance(e, str) and e.strip() else p for e, p in zip(enhanced, user_prompts)]
+        print(f"[GPT] Enhanced {len(result)} frame prompts")
+        return result
+    except Exception as e:
+        print(f"[GPT] Batch enhancement failed: {e}, using original prompts")
+        return list(user_prompts)
+
+
 def generate_fashion_frame(
     prompt: str, 
     aspect_ratio: str = "9:16",
-    reference_image: Optional[str] = None
+    reference_image: Optional[str] = None,
+    mirror: bool = True,
+    enhance: bool = True,
 ) -> str:
+    """Generate a single fashion image - see generate_fashion_frames"""
+    return generate_fashion_frames(prompt, aspect_ratio, reference_image, num_images=1, mirror=mirror, enhance=enhance)[0]
+
+
+def upload_reference(reference_image: str) -> str:
+    """
+    Make a reference image readable by FAL: our own objects are downloaded with
+    credentials (S3 CORS/private buckets), downscaled and uploaded to FAL
+    storage. Returns the FAL URL; FAL URLs are returned as is, so a reference
+    shared by several generations is uploaded once.
     """
-    Generate a fashion image using FAL.ai Seedream v4
+    if _is_fal_url(reference_image):
+        # An earlier result not yet mirrored to S3 - FAL can read it as is
+        return reference_image
+    try:
+        key = key_from_url(reference_image)
+        if key:
+            # Our own storage: read with credentials (works for private buckets)
+            print(f"[FAL Storage] Downloading from storage: {key[:50]}...")
+            img_bytes = download_bytes(key)
+        else:
+            # Not in our storage, download via HTTP
+            import requests
+            print(f"[FAL Storage] Downloading via HTTP...")
+            img_response = requests.get(reference_image, timeout=30)
+            img_response.raise_for_status()
+            img_bytes = img_response.content
+    
+        # Downscale to the model's input resolution and label with the real type
+        img_bytes, mime_type = normalize_reference_image(img_bytes)
+    
+        print(f"[FAL Storage] Uploading to FAL storage ({len(img_bytes)} bytes, {mime_type})...")
+        # FAL upload expects bytes, not BytesIO
+        fal_image_url = _fal().upload(img_bytes, mime_type)
+        print(f"[FAL Storage] Uploaded: {fal_image_url[:80]}...")
+        return fal_image_url
+    except Exception as upload_error:
+        print(f"[FAL Storage] Upload failed: {upload_error}")
+        import traceback
+        traceback.print_exc()
+        # If FAL upload fails, we can't use the image - raise error
+        raise Exception(f"Failed to upload reference image to FAL storage: {upload_error}")
+
+
+def generate_fashion_frames(
+    prompt: str,
+    aspect_ratio: str = "9:16",
+    reference_image: Optional[str] = None,
+    num_images: int = 1,
+    mirror: bool = True,
+    enhance: bool = True,
+) -> List[str]:
+    """
+    Generate fashion images using FAL.ai Seedream v4
+    
+    All num_images candidates come from one Seedream call (one reference
+    upload, one prompt enhancement) and are mirrored to S3 in parallel.
+    With mirror=False the FAL URLs are returned as is; the caller must then
+    record them with workers.mirror_worker.record_mirrors.
     
     Uses:
     - Seedream v4 edit: when prompt + reference_image provided (edit mode)
@@ -96,12 +224,16 @@ def generate_fashion_frame(
         prompt: The text prompt for image generation (will be enhanced by GPT)
         aspect_ratio: Image aspect ratio ("9:16" for full height, "3:4" for portrait, etc.)
         reference_image: Reference face image URL for edit mode
+        num_images: Number of candidates (1..MAX_CANDIDATES)
+        mirror: Copy results to S3 before returning
+        enhance: GPT-enhance the prompt in edit mode (False: already enhanced)
     
     Returns:
-        URL of the generated image
+        URLs of the generated images, in the order FAL returned them
     """
-    if not FAL_API_KEY:
+    if not os.getenv("FAL_API_KEY"):
         raise ValueError("FAL_API_KEY not set in environment")
+    num_images = max(1, min(num_images, MAX_CANDIDATES))
     
     # Map aspect ratios to dimensions
     dimensions = {
@@ -120,63 +252,19 @@ def generate_fashion_frame(
             print(f"[Seedream v4 Edit] Reference image: {reference_image[:80]}...")
             print(f"[Seedream v4 Edit] Original prompt: {prompt}")
             
-            # Upload reference image to FAL storage to avoid S3 CORS issues
-            try:
-                import boto3
-                import re
-                
-                # Parse S3 URL to extract bucket and key
-                # Format: https://bucket.s3.region.amazonaws.com/key or https://bucket.s3.amazonaws.com/key
-                s3_pattern = r'https://([^.]+)\.s3\.(?:[^.]+\.)?amazonaws\.com/(.+)'
-                match = re.match(s3_pattern, reference_image)
-                
-                if match:
-                    bucket_name = match.group(1)
-                    key = match.group(2)
-                    
-                    print(f"[FAL Storage] Downloading from S3: {bucket_name}/{key[:50]}...")
-                    
-                    # Use boto3 with credentials to download (works for private buckets)
-                    s3_client = boto3.client(
-                        's3',
-                        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-                        region_name=os.getenv('AWS_REGION', 'us-east-2')
-                    )
-                    
-                    response = s3_client.get_object(Bucket=bucket_name, Key=key)
-                    img_bytes = response['Body'].read()
-                else:
-                    # Not an S3 URL, download via HTTP
-                    import requests
-                    print(f"[FAL Storage] Downloading via HTTP...")
-                    img_response = requests.get(reference_image, timeout=30)
-                    img_response.raise_for_status()
-                    img_bytes = img_response.content
-                
-                print(f"[FAL Storage] Uploading to FAL storage ({len(img_bytes)} bytes)...")
-                # FAL upload expects bytes, not BytesIO
-                fal_image_url = fal_client.upload(img_bytes, "image/png")
-                print(f"[FAL Storage] Uploaded: {fal_image_url[:80]}...")
-                
-                reference_to_use = fal_image_url
-            except Exception as upload_error:
-                print(f"[FAL Storage] Upload failed: {upload_error}")
-                import traceback
-                traceback.print_exc()
-                # If FAL upload fails, we can't use the image - raise error
-                raise Exception(f"Failed to upload reference image to FAL storage: {upload_error}")
+            reference_to_use = upload_reference(reference_image)
             
             # Enhance prompt with GPT
-            enhanced_prompt = enhance_prompt_with_gpt(prompt, mode="location")
+            enhanced_prompt = enhance_prompt_with_gpt(prompt, mode="location") if enhance else prompt
             
-            result = fal_client.subscribe(
+            throttle("fal", num_images)
+            result = _fal().subscribe(
                 "fal-ai/bytedance/seedream/v4/edit",
                 arguments={
                     "prompt": enhanced_prompt,
                     "image_urls": [reference_to_use],  # Face reference (from FAL storage)
                     "image_size": size,
-                    "num_images": 1,
+                    "num_images": num_images,
                     "enable_safety_checker": False,
                     "enhance_prompt_mode": "standard"
                 }
@@ -185,32 +273,27 @@ def generate_fashion_frame(
             # TEXT-TO-IMAGE MODE: Seedream v4 text-to-image
             print(f"[Seedream v4 Text2Img] Prompt: {prompt}")
             
-            result = fal_client.subscribe(
+            throttle("fal", num_images)
+            result = _fal().subscribe(
                 "fal-ai/bytedance/seedream/v4/text-to-image",
                 arguments={
                     "prompt": prompt,
                     "image_size": size,
-                    "num_images": 1,
+                    "num_images": num_images,
                     "enable_safety_checker": False
                 }
             )
         
-        # Extract image URL from result
-        if "images" in result and len(result["images"]) > 0:
-            image_url = result["images"][0]["url"]
-            print(f"[Seedream] Success! URL: {image_url[:80]}...")
-            
-            # Try to upload to S3 for persistence (FAL URLs expire after 24h)
-            try:
-                s3_url = upload_fal_image_to_s3(image_url, f"fashion-{uuid4()}.jpg")
-                print(f"[S3] Uploaded to: {s3_url[:80]}...")
-                return s3_url
-            except Exception as s3_error:
-                print(f"[S3] Upload failed, using FAL URL: {s3_error}")
-                return image_url  # Fallback to FAL URL
-        else:
+        # Extract image URLs from result
+        images = result.get("images") or []
+        if not images:
             raise Exception(f"No image returned from FAL.ai: {result}")
+        fal_urls = [image["url"] for image in images]
+        print(f"[Seedream] Success! {len(fal_urls)} image(s): {fal_urls[0][:80]}...")
+        return mirror_fal_images(fal_urls) if mirror else fal_urls
             
+    except RateLimited:
+        raise
     except Exception as e:
         print(f"[Seedream] ERROR: {e}")
         import traceback
@@ -218,10 +301,70 @@ def generate_fashion_frame(
         raise Exception(f"Image generation failed: {str(e)}")
 
 
+def mirror_fal_images(fal_urls: List[str]) -> List[str]:
+    """
+    Copy FAL images to S3 in one batch call (FAL URLs expire after 24h).
+    An image whose upload fails keeps its FAL URL.
+    """
+    keys = [f"fashion/fashion-{uuid4()}.jpg" for _ in fal_urls]
+    results = store_urls([(key, url, "image/jpeg") for key, url in zip(keys, fal_urls)])
+
+    # Thumbnails for grids are rendered in the worker pool, off this path
+    from ..workers.derivative_worker import enqueue_derivatives
+    mirrored = []
+    for key, fal_url, result in zip(keys, fal_urls, results):
+        if isinstance(result, Exception):
+            print(f"[S3] Upload failed, using FAL URL: {result}")
+            mirrored.append(fal_url)
+        else:
+            s3_url, uploaded = result
+            print(f"[S3] {'Uploaded to' if uploaded else 'Reused'}: {s3_url[:80]}...")
+            if uploaded:
+                enqueue_derivatives(key)
+            mirrored.append(s3_url)
+    return mirrored
+
+
+def rank_candidates(image_urls: List[str], prompt: str) -> List[str]:
+    """
+    Order candidates best-first with a vision model judging prompt fit and
+    image quality. Returns the input order if ranking isn't possible.
+    """
+    if len(image_urls) < 2 or not os.getenv("OPENAI_API_KEY"):
+        return image_urls
+    content = [{
+        "type": "text",
+        "text": (
+            f"These {len(image_urls)} images were generated for the prompt:\n{prompt}\n\n"
+            "Rank them from best to worst by prompt fit, anatomy, face/outfit consistency and photo quality. "
+            f"Reply with ONLY a JSON array of image numbers (1-{len(image_urls)}), best first."
+        ),
+    }]
+    content += [{"type": "image_url", "image_url": {"url": url, "detail": "low"}} for url in image_urls]
+    try:
+        throttle("openai")
+        response = _openai_client().chat.completions.create(
+            model=os.getenv("OPENAI_RANK_MODEL", "gpt-4o-mini"),
+            messages=[{"role": "user", "content": content}],
+            max_tokens=50,
+            temperature=0,
+        )
+        text = response.choices[0].message.content
+        order = json.loads(text[text.index("["):text.rindex("]") + 1])
+        picked = [image_urls[i - 1] for i in order if isinstance(i, int) and 1 <= i <= len(image_urls)]
+        ranked = list(dict.fromkeys(picked))
+        # Anything the model left out keeps its original position at the end
+        ranked += [url for url in image_urls if url not in ranked]
+        print(f"[Rank] Order: {order}")
+        return ranked
+    except Exception as e:
+        print(f"[Rank] Ranking failed, keeping generation order: {e}")
+        return image_urls
+
+
 def upload_fal_image_to_s3(fal_url: str, filename: str) -> str:
     """
     Download image from FAL.ai temporary URL and upload to S3 for persistence
-    Uses existing storage.py utilities for consistency
     
     Args:
         fal_url: Temporary FAL.ai image URL
@@ -230,18 +373,12 @@ def upload_fal_image_to_s3(fal_url: str, filename: str) -> str:
     Returns:
         Permanent S3 URL
     """
-    import requests
-    from ..utils.storage import upload_bytes_to_s3
-    
-    # Download from FAL
-    response = requests.get(fal_url, timeout=30)
-    response.raise_for_status()
-    
-    # Upload to S3 using storage utility (handles region correctly)
-    s3_url = upload_bytes_to_s3(
-        response.content, 
-        f"fashion/{filename}",
-        'image/jpeg'
-    )
+    key = f"fashion/{filename}"
+    s3_url, uploaded = store_url(fal_url, key=key, content_type="image/jpeg")
+    
+    # Thumbnails for grids are rendered in the worker pool, off this path
+    if uploaded:
+        from ..workers.derivative_worker import enqueue_derivatives
+        enqueue_derivatives(key)
     
     return s3_url
@@ -0,0 +1,139 @@
+"""
+Image processing helpers: pre-sized WebP derivatives for grids and previews,
+reference normalization before model uploads
+"""
+import io
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from .storage import key_from_url, public_url
+
+# Derivative name -> longest side in pixels
+DERIVATIVE_SIZES = {
+    "thumb": 320,   # location / outfit tiles, animation-frame grids
+    "medium": 960,  # task previews, detail panes
+}
+DERIVATIVE_QUALITY = 80
+
+# Seedream edit works from ~2K inputs; anything larger only costs upload time
+REFERENCE_MAX_SIDE = int(os.getenv("FAL_REFERENCE_MAX_SIDE", "2048"))
+REFERENCE_JPEG_QUALITY = 90
+
+_MIME_BY_FORMAT = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# Only raster formats get derivatives (previews may also be mp4/mp3)
+_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def sniff_image_format(data: bytes) -> Optional[str]:
+    """Pillow format name ("JPEG", "PNG", ...) of the leading bytes of an image, None if not an image"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        # open() only parses the header, the first chunk of the file is enough
+        with Image.open(io.BytesIO(data)) as img:
+            return img.format
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+
+def derivative_key(key: str, size_name: str) -> str:
+    """
+    Predictable key for a derivative of an uploaded object, e.g.
+    bloggers/abc.jpg -> derivatives/bloggers/abc/thumb.webp
+    """
+    stem = key.rsplit(".", 1)[0] if "." in key.rsplit("/", 1)[-1] else key
+    return f"derivatives/{stem}/{size_name}.webp"
+
+
+def has_derivatives(key: str) -> bool:
+    return key.lower().endswith(_IMAGE_EXTENSIONS) and not key.startswith("derivatives/")
+
+
+def render_derivatives(data: bytes) -> Dict[str, bytes]:
+    """Decode an image once and encode every derivative size as WebP"""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+        out = {}
+        for name, max_side in DERIVATIVE_SIZES.items():
+            variant = img.copy()
+            # thumbnail() never upscales, small originals keep their size
+            variant.thumbnail((max_side, max_side), Image.LANCZOS)
+            buf = io.BytesIO()
+            variant.save(buf, format="WEBP", quality=DERIVATIVE_QUALITY, method=4)
+            out[name] = buf.getvalue()
+        return out
+
+
+def derivative_urls(url: Optional[str]) -> Optional[Dict[str, str]]:
+    """Public derivative URLs for an image stored in our bucket, None otherwise"""
+    key = key_from_url(url)
+    if not key or not has_derivatives(key):
+        return None
+    return {name: public_url(derivative_key(key, name)) for name in DERIVATIVE_SIZES}
+
+
+def derivative_map(urls: Iterable[Optional[str]]) -> Dict[str, Dict[str, str]]:
+    """{original_url: {"thumb": ..., "medium": ...}} for every URL that has derivatives"""
+    result = {}
+    for url in urls:
+        if url and url not in result:
+            variants = derivative_urls(url)
+            if variants:
+                result[url] = variants
+    return result
+
+
+def normalize_reference_image(data: bytes, max_side: int = REFERENCE_MAX_SIDE) -> Tuple[bytes, str]:
+    """
+    Prepare a reference image for upload to the model:
+    decode, apply EXIF rotation, downscale to max_side and re-encode.
+
+    Opaque images become JPEG, images with transparency stay PNG.
+    Already small JPEG/WebP files are passed through untouched.
+
+    Returns:
+        (bytes, mime type) - original bytes with a sniffed type if decoding fails
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            src_format = img.format
+            needs_resize = max(img.size) > max_side
+            rotated = img.getexif().get(0x0112, 1) != 1  # EXIF Orientation
+            if not needs_resize and not rotated and src_format in ("JPEG", "WEBP"):
+                return data, _MIME_BY_FORMAT[src_format]
+
+            img = ImageOps.exif_transpose(img)
+            if needs_resize:
+                img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            buf = io.BytesIO()
+            if "A" in img.getbands() or img.mode == "P" and "transparency" in img.info:
+                img.convert("RGBA").save(buf, format="PNG", optimize=True)
+                mime = "image/png"
+            else:
+                img.convert("RGB").save(buf, format="JPEG", quality=REFERENCE_JPEG_QUALITY, optimize=True)
+                mime = "image/jpeg"
+    except Exception as e:
+        print(f"[Images] Could not normalize reference image: {e}")
+        return data, _sniff_mime(data)
+
+    print(f"[Images] Reference normalized: {len(data)} -> {buf.tell()} bytes ({mime})")
+    return buf.getvalue(), mime
+
+
+def _sniff_mime(data: bytes) -> str:
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
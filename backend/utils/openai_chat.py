@@ -1,38 +1,82 @@
 import os
 import json
 import urllib.request
+from typing import Iterator
 
+from .governor import throttle
 
-def generate_text(prompt: str, max_tokens: int = 500, system_prompt: str = None) -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    if not api_key:
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant that writes concise social media scripts."
+
+
+def _chat_request(prompt: str, max_tokens: int, system_prompt: str | None, stream: bool = False) -> urllib.request.Request:
+    payload = {
+        "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        "messages": [
+            {"role": "system", "content": system_prompt or DEFAULT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.7,
+        "max_tokens": max_tokens,
+    }
+    if stream:
+        payload["stream"] = True
+    return urllib.request.Request(
+        "https://api.openai.com/v1/chat/completions",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
+        },
+        method="POST",
+    )
+
+
+def generate_text(prompt: str, max_tokens: int = 500, system_prompt: str = None, timeout: int = 30) -> str:
+    if not os.getenv("OPENAI_API_KEY"):
         return f"[AI Draft] {prompt}"
 
-    default_system = "You are a helpful assistant that writes concise social media scripts."
-    
+    throttle("openai")
     try:
-        req = urllib.request.Request(
-            "https://api.openai.com/v1/chat/completions",
-            data=json.dumps(
-                {
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": system_prompt or default_system},
-                        {"role": "user", "content": prompt},
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": max_tokens,
-                }
-            ).encode("utf-8"),
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}",
-            },
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=30) as resp:
+        req = _chat_request(prompt, max_tokens, system_prompt)
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
             payload = json.loads(resp.read().decode("utf-8"))
             return payload["choices"][0]["message"]["content"].strip()
-    except Exception:
+    except Exception as e:
+        print(f"[OpenAI] Completion failed: {e}")
         return f"[AI Draft] {prompt}"
+
+
+def stream_text(prompt: str, max_tokens: int = 500, system_prompt: str = None) -> Iterator[str]:
+    """
+    Same as generate_text but yields content deltas as the completion streams in.
+    Falls back to the draft text when there is no key. A failed or empty stream
+    raises once the deltas received so far are out, so callers can tell a
+    partial reply from a finished one and not save it.
+    """
+    if not os.getenv("OPENAI_API_KEY"):
+        yield f"[AI Draft] {prompt}"
+        return
+
+    received = False
+    throttle("openai")
+    req = _chat_request(prompt, max_tokens, system_prompt, stream=True)
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            # Server-sent events: one "data: {...}" line per chunk, "data: [DONE]" at the end
+            for raw in resp:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    received = True
+                    yield delta
+    except Exception as e:
+        print(f"[OpenAI] Stream failed: {e}")
+        raise
+    if not received:
+        raise RuntimeError("Completion stream returned no content")
@@ -1,14 +1,188 @@
+"""
+RQ helpers: enqueue (optionally idempotent), cancellation.
+
+A queued job is cancelled by removing it from the queue. A running job can't
+be interrupted safely mid-call, so cancel_job() sets a flag instead and the
+worker stops at its next check_cancelled() - between stages, never in the
+middle of a provider call.
+"""
 import os
-from rq import Queue
-from redis import Redis
+import time
+from typing import Callable, Optional, Tuple, Union
+from uuid import uuid4
+
+# How long an idempotency key holds its job id; a key whose job has finished
+# is reused earlier
+IDEMPOTENCY_TTL = 6 * 3600
+# A key younger than this whose job doesn't exist yet is being enqueued right now
+ENQUEUE_GRACE = 30
+CANCEL_TTL = 24 * 3600
+PENDING_STATUSES = ("queued", "deferred", "scheduled")
+ACTIVE_STATUSES = PENDING_STATUSES + ("started",)
+
+
+class JobCancelled(Exception):
+    """Raised by check_cancelled() in a job whose cancellation was requested"""
 
+    def __init__(self, job_id: str, meta: Optional[dict] = None):
+        super().__init__(f"Job {job_id} cancelled")
+        self.job_id = job_id
+        self.meta = meta or {}
 
-def _redis_conn() -> Redis:
+
+def _redis_conn():
+    # rq/redis are imported on first enqueue, not at API startup
+    from redis import Redis
     url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     return Redis.from_url(url)
 
 
-def enqueue(job_func, *args, **kwargs) -> str:
-    q = Queue(connection=_redis_conn())
-    job = q.enqueue(job_func, *args, **kwargs)
+def _idempotency_key(key: str) -> str:
+    return f"idempotency:{key}"
+
+
+def _cancel_key(job_id: str) -> str:
+    return f"job_cancel:{job_id}"
+
+
+def _fetch(conn, job_id: str):
+    from rq.exceptions import NoSuchJobError
+    from rq.job import Job
+    try:
+        return Job.fetch(job_id, connection=conn)
+    except NoSuchJobError:
+        return None
+
+
+def _status(job) -> Optional[str]:
+    if job is None:
+        return None
+    status = job.get_status(refresh=False)
+    return status.value if hasattr(status, "value") else status
+
+
+def job_status(job_id: str, conn=None) -> Optional[str]:
+    """RQ status of a job ("queued", "started", "finished", ...), None if expired/unknown"""
+    return _status(_fetch(conn or _redis_conn(), job_id))
+
+
+def _holds_key(conn, redis_key: str, job_id: str) -> bool:
+    """Whether job_id, stored under redis_key, is queued, running or about to be enqueued"""
+    status = job_status(job_id, conn)
+    if status in ACTIVE_STATUSES:
+        return True
+    return status is None and conn.ttl(redis_key) > IDEMPOTENCY_TTL - ENQUEUE_GRACE
+
+
+def active_job(key: str) -> Optional[str]:
+    """Id of the job holding idempotency key, None if enqueueing with it would start a new one"""
+    conn = _redis_conn()
+    redis_key = _idempotency_key(key)
+    existing = conn.get(redis_key)
+    if existing is None:
+        return None
+    existing = existing.decode()
+    return existing if _holds_key(conn, redis_key, existing) else None
+
+
+def _claim(conn, key: str, job_id: str) -> Optional[str]:
+    """Reserve key for job_id; returns the job already holding it if that one is still active"""
+    from redis import WatchError
+    redis_key = _idempotency_key(key)
+    for _ in range(3):
+        if conn.set(redis_key, job_id, nx=True, ex=IDEMPOTENCY_TTL):
+            return None
+        existing = conn.get(redis_key)
+        if existing is None:
+            continue  # Expired in between
+        existing = existing.decode()
+        if _holds_key(conn, redis_key, existing):
+            return existing
+        # Finished, failed or cancelled: take the key over unless someone else just did
+        with conn.pipeline() as pipe:
+            try:
+                pipe.watch(redis_key)
+                if pipe.get(redis_key) != existing.encode():
+                    continue
+                pipe.multi()
+                pipe.set(redis_key, job_id, ex=IDEMPOTENCY_TTL)
+                pipe.execute()
+                return None
+            except WatchError:
+                continue
+    raise RuntimeError(f"Could not claim idempotency key {key}")
+
+
+def enqueue(job_func: Union[Callable, str], *args, idempotency_key: Optional[str] = None,
+            meta: Optional[dict] = None, queue_name: str = "default", **kwargs) -> str:
+    """
+    job_func may be a dotted path ("backend.workers.image_worker.process_image")
+    so routes don't import worker modules (and their SDKs) just to enqueue.
+
+    With an idempotency_key, enqueueing again while the job holding the key is
+    still queued or running returns that job's id instead of a duplicate.
+    meta is stored on the job (rq.get_current_job().meta in the worker).
+    Workers serve queue_name "default" before the others (worker_entry.listen).
+    """
+    from rq import Queue
+    conn = _redis_conn()
+    job_id = uuid4().hex
+    if idempotency_key:
+        existing = _claim(conn, idempotency_key, job_id)
+        if existing:
+            print(f"[Queue] {idempotency_key} already queued as job {existing}")
+            return existing
+    q = Queue(queue_name, connection=conn)
+    job = q.enqueue(job_func, *args, job_id=job_id, meta=meta or {}, **kwargs)
     return job.id
+
+
+def job_info(job_id: str) -> Optional[dict]:
+    """Function, arguments, status and return value of a job; None if expired/unknown"""
+    job = _fetch(_redis_conn(), job_id)
+    if job is None:
+        return None
+    status = _status(job)
+    return {
+        "job_id": job_id,
+        "func": job.func_name,
+        "args": list(job.args),
+        "status": status,
+        "result": job.return_value() if status == "finished" else None,
+    }
+
+
+def cancel_job(job_id: str, idempotency_key: Optional[str] = None) -> Tuple[Optional[str], dict]:
+    """
+    Cancel a job: a queued one is removed, a running one is flagged to stop at
+    its next check_cancelled(). Returns the status the job had (None if
+    unknown) and its meta. The idempotency key is released once the job can
+    no longer run.
+    """
+    conn = _redis_conn()
+    job = _fetch(conn, job_id)
+    status, meta = _status(job), dict(job.meta) if job else {}
+    if status in PENDING_STATUSES:
+        job.cancel()
+    elif status == "started":
+        conn.set(_cancel_key(job_id), int(time.time()), ex=CANCEL_TTL)
+        return status, meta
+    if idempotency_key:
+        # Only our own job's key: a newer job may have claimed it meanwhile
+        redis_key = _idempotency_key(idempotency_key)
+        if conn.get(redis_key) == job_id.encode():
+            conn.delete(redis_key)
+    return status, meta
+
+
+def check_cancelled() -> None:
+    """
+    Call between stages of a job: raises JobCancelled if cancel_job() was
+    called for the current job. No-op outside RQ (e.g. a job run inline).
+    """
+    from rq import get_current_job
+    job = get_current_job()
+    if job is None:
+        return
+    if job.connection.exists(_cancel_key(job.id)):
+        raise JobCancelled(job.id, job.meta)
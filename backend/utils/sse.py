@@ -0,0 +1,7 @@
+import json
+
+
+def sse_event(data: dict, event: str | None = None) -> str:
+    """Format one server-sent event frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
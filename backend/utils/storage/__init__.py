@@ -0,0 +1,139 @@
+"""
+Object storage used by routes and workers.
+
+The backend is chosen with STORAGE_BACKEND:
+- "s3" (default): AWS S3 or any S3-compatible service (AWS_* variables)
+- "local": files under STORAGE_LOCAL_ROOT, served by /api/upload/files
+- "memory": process-local, for tests and benchmarks
+
+The module-level functions below are the API the rest of the app uses;
+get_backend() exposes the full interface (batch operations, streaming).
+"""
+import os
+import threading
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .base import (
+    Data, PutItem, StorageBackend, fetch_url, guess_content_type,
+    sign_upload_key, signing_secret, stream_url, verify_upload_key, verify_upload_policy,
+)
+from .s3 import MULTIPART_PART_SIZE, S3Backend
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def _create_backend(name: str) -> StorageBackend:
+    if name == "s3":
+        return S3Backend()
+    if name == "local":
+        from .local import LocalBackend
+        return LocalBackend()
+    if name == "memory":
+        from .local import MemoryBackend
+        return MemoryBackend()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
+
+
+def get_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend(os.getenv("STORAGE_BACKEND", "s3").lower())
+    return _backend
+
+
+def set_backend(backend: Optional[StorageBackend]) -> None:
+    """Swap the process-wide backend (tests, benchmarks); None re-reads STORAGE_BACKEND"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def is_configured() -> bool:
+    return get_backend().configured
+
+
+def public_url(key: str) -> str:
+    return get_backend().url(key)
+
+
+def key_from_url(url: Optional[str]) -> Optional[str]:
+    """Object key if url points into our storage"""
+    return get_backend().key_from_url(url)
+
+
+def upload_bytes(key: str, data: Data, content_type: Optional[str] = None) -> str:
+    return get_backend().put(key, data, content_type)
+
+
+def upload_bytes_to_s3(data: Data, key: str, content_type: Optional[str] = None) -> str:
+    """Alias for upload_bytes with reordered params for convenience"""
+    return upload_bytes(key, data, content_type)
+
+
+def upload_url_to_s3(url: str, key: str, content_type: Optional[str] = None) -> str:
+    data, remote_type = fetch_url(url)
+    return upload_bytes(key, data, content_type or remote_type or guess_content_type(url))
+
+
+def upload_stream(key: str, chunks: Iterable[bytes], content_type: Optional[str] = None) -> str:
+    """Upload an object produced piece by piece without holding it all in memory"""
+    return get_backend().put_stream(key, chunks, content_type)
+
+
+def upload_url_stream(url: str, key: str, content_type: Optional[str] = None) -> str:
+    """Copy a remote URL into storage chunk by chunk, without buffering the whole object"""
+    return upload_stream(key, stream_url(url), content_type or guess_content_type(url))
+
+
+def upload_many(items: Sequence[PutItem], return_exceptions: bool = False) -> List[Union[str, Exception]]:
+    """Concurrent upload of (key, data, content_type) items; URLs in input order"""
+    return get_backend().put_many(items, return_exceptions=return_exceptions)
+
+
+def upload_urls(items: Sequence[Tuple[str, str, Optional[str]]], return_exceptions: bool = False) -> List[Union[str, Exception]]:
+    """Concurrent copy of (key, source_url, content_type) items into storage"""
+    return get_backend().put_urls(items, return_exceptions=return_exceptions)
+
+
+def download_bytes(key: str) -> bytes:
+    return get_backend().get(key)
+
+
+def stream_object(key: str) -> Iterator[bytes]:
+    return get_backend().stream(key)
+
+
+def object_exists(key: str) -> bool:
+    return get_backend().exists(key)
+
+
+def presign_post(key: str, content_type: str, max_bytes: int, expires: int = 900) -> dict:
+    """
+    Presigned POST for a direct browser upload of a single object.
+
+    Returns:
+        {"url": ..., "fields": {...}} - send fields + file as multipart/form-data
+    """
+    return get_backend().presign_post(key, content_type, max_bytes, expires)
+
+
+def head_object(key: str) -> Optional[dict]:
+    """Size and content type of an object, None if it doesn't exist"""
+    return get_backend().head(key)
+
+
+def delete_object(key: str) -> None:
+    get_backend().delete(key)
+
+
+def list_objects(prefix: str = "") -> Iterator[dict]:
+    """{"key", "size"} for every stored object under prefix"""
+    return get_backend().iter_objects(prefix)
+
+
+def delete_objects(keys: Iterable[str]) -> None:
+    """Batched delete (one request per 1000 keys on S3)"""
+    get_backend().delete_many(keys)
@@ -0,0 +1,265 @@
+"""
+Storage backend interface shared by the S3, local-disk and in-memory backends.
+
+Payloads (`Data`) may be bytes/bytearray, a memoryview (sent without
+copying) or a binary file handle (streamed). Keys are '/'-separated paths.
+"""
+import abc
+import base64
+import hashlib
+import hmac
+import io
+import json
+import mimetypes
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+Data = Union[bytes, bytearray, memoryview, BinaryIO]
+# (key, data, content_type)
+PutItem = Tuple[str, Data, Optional[str]]
+
+# Parallel requests per batch call
+BATCH_CONCURRENCY = int(os.getenv("STORAGE_BATCH_CONCURRENCY", "8"))
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def _load_signing_secret() -> Optional[bytes]:
+    secret = os.getenv("STORAGE_SIGNING_SECRET")
+    if secret:
+        return secret.encode("utf-8")
+    aws_secret = os.getenv("AWS_SECRET_ACCESS_KEY")
+    if aws_secret:
+        # Shared by every process that can reach the bucket; a derived key, not the credential itself
+        return hmac.new(aws_secret.encode("utf-8"), b"upload-signing", hashlib.sha256).digest()
+    return None
+
+
+# Signs /upload/complete tokens and the upload policies of non-S3 backends.
+# Presign and complete may hit different processes, so it must never be random.
+_SIGNING_SECRET = _load_signing_secret()
+
+
+class ViewReader(io.RawIOBase):
+    """Seekable read-only file over a memoryview - lets SDKs stream a buffer without copying it"""
+
+    def __init__(self, view: memoryview):
+        self._view = view.cast("B") if view.format != "B" or view.ndim != 1 else view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, buffer):
+        chunk = self._view[self._pos:self._pos + len(buffer)]
+        n = len(chunk)
+        memoryview(buffer).cast("B")[:n] = chunk
+        self._pos += n
+        return n
+
+
+def as_view(data: Data) -> Optional[memoryview]:
+    """memoryview over in-memory payloads, None for file handles"""
+    if isinstance(data, memoryview):
+        return data.cast("B") if data.format != "B" or data.ndim != 1 else data
+    if isinstance(data, (bytes, bytearray)):
+        return memoryview(data)
+    return None
+
+
+def iter_chunks(data: Data, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    view = as_view(data)
+    if view is not None:
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+        return
+    while True:
+        chunk = data.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def guess_content_type(name: str, fallback: str = "application/octet-stream") -> str:
+    guess, _ = mimetypes.guess_type(name)
+    return guess or fallback
+
+
+def fetch_url(url: str, timeout: int = 120) -> Tuple[bytes, Optional[str]]:
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return resp.read(), resp.headers.get("Content-Type")
+
+
+def stream_url(url: str, timeout: int = 120, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Download url piece by piece (videos and other large media)"""
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        yield from iter_chunks(resp, chunk_size)
+
+
+class StorageBackend(abc.ABC):
+    """
+    Object storage operations used by the app. Subclasses implement the
+    single-object primitives; batch helpers run them concurrently.
+    """
+    name = "base"
+
+    # --- single-object primitives -------------------------------------------
+
+    @abc.abstractmethod
+    def put(self, key: str, data: Data, content_type: Optional[str] = None) -> str:
+        """Store an object and return its public URL"""
+
+    @abc.abstractmethod
+    def put_stream(self, key: str, chunks: Iterable[bytes], content_type: Optional[str] = None) -> str:
+        """Store an object produced piece by piece"""
+
+    @abc.abstractmethod
+    def get(self, key: str) -> bytes:
+        """Object bytes; raises FileNotFoundError (or the SDK's not-found error) if missing"""
+
+    def stream(self, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        data = self.get(key)
+        yield from iter_chunks(data, chunk_size)
+
+    @abc.abstractmethod
+    def head(self, key: str) -> Optional[dict]:
+        """{"size", "content_type"} or None if the object doesn't exist"""
+
+    def exists(self, key: str) -> bool:
+        return self.head(key) is not None
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove an object; deleting a missing key is not an error"""
+
+    @abc.abstractmethod
+    def iter_objects(self, prefix: str = "") -> Iterator[dict]:
+        """{"key", "size"} for every object under prefix"""
+
+    @abc.abstractmethod
+    def url(self, key: str) -> str:
+        """Public URL of key"""
+
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        """Reverse of url(): the object key if url points into this storage"""
+        if not url:
+            return None
+        prefix = self.url("")
+        if url.startswith(prefix) and len(url) > len(prefix):
+            return url[len(prefix):].split("?", 1)[0]
+        return None
+
+    def presign_post(self, key: str, content_type: str, max_bytes: int, expires: int = 900) -> dict:
+        """
+        Form upload for a browser: {"url", "fields"}; POST fields + file as
+        multipart/form-data. Non-S3 backends post to /api/upload/direct with
+        a signed policy (see verify_upload_policy).
+        """
+        policy = {"key": key, "content_type": content_type, "max_bytes": max_bytes, "expires": int(time.time()) + expires}
+        encoded = base64.urlsafe_b64encode(json.dumps(policy).encode("utf-8")).decode("ascii")
+        signature = hmac.new(signing_secret(), encoded.encode("ascii"), hashlib.sha256).hexdigest()
+        return {
+            "url": os.getenv("STORAGE_DIRECT_UPLOAD_URL", "http://localhost:8000/api/upload/direct"),
+            "fields": {"key": key, "Content-Type": content_type, "policy": encoded, "signature": signature},
+        }
+
+    def warm(self) -> None:
+        """Create clients/connections ahead of the first request"""
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    # --- batch operations ---------------------------------------------------
+
+    def put_many(self, items: Sequence[PutItem], return_exceptions: bool = False) -> List[Union[str, Exception]]:
+        """
+        Store several objects concurrently; URLs in input order. With
+        return_exceptions a failed item yields its exception instead of
+        failing the batch.
+        """
+        def put_one(item: PutItem):
+            key, data, content_type = item
+            try:
+                return self.put(key, data, content_type)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+        return self._map(put_one, items)
+
+    def put_urls(self, items: Sequence[Tuple[str, str, Optional[str]]], return_exceptions: bool = False) -> List[Union[str, Exception]]:
+        """Copy remote URLs into storage concurrently: items are (key, source_url, content_type)"""
+        def copy_one(item):
+            key, source_url, content_type = item
+            try:
+                data, remote_type = fetch_url(source_url)
+                return self.put(key, data, content_type or remote_type or guess_content_type(source_url))
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+        return self._map(copy_one, items)
+
+    def get_many(self, keys: Sequence[str]) -> List[bytes]:
+        return self._map(self.get, keys)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        self._map(self.delete, list(keys))
+
+    def _map(self, func, items: Sequence) -> list:
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(items))) as pool:
+            return list(pool.map(func, items))
+
+
+def signing_secret() -> bytes:
+    """Upload signing key; raises RuntimeError if neither STORAGE_SIGNING_SECRET nor AWS_SECRET_ACCESS_KEY is set"""
+    if _SIGNING_SECRET is None:
+        raise RuntimeError("STORAGE_SIGNING_SECRET is not set; upload tokens must verify on every API process")
+    return _SIGNING_SECRET
+
+
+def verify_upload_policy(encoded: str, signature: str) -> dict:
+    """Decode a policy issued by StorageBackend.presign_post; raises ValueError if forged or expired"""
+    expected = hmac.new(signing_secret(), encoded.encode("ascii"), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature):
+        raise ValueError("Invalid upload signature")
+    policy = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+    if policy["expires"] < time.time():
+        raise ValueError("Upload policy expired")
+    return policy
+
+
+def sign_upload_key(key: str, expires: int = 900) -> str:
+    """Token proving key was issued by this API; /upload/complete requires it"""
+    deadline = int(time.time()) + expires
+    signature = hmac.new(signing_secret(), f"{key}:{deadline}".encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{deadline}.{signature}"
+
+
+def verify_upload_key(key: str, token: str) -> None:
+    """Raises ValueError unless token was issued by sign_upload_key for key and hasn't expired"""
+    deadline, _, signature = token.partition(".")
+    if not deadline.isdigit():
+        raise ValueError("Invalid upload token")
+    expected = hmac.new(signing_secret(), f"{key}:{deadline}".encode("utf-8"), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature):
+        raise ValueError("Invalid upload token")
+    if int(deadline) < time.time():
+        raise ValueError("Upload token expired")
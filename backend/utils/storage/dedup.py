@@ -0,0 +1,209 @@
+"""
+Content-hash upload deduplication.
+
+stored_objects maps the sha256 of every object uploaded through here to its
+key. Uploading bytes that are already stored (and whose object still exists)
+returns the existing URL without sending anything.
+
+Because one URL may end up on several tasks, the keys written by
+store_bytes() must be immutable: either content-derived (prefix=..., the
+default) or unique per upload (uuid keys). Never pass it a fixed key that is
+later overwritten. Fixed per-task keys (previews/task-<id>.*) go through
+store_stream() instead, which skips rewriting identical bytes and forgets the
+key's previous digest when it does overwrite.
+"""
+import hashlib
+import mimetypes
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ...db import models
+from ...db.connection import engine
+from . import get_backend
+from .base import BATCH_CONCURRENCY, fetch_url, guess_content_type
+
+# store_stream() keeps objects up to this size in memory, larger ones (videos) spill to disk
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+# mimetypes picks odd extensions for some common types
+_EXTENSIONS = {"image/jpeg": ".jpg", "audio/mpeg": ".mp3", "video/mp4": ".mp4"}
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_key(prefix: str, digest: str, content_type: Optional[str] = None) -> str:
+    """Key derived from the content, e.g. previews/<sha256>.jpg"""
+    ext = ""
+    if content_type:
+        ext = _EXTENSIONS.get(content_type) or mimetypes.guess_extension(content_type) or ""
+    return f"{prefix.rstrip('/')}/{digest}{ext}"
+
+
+def _lookup(digest: str) -> Optional[str]:
+    """Key already holding these bytes, None if unknown or gone from storage"""
+    try:
+        with Session(engine) as s:
+            row = s.get(models.StoredObject, digest)
+            if row is None:
+                return None
+            if get_backend().exists(row.key):
+                return row.key
+            # Deleted behind the index's back - forget it and upload again
+            s.delete(row)
+            s.commit()
+    except SQLAlchemyError as e:
+        print(f"[Dedup] Index lookup failed, uploading: {e}")
+    return None
+
+
+def indexed_keys(keys: Iterable[str]) -> set:
+    """The keys among these that the index knows, in one query"""
+    keys = list(keys)
+    if not keys:
+        return set()
+    try:
+        with Session(engine) as s:
+            return {
+                key for (key,) in s.query(models.StoredObject.key).filter(models.StoredObject.key.in_(keys))
+            }
+    except SQLAlchemyError as e:
+        print(f"[Dedup] Index lookup failed: {e}")
+        return set()
+
+
+def index_object(digest: str, key: str, size: int, content_type: Optional[str]) -> None:
+    """Record that key holds the bytes with this sha256"""
+    try:
+        with Session(engine) as s:
+            s.add(models.StoredObject(sha256=digest, key=key, size=size, content_type=content_type))
+            s.commit()
+    except IntegrityError:
+        # Same bytes uploaded concurrently under another key; both objects stay valid
+        pass
+    except SQLAlchemyError as e:
+        print(f"[Dedup] Failed to index {key}: {e}")
+
+
+def store_bytes(
+    data: bytes,
+    key: Optional[str] = None,
+    prefix: str = "objects",
+    content_type: Optional[str] = None,
+) -> Tuple[str, bool]:
+    """
+    Upload data unless identical bytes are already stored.
+
+    Args:
+        data: Object contents
+        key: Key for a new object (must be unique); defaults to content_key(prefix, ...)
+        prefix: Folder for content-derived keys
+        content_type: MIME type of the object
+
+    Returns:
+        (url, uploaded) - uploaded is False when an existing object was reused
+    """
+    digest = sha256_hex(data)
+    backend = get_backend()
+
+    existing = _lookup(digest)
+    if existing:
+        print(f"[Dedup] {len(data)} bytes already stored at {existing}")
+        return backend.url(existing), False
+
+    if key is None:
+        key = content_key(prefix, digest, content_type)
+        # Content-derived keys may predate the index
+        if backend.exists(key):
+            index_object(digest, key, len(data), content_type)
+            return backend.url(key), False
+
+    url = backend.put(key, data, content_type)
+    index_object(digest, key, len(data), content_type)
+    return url, True
+
+
+def store_stream(
+    chunks: Iterable[bytes],
+    key: str,
+    content_type: Optional[str] = None,
+) -> Tuple[str, bool]:
+    """
+    Write an object to a fixed key that is overwritten on regeneration.
+
+    The chunks are hashed while they are spooled to a temporary file, so
+    large objects are never held in memory. Nothing is sent when the index
+    already maps their sha256 to this key.
+
+    Returns:
+        (url, uploaded) - uploaded is False when the key already held these bytes
+    """
+    backend = get_backend()
+    hasher = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+        for chunk in chunks:
+            hasher.update(chunk)
+            size += len(chunk)
+            spool.write(chunk)
+        digest = hasher.hexdigest()
+
+        if _lookup(digest) == key:
+            print(f"[Dedup] {key} already holds these {size} bytes")
+            return backend.url(key), False
+
+        # The old bytes are about to be replaced under the same key
+        forget([key])
+        spool.seek(0)
+        url = backend.put(key, spool, content_type)
+    index_object(digest, key, size, content_type)
+    return url, True
+
+
+def store_url(
+    source_url: str,
+    key: Optional[str] = None,
+    prefix: str = "objects",
+    content_type: Optional[str] = None,
+) -> Tuple[str, bool]:
+    """Download source_url and store_bytes() it"""
+    data, remote_type = fetch_url(source_url)
+    content_type = content_type or remote_type or guess_content_type(source_url)
+    return store_bytes(data, key=key, prefix=prefix, content_type=content_type)
+
+
+def store_urls(
+    items: Sequence[Tuple[Optional[str], str, Optional[str]]],
+    prefix: str = "objects",
+) -> List[Union[Tuple[str, bool], Exception]]:
+    """
+    store_url() for (key, source_url, content_type) items concurrently.
+    A failed item yields its exception instead of failing the batch.
+    """
+    def store_one(item):
+        key, source_url, content_type = item
+        try:
+            return store_url(source_url, key=key, prefix=prefix, content_type=content_type)
+        except Exception as e:
+            return e
+
+    items = list(items)
+    if len(items) <= 1:
+        return [store_one(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(items))) as pool:
+        return list(pool.map(store_one, items))
+
+
+def forget(keys: Iterable[str]) -> None:
+    """Drop index entries for deleted objects"""
+    keys = list(keys)
+    if not keys:
+        return
+    with Session(engine) as s:
+        s.query(models.StoredObject).filter(models.StoredObject.key.in_(keys)).delete(synchronize_session=False)
+        s.commit()
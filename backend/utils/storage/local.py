@@ -0,0 +1,138 @@
+"""
+Local-disk and in-memory storage backends for development, tests and
+benchmarks (no network). Objects are served by GET /api/upload/files/{key}.
+"""
+import os
+import tempfile
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from .base import STREAM_CHUNK_SIZE, Data, StorageBackend, as_view, guess_content_type, iter_chunks
+
+DEFAULT_PUBLIC_BASE = "http://localhost:8000/api/upload/files"
+
+
+def _check_key(key: str) -> str:
+    if not key or key.startswith("/") or ".." in key.split("/"):
+        raise ValueError(f"Invalid storage key: {key!r}")
+    return key
+
+
+class LocalBackend(StorageBackend):
+    """Objects as files under root; writes are atomic (temp file + rename)"""
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None, public_base: Optional[str] = None):
+        self.root = os.path.abspath(root or os.getenv("STORAGE_LOCAL_ROOT", "./local_storage"))
+        self.public_base = (public_base or os.getenv("STORAGE_PUBLIC_BASE", DEFAULT_PUBLIC_BASE)).rstrip("/")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *_check_key(key).split("/"))
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base}/{key}"
+
+    def _write(self, key: str, chunks: Iterable[bytes]) -> str:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return self.url(key)
+
+    def put(self, key: str, data: Data, content_type: Optional[str] = None) -> str:
+        view = as_view(data)
+        # Buffers are written in one call, file handles copied in chunks
+        return self._write(key, [view] if view is not None else iter_chunks(data))
+
+    def put_stream(self, key: str, chunks: Iterable[bytes], content_type: Optional[str] = None) -> str:
+        return self._write(key, chunks)
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def stream(self, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            yield from iter_chunks(f, chunk_size)
+
+    def head(self, key: str) -> Optional[dict]:
+        try:
+            size = os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            return None
+        # Content type isn't stored; derived from the extension
+        return {"size": size, "content_type": guess_content_type(key)}
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_objects(self, prefix: str = "") -> Iterator[dict]:
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith(".upload-"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    yield {"key": key, "size": os.path.getsize(path)}
+
+
+class MemoryBackend(StorageBackend):
+    """Process-local dict of objects; contents are lost on restart"""
+    name = "memory"
+
+    def __init__(self, public_base: Optional[str] = None):
+        self.public_base = (public_base or os.getenv("STORAGE_PUBLIC_BASE", DEFAULT_PUBLIC_BASE)).rstrip("/")
+        self._objects: Dict[str, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base}/{key}"
+
+    def put(self, key: str, data: Data, content_type: Optional[str] = None) -> str:
+        view = as_view(data)
+        blob = view.tobytes() if view is not None else b"".join(iter_chunks(data))
+        with self._lock:
+            self._objects[_check_key(key)] = (blob, content_type or guess_content_type(key))
+        return self.url(key)
+
+    def put_stream(self, key: str, chunks: Iterable[bytes], content_type: Optional[str] = None) -> str:
+        return self.put(key, b"".join(chunks), content_type)
+
+    def get(self, key: str) -> bytes:
+        with self._lock:
+            entry = self._objects.get(key)
+        if entry is None:
+            raise FileNotFoundError(key)
+        return entry[0]
+
+    def head(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._objects.get(key)
+        if entry is None:
+            return None
+        return {"size": len(entry[0]), "content_type": entry[1]}
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._objects.pop(key, None)
+
+    def iter_objects(self, prefix: str = "") -> Iterator[dict]:
+        with self._lock:
+            items = [(k, len(v[0])) for k, v in self._objects.items() if k.startswith(prefix)]
+        for key, size in sorted(items):
+            yield {"key": key, "size": size}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._objects.clear()
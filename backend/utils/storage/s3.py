@@ -0,0 +1,198 @@
+"""
+S3 (and S3-compatible) storage backend.
+"""
+import os
+import threading
+from typing import Iterable, Iterator, Optional
+
+from .base import STREAM_CHUNK_SIZE, Data, StorageBackend, ViewReader, as_view
+
+# HTTP connections kept by the shared client - sized for worker threads + upload pool
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+# S3 requires every multipart part except the last to be at least 5 MiB
+MULTIPART_PART_SIZE = 5 * 1024 * 1024
+# delete_objects accepts at most this many keys per request
+DELETE_BATCH = 1000
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _s3_client():
+    """Process-wide S3 client (boto3 clients are thread-safe, sessions are not)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # boto3 takes ~0.5s to import - load it on first S3 call
+                import boto3
+                from botocore.config import Config
+                endpoint = os.getenv("AWS_S3_ENDPOINT")
+                region = os.getenv("AWS_REGION")
+                session = boto3.session.Session()
+                _client = session.client(
+                    "s3",
+                    region_name=region,
+                    endpoint_url=endpoint if endpoint else None,
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                    config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS),
+                )
+    return _client
+
+
+def _public_url(bucket: str, key: str) -> str:
+    # Allow overriding the public base URL (for custom S3-compatible providers)
+    base = os.getenv("AWS_S3_PUBLIC_BASE")
+    if base:
+        return f"{base.rstrip('/')}/{key}"
+    endpoint = os.getenv("AWS_S3_ENDPOINT")
+    region = os.getenv("AWS_REGION", "us-east-1")
+    if endpoint:
+        return f"{endpoint.rstrip('/')}/{bucket}/{key}"
+    # Default AWS URL pattern
+    return f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
+
+
+class S3Backend(StorageBackend):
+    name = "s3"
+
+    def __init__(self, bucket: Optional[str] = None):
+        self._bucket = bucket
+
+    @property
+    def bucket(self) -> str:
+        bucket = self._bucket or os.getenv("AWS_S3_BUCKET")
+        if not bucket:
+            raise RuntimeError("AWS_S3_BUCKET is not set")
+        return bucket
+
+    @property
+    def configured(self) -> bool:
+        return bool(self._bucket or os.getenv("AWS_S3_BUCKET"))
+
+    def warm(self) -> None:
+        _s3_client()
+
+    def url(self, key: str) -> str:
+        return _public_url(self.bucket, key)
+
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        if not self.configured:
+            return None
+        return super().key_from_url(url)
+
+    def put(self, key: str, data: Data, content_type: Optional[str] = None) -> str:
+        bucket = self.bucket
+        content_type = content_type or "application/octet-stream"
+        s3 = _s3_client()
+        if isinstance(data, (bytes, bytearray)):
+            # Remove ACL parameter - bucket must have public access policy or Block Public Access disabled
+            s3.put_object(Bucket=bucket, Key=key, Body=data, ContentType=content_type)
+        else:
+            # memoryviews and file handles are streamed (multipart above the transfer threshold)
+            view = as_view(data)
+            body = ViewReader(view) if view is not None else data
+            s3.upload_fileobj(body, bucket, key, ExtraArgs={"ContentType": content_type})
+        return _public_url(bucket, key)
+
+    def put_stream(self, key: str, chunks: Iterable[bytes], content_type: Optional[str] = None) -> str:
+        """
+        Pieces are buffered up to one multipart part; small objects use a single PUT,
+        so the whole object is never held in memory.
+        """
+        bucket = self.bucket
+        content_type = content_type or "application/octet-stream"
+        s3 = _s3_client()
+
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                if len(buffer) >= MULTIPART_PART_SIZE:
+                    if upload_id is None:
+                        upload_id = s3.create_multipart_upload(
+                            Bucket=bucket, Key=key, ContentType=content_type
+                        )["UploadId"]
+                    part_number = len(parts) + 1
+                    resp = s3.upload_part(
+                        Bucket=bucket, Key=key, UploadId=upload_id,
+                        PartNumber=part_number, Body=bytes(buffer),
+                    )
+                    parts.append({"ETag": resp["ETag"], "PartNumber": part_number})
+                    buffer.clear()
+
+            if upload_id is None:
+                s3.put_object(Bucket=bucket, Key=key, Body=bytes(buffer), ContentType=content_type)
+                return _public_url(bucket, key)
+
+            if buffer:
+                part_number = len(parts) + 1
+                resp = s3.upload_part(
+                    Bucket=bucket, Key=key, UploadId=upload_id,
+                    PartNumber=part_number, Body=bytes(buffer),
+                )
+                parts.append({"ETag": resp["ETag"], "PartNumber": part_number})
+            s3.complete_multipart_upload(
+                Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+            return _public_url(bucket, key)
+        except Exception:
+            if upload_id is not None:
+                s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            raise
+
+    def get(self, key: str) -> bytes:
+        obj = _s3_client().get_object(Bucket=self.bucket, Key=key)
+        return obj["Body"].read()
+
+    def stream(self, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        obj = _s3_client().get_object(Bucket=self.bucket, Key=key)
+        yield from obj["Body"].iter_chunks(chunk_size)
+
+    def head(self, key: str) -> Optional[dict]:
+        s3 = _s3_client()
+        try:
+            meta = s3.head_object(Bucket=self.bucket, Key=key)
+        except s3.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {"size": meta["ContentLength"], "content_type": meta.get("ContentType")}
+
+    def delete(self, key: str) -> None:
+        _s3_client().delete_object(Bucket=self.bucket, Key=key)
+
+    def iter_objects(self, prefix: str = "") -> Iterator[dict]:
+        paginator = _s3_client().get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield {"key": obj["Key"], "size": obj["Size"]}
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """One DeleteObjects request per 1000 keys"""
+        keys = list(keys)
+        s3 = _s3_client()
+        for start in range(0, len(keys), DELETE_BATCH):
+            batch = keys[start:start + DELETE_BATCH]
+            resp = s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True},
+            )
+            for error in resp.get("Errors", []):
+                print(f"[Storage] Delete failed for {error.get('Key')}: {error.get('Message')}")
+
+    def presign_post(self, key: str, content_type: str, max_bytes: int, expires: int = 900) -> dict:
+        """Presigned POST; the policy pins the key and Content-Type and caps the size"""
+        return _s3_client().generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_bytes],
+            ],
+            ExpiresIn=expires,
+        )
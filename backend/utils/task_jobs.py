@@ -0,0 +1,76 @@
+"""
+Generation jobs for content tasks, shared by POST /api/tasks/{id}/generate and
+scheduled pre-generation (workers/pregeneration_worker.py).
+
+Jobs are enqueued by dotted path: importing the worker modules here would
+load fal_client/openai/boto3 into every API process at startup.
+"""
+from typing import Optional, Tuple
+
+from ..db import models
+from .blogger_cache import BloggerContext
+from .governor import admit
+from .queue import active_job, enqueue
+
+PROCESS_IMAGE = "backend.workers.image_worker.process_image"
+PROCESS_VIDEO = "backend.workers.video_worker.process_video"
+PROCESS_VOICE = "backend.workers.voice_worker.process_voice"
+PROCESS_FASHION_POST = "backend.workers.fashion_worker.process_fashion_post"
+
+
+def generate_key(task_id: int) -> str:
+    """Idempotency key of a task's generation job"""
+    return f"task:{task_id}:generate"
+
+
+def generation_job(task: models.ContentTask, blogger: Optional[BloggerContext]) -> Tuple[str, dict, str, int]:
+    """
+    Worker for a task by blogger type and content_type.
+
+    Returns:
+        (job path, job kwargs, governor cost kind, units)
+    """
+    ct = (task.content_type or "").lower()
+
+    # Fashion blogger with post type → fashion worker (main frame + 3 angles)
+    if blogger and blogger.type == "fashion" and ct == "post":
+        return PROCESS_FASHION_POST, {}, "fal_image", 4
+    # Video content
+    if any(k in ct for k in ["video", "reel", "short"]):
+        return PROCESS_VIDEO, {}, "fal_video", 1
+    # Voice/audio content
+    if any(k in ct for k in ["voice", "podcast", "audio"]):
+        kwargs = {"text": task.script or task.idea or "", "voice_id": blogger.voice_id if blogger else None}
+        return PROCESS_VOICE, kwargs, "elevenlabs", 1
+    # Default: image
+    return PROCESS_IMAGE, {}, "fal_image", 1
+
+
+def enqueue_generation(
+    task: models.ContentTask,
+    blogger: Optional[BloggerContext],
+    endpoint: str,
+    queue_name: str = "default",
+) -> str:
+    """
+    Admit (governor) and enqueue the task's generation job, then mark the task
+    GENERATING with the job id. A job already queued or running for the task
+    is returned as is, without charging the budget again. Raises RateLimited;
+    the caller commits.
+    """
+    existing = active_job(generate_key(task.id))
+    if existing:
+        task.job_id = existing
+        task.status = "GENERATING"
+        return existing
+    job, kwargs, cost_kind, units = generation_job(task, blogger)
+    admit(endpoint, task.blogger_id, cost_kind, units)
+    # The status to go back to if the job is cancelled
+    previous = task.status if task.status != "GENERATING" else "DRAFT"
+    job_id = enqueue(
+        job, task.id, idempotency_key=generate_key(task.id), meta={"previous_status": previous},
+        queue_name=queue_name, **kwargs
+    )
+    task.job_id = job_id
+    task.status = "GENERATING"  # Worker will update to REVIEW when done
+    return job_id
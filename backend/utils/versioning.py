@@ -0,0 +1,110 @@
+"""
+Delta-compressed TaskVersion storage.
+
+Each (task_id, kind) history is a chain: a full snapshot followed by deltas,
+each against the previous version. A new snapshot is written every
+SNAPSHOT_EVERY versions, or when the delta would not be much smaller than
+the text itself, so rebuilding any version replays at most SNAPSHOT_EVERY - 1
+deltas.
+
+Delta format (JSON list): [start, end] copies base[start:end], a string is
+inserted verbatim.
+"""
+import difflib
+import json
+import re
+from typing import List, Optional, Union
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..db import models
+
+SNAPSHOT_EVERY = 20
+# Store a snapshot instead when the delta is larger than this share of the text
+MAX_DELTA_RATIO = 0.5
+
+_TOKEN = re.compile(r"\s+|\w+|[^\w\s]", re.UNICODE)
+
+Op = Union[List[int], str]
+
+
+def make_delta(old: str, new: str) -> List[Op]:
+    """Word-level diff of new against old (char-level diffs are too slow for long scripts)"""
+    old_tokens = _TOKEN.findall(old)
+    new_tokens = _TOKEN.findall(new)
+    # Char offset of every old token boundary
+    offsets = [0]
+    for token in old_tokens:
+        offsets.append(offsets[-1] + len(token))
+
+    ops: List[Op] = []
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([offsets[i1], offsets[i2]])
+        elif tag in ("replace", "insert"):
+            ops.append("".join(new_tokens[j1:j2]))
+    return ops
+
+
+def apply_delta(old: str, ops: List[Op]) -> str:
+    return "".join(old[op[0]:op[1]] if isinstance(op, list) else op for op in ops)
+
+
+def version_content(db: Session, version: models.TaskVersion) -> str:
+    """Rebuild the full text of a version from its nearest snapshot"""
+    if version.delta is None:
+        return version.content or ""
+
+    V = models.TaskVersion
+    snapshot_id = (
+        db.query(func.max(V.id))
+        .filter(V.task_id == version.task_id, V.kind == version.kind, V.id < version.id, V.delta.is_(None))
+        .scalar()
+    )
+    chain = (
+        db.query(V)
+        .filter(V.task_id == version.task_id, V.kind == version.kind, V.id >= snapshot_id, V.id <= version.id)
+        .order_by(V.id.asc())
+        .all()
+    )
+    text = chain[0].content or ""
+    for v in chain[1:]:
+        text = apply_delta(text, json.loads(v.delta))
+    return text
+
+
+def latest_version(db: Session, task_id: int, kind: str) -> Optional[models.TaskVersion]:
+    V = models.TaskVersion
+    return db.query(V).filter(V.task_id == task_id, V.kind == kind).order_by(V.id.desc()).first()
+
+
+def save_version(db: Session, task_id: int, kind: str, content: str) -> models.TaskVersion:
+    """
+    Append a version, stored as a delta when that is worthwhile.
+    Saving text identical to the latest version returns the latest version.
+    Caller commits.
+    """
+    # Concurrent saves (assistant stream + manual save) would both diff against
+    # the same latest version; the task row lock serializes them until commit
+    db.query(models.ContentTask.id).filter(models.ContentTask.id == task_id).with_for_update().first()
+    latest = latest_version(db, task_id, kind)
+    version = models.TaskVersion(task_id=task_id, kind=kind, size=len(content), depth=0)
+
+    if latest is not None:
+        base = version_content(db, latest)
+        if base == content:
+            return latest
+        depth = (latest.depth or 0) + 1
+        if depth < SNAPSHOT_EVERY:
+            delta = json.dumps(make_delta(base, content), ensure_ascii=False, separators=(",", ":"))
+            if len(delta) <= len(content) * MAX_DELTA_RATIO:
+                version.delta = delta
+                version.depth = depth
+
+    if version.delta is None:
+        version.content = content
+    db.add(version)
+    db.flush()
+    return version
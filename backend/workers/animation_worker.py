@@ -0,0 +1,111 @@
+"""
+Animation frame set worker - a podcaster's emotion frames from one base image
+
+One job per set instead of one request per frame: the base image is uploaded
+to FAL once, all prompts are enhanced in one GPT call, the frames are
+generated concurrently (paced by the governor) and mirrored to S3 in one
+batch, and the results are written to Blogger.animation_frames in a single
+transaction.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..db.connection import engine
+from ..db import models
+from ..utils.blogger_cache import get_blogger_context
+from ..utils.image_generation import (
+    enhance_frame_prompts,
+    generate_fashion_frame,
+    mirror_fal_images,
+    upload_reference,
+)
+from ..utils.queue import JobCancelled, check_cancelled
+
+ANIMATION_CONCURRENCY = int(os.getenv("ANIMATION_CONCURRENCY", "4"))
+# Same aspect ratio as the base location
+FRAME_ASPECT_RATIO = "3:4"
+
+
+def process_animation_frames(
+    blogger_id: int,
+    base_image: str,
+    frames: List[dict],
+    base_location_id: Optional[str] = None,
+):
+    """
+    Generate one frame per item of frames ({"prompt": ..., "emotion": ...})
+    from base_image and append them to the blogger's frames. Frames that fail
+    to generate or to copy to S3 are reported, the rest are saved.
+
+    Returns:
+        {"generated": [frame, ...], "failed": [{"prompt", "emotion", "error"}, ...]}
+    """
+    with Session(engine) as s:
+        blogger = get_blogger_context(s, blogger_id)
+        if not blogger or blogger.type != "podcaster":
+            return False
+
+    started = time.monotonic()
+    reference = upload_reference(base_image)
+    prompts = enhance_frame_prompts([f["prompt"] for f in frames])
+    try:
+        check_cancelled()
+    except JobCancelled:
+        print(f"[Animation] Frame set for blogger #{blogger_id} cancelled")
+        return False
+
+    def generate(prompt):
+        try:
+            return generate_fashion_frame(prompt, FRAME_ASPECT_RATIO, reference_image=reference,
+                                          mirror=False, enhance=False)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(ANIMATION_CONCURRENCY, len(prompts)))) as pool:
+        results = list(pool.map(generate, prompts))
+
+    done = [(f, url) for f, url in zip(frames, results) if not isinstance(url, Exception)]
+    failed = [
+        {"prompt": f["prompt"], "emotion": f.get("emotion"), "error": str(e)}
+        for f, e in zip(frames, results) if isinstance(e, Exception)
+    ]
+    # Blogger frames are permanent: copy to S3 now (FAL URLs expire after 24h)
+    urls = mirror_fal_images([url for _, url in done]) if done else []
+    mirrored = []
+    for (f, fal_url), url in zip(done, urls):
+        if url == fal_url:
+            # Upload failed and the FAL URL was kept - it would break within a day
+            failed.append({"prompt": f["prompt"], "emotion": f.get("emotion"), "error": "S3 upload failed"})
+        else:
+            mirrored.append((f, url))
+    stamp = int(time.time() * 1000)
+    new_frames = [
+        {
+            "id": f"frame_{stamp}_{i}",
+            "base_location_id": base_location_id,
+            "prompt": f["prompt"],
+            "image_url": url,
+            "emotion": f.get("emotion"),
+        }
+        for i, (f, url) in enumerate(mirrored)
+    ]
+
+    if new_frames:
+        with Session(engine) as s:
+            # Row lock: an editor saving the blogger meanwhile must not drop the new frames
+            blogger = (
+                s.query(models.Blogger).filter(models.Blogger.id == blogger_id).with_for_update().first()
+            )
+            if blogger is None:
+                return False
+            # Appended only: replacing or removing frames is left to the blogger editor
+            blogger.animation_frames = list(blogger.animation_frames or []) + new_frames
+            s.commit()
+
+    print(f"[Animation] Blogger #{blogger_id}: {len(new_frames)} frames generated, "
+          f"{len(failed)} failed in {time.monotonic() - started:.1f}s")
+    return {"generated": new_frames, "failed": failed}
@@ -0,0 +1,224 @@
+"""
+Generated asset history and retention
+
+Every generated URL gets an append-only GeneratedAsset row (task, slot,
+prompt hash, seed, size). ContentTask.generated_images keeps only the latest
+HISTORY_KEEP URLs per slot, so the task row stays small however often a
+frame is regenerated.
+
+prune_assets (run periodically by worker_entry) removes rejected variants
+older than RETENTION_DAYS from storage in batched deletes:
+- URLs the task no longer references (trimmed history, replaced audio)
+- on APPROVED/PUBLISHED tasks, main candidates other than the approved one
+  and all but the latest frame of every other slot
+- everything generated for a deleted task
+Objects another task or a blogger still points at (the dedup index can
+hand one object to several owners) are kept.
+
+Run with: python -m backend.workers.asset_worker [--dry-run]
+"""
+import argparse
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..db.connection import engine
+from ..db import models
+
+HISTORY_KEEP = int(os.getenv("GENERATED_HISTORY_KEEP", "10"))
+RETENTION_AGE = timedelta(days=int(os.getenv("GENERATED_RETENTION_DAYS", "14")))
+# Tasks examined per run
+RETENTION_BATCH = 200
+FINAL_STATUSES = ("APPROVED", "PUBLISHED")
+
+
+def _prompt_hash(prompt: Optional[str]) -> Optional[str]:
+    if not prompt:
+        return None
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def record_asset_rows(db: Session, task_id: int, slot: str, urls: Iterable[str],
+                      prompt: Optional[str] = None, seed: Optional[int] = None) -> None:
+    """History rows only, for slots the task stores as a single value (audio, lipsync video)"""
+    digest = _prompt_hash(prompt)
+    db.add_all([
+        models.GeneratedAsset(task_id=task_id, slot=slot, url=url, prompt_hash=digest, seed=seed)
+        for url in urls
+    ])
+
+
+def record_assets(db: Session, task: models.ContentTask, slot: str, urls: List[str],
+                  prompt: Optional[str] = None, seed: Optional[int] = None, replace: bool = False) -> None:
+    """
+    Append generated URLs to task.generated_images[slot] (bounded to the latest
+    HISTORY_KEEP) and to the asset history. The caller commits.
+    """
+    record_asset_rows(db, task.id, slot, urls, prompt, seed)
+    images = dict(task.generated_images or {})
+    current = [] if replace else list(images.get(slot) or [])
+    # A batch of candidates is never split, approval may pick any of them
+    images[slot] = (current + list(urls))[-max(HISTORY_KEEP, len(urls)):]
+    task.generated_images = images
+
+
+def swap_asset_url(db: Session, task_id: int, old: str, new: str) -> None:
+    """Point history rows at the mirrored copy of a FAL result, with its size"""
+    from ..utils.storage import key_from_url
+    key = key_from_url(new)
+    stored = db.query(models.StoredObject.size).filter(models.StoredObject.key == key).first() if key else None
+    values = {"url": new, "source_url": old}
+    if stored:
+        values["size"] = stored.size
+    (
+        db.query(models.GeneratedAsset)
+        .filter(models.GeneratedAsset.task_id == task_id, models.GeneratedAsset.url == old)
+        .update(values, synchronize_session=False)
+    )
+
+
+def current_asset_url(db: Session, task_id: int, slot: str, url: str) -> Optional[str]:
+    """The URL a slot's asset is stored under now, given the FAL URL it was generated with"""
+    A = models.GeneratedAsset
+    row = (
+        db.query(A.url)
+        .filter(A.task_id == task_id, A.slot == slot, A.source_url == url)
+        .order_by(A.id.desc())
+        .first()
+    )
+    return row.url if row else None
+
+
+def _strings(value) -> Iterable[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, list):
+        for v in value:
+            yield from _strings(v)
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _strings(v)
+
+
+def _trim_history(task: models.ContentTask) -> None:
+    """Bound every slot; a finished task keeps only the frames it uses"""
+    images = dict(task.generated_images or {})
+    final = task.status in FINAL_STATUSES
+    changed = False
+    for slot, urls in images.items():
+        if not isinstance(urls, list):
+            continue
+        if final and slot == "main" and task.main_image_url in urls:
+            kept = [task.main_image_url]
+        else:
+            kept = urls[-1:] if final else urls[-HISTORY_KEEP:]
+        if kept != urls:
+            images[slot] = kept
+            changed = True
+    if changed:
+        task.generated_images = images
+
+
+def _task_urls(task: models.ContentTask) -> set:
+    return set(_strings([task.generated_images, task.prompts, task.main_image_url, task.preview_url]))
+
+
+def _referenced_elsewhere(s: Session, urls: set, pruned_ids: List[int]) -> set:
+    """URLs still used by other assets, tasks or bloggers"""
+    if not urls:
+        return set()
+    A, T, B = models.GeneratedAsset, models.ContentTask, models.Blogger
+    used = {
+        url for (url,) in s.query(A.url)
+        .filter(A.url.in_(urls), A.pruned_at.is_(None), ~A.id.in_(pruned_ids))
+    }
+    for main_url, preview_url in s.query(T.main_image_url, T.preview_url).filter(
+        (T.main_image_url.in_(urls)) | (T.preview_url.in_(urls))
+    ):
+        used.update({main_url, preview_url})
+    for row in s.query(B.image, B.face_image, B.locations, B.outfits, B.animation_frames):
+        used.update(u for u in _strings(list(row)) if u in urls)
+    return used & urls
+
+
+def _object_keys(url: str) -> List[str]:
+    from ..utils.image_processing import derivative_key, has_derivatives, DERIVATIVE_SIZES
+    from ..utils.storage import key_from_url
+    key = key_from_url(url)
+    if not key:
+        return []  # FAL or other external URL - nothing of ours to delete
+    keys = [key]
+    if has_derivatives(key):
+        keys += [derivative_key(key, name) for name in DERIVATIVE_SIZES]
+    return keys
+
+
+def prune_assets(now: Optional[datetime] = None, dry_run: bool = False) -> dict:
+    """Delete rejected variants older than RETENTION_AGE; returns counts"""
+    now = now or datetime.utcnow()
+    A, T = models.GeneratedAsset, models.ContentTask
+    with Session(engine) as s:
+        task_ids = [
+            task_id for (task_id,) in s.query(A.task_id)
+            .filter(A.pruned_at.is_(None), A.created_at <= now - RETENTION_AGE)
+            .distinct()
+            .limit(RETENTION_BATCH)
+        ]
+        if not task_ids:
+            return {"tasks": 0, "pruned": 0, "deleted_objects": 0, "bytes": 0}
+
+        # Short lock: history trimming must not race a regeneration
+        tasks = {t.id: t for t in s.query(T).filter(T.id.in_(task_ids)).with_for_update()}
+        rejected = []
+        for task_id in task_ids:
+            task = tasks.get(task_id)
+            if task:
+                _trim_history(task)
+            query = s.query(A.id, A.url, A.size).filter(
+                A.task_id == task_id, A.pruned_at.is_(None), A.created_at <= now - RETENTION_AGE
+            )
+            if task:
+                query = query.filter(~A.url.in_(_task_urls(task)))
+            rejected += query.all()
+        if dry_run:
+            s.rollback()
+        else:
+            s.commit()
+
+        rejected_ids = [a.id for a in rejected]
+        urls = {a.url for a in rejected}
+        shared = _referenced_elsewhere(s, urls, rejected_ids)
+        keys = [key for url in sorted(urls - shared) for key in _object_keys(url)]
+        result = {
+            "tasks": len(task_ids),
+            "pruned": len(rejected),
+            "deleted_objects": len(keys),
+            "bytes": sum(a.size or 0 for a in rejected if a.url not in shared),
+        }
+        if dry_run:
+            return result
+
+        if keys:
+            from ..utils.storage import delete_objects
+            from ..utils.storage.dedup import forget
+            # Unindex first so no upload is deduplicated onto an object being deleted
+            forget(keys)
+            delete_objects(keys)
+        # Marked only after the delete, so a crash in between retries it next run
+        s.query(A).filter(A.id.in_(rejected_ids)).update({"pruned_at": now}, synchronize_session=False)
+        s.commit()
+
+    if rejected:
+        print(f"[Assets] Pruned {result['pruned']} variants of {result['tasks']} tasks, "
+              f"deleted {result['deleted_objects']} objects ({result['bytes']} bytes)")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune rejected generated variants")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted")
+    args = parser.parse_args()
+    print(prune_assets(dry_run=args.dry_run))
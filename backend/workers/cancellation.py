@@ -0,0 +1,22 @@
+"""
+Shared handling of a cancelled generation job (see utils/queue.py).
+
+Workers call check_cancelled() before each paid provider call (single-call
+workers also after it, before saving the result) and hand the resulting
+JobCancelled to restore_cancelled().
+"""
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..utils.queue import JobCancelled
+
+
+def restore_cancelled(s: Session, task_id: int, cancelled: JobCancelled) -> bool:
+    """Put the task back to its pre-generation status; returns False for the job result"""
+    s.rollback()
+    task = s.get(models.ContentTask, task_id)
+    if task is None:
+        return False  # Cancelled because the task was deleted
+    task.status = cancelled.meta.get("previous_status") or "DRAFT"
+    s.commit()
+    return False
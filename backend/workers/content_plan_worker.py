@@ -0,0 +1,174 @@
+"""
+Content plan worker - drafts a calendar of ideas for a blogger in a few batched LLM calls
+"""
+import json
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..db.connection import engine
+from ..db import models
+from ..utils.content_plan import DAYS_PER_CALL
+from ..utils.openai_chat import generate_text
+from ..utils.blogger_cache import BloggerContext, get_blogger_context
+
+# Default content type per blogger type (matches what trigger_generation dispatches on)
+DEFAULT_CONTENT_TYPES = {"fashion": "post", "podcaster": "podcast"}
+
+# Output tokens budgeted per planned date
+TOKENS_PER_DAY = 120
+# A batch reply is ~1200 tokens; generate_text's 30s default cuts it off
+PLAN_TIMEOUT = 90
+# Ideas whose word sets overlap at least this much are treated as duplicates
+SIMILARITY_THRESHOLD = 0.6
+# Existing ideas quoted in the prompt so the model steers away from them
+MAX_EXISTING_IN_PROMPT = 40
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str) -> frozenset:
+    return frozenset(w for w in _WORD.findall(text.lower()) if len(w) > 2)
+
+
+class IdeaIndex:
+    """
+    Inverted index over idea word sets for near-duplicate detection.
+    Only ideas sharing at least one word are compared (Jaccard similarity).
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._sets: List[frozenset] = []
+        self._postings = defaultdict(set)
+
+    def add(self, text: str) -> None:
+        tokens = _tokens(text)
+        if not tokens:
+            return
+        idx = len(self._sets)
+        self._sets.append(tokens)
+        for token in tokens:
+            self._postings[token].add(idx)
+
+    def is_duplicate(self, text: str) -> bool:
+        tokens = _tokens(text)
+        if not tokens:
+            return True
+        candidates = set()
+        for token in tokens:
+            candidates |= self._postings.get(token, set())
+        for idx in candidates:
+            other = self._sets[idx]
+            if len(tokens & other) / len(tokens | other) >= self.threshold:
+                return True
+        return False
+
+
+def _parse_ideas(text: str) -> list:
+    """Pull the JSON array out of the model reply (tolerates code fences and prose)"""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return []
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return []
+    return [item for item in data if isinstance(item, dict)]
+
+
+def _plan_prompt(blogger: BloggerContext, dates: List[str], content_type: str, existing: List[str]) -> str:
+    avoid = "\n".join(f"- {idea}" for idea in existing[-MAX_EXISTING_IN_PROMPT:]) or "- (none)"
+    return f"""Plan social media content for a {blogger.type} blogger.
+
+Blogger: {blogger.name}
+Theme: {blogger.theme or 'general'}
+Tone: {blogger.tone_of_voice or 'friendly and engaging'}
+Content type: {content_type}
+
+Create exactly one distinct idea for each of these dates:
+{", ".join(dates)}
+
+Ideas already planned (do not repeat or paraphrase them):
+{avoid}
+
+Vary the topics across the period. Each idea is one or two sentences.
+Return ONLY a JSON array: [{{"date": "YYYY-MM-DD", "idea": "..."}}, ...]"""
+
+
+def process_content_plan(blogger_id: int, start_date: str, days: int = 30, content_type: Optional[str] = None):
+    """
+    Generate ideas for `days` consecutive dates starting at start_date, skip
+    near-duplicates of the blogger's existing tasks and insert the rest as
+    DRAFT tasks in a single transaction.
+    """
+    with Session(engine) as s:
+        blogger = get_blogger_context(s, blogger_id)
+        if not blogger:
+            return False
+        content_type = content_type or DEFAULT_CONTENT_TYPES.get(blogger.type, "post")
+
+        existing = [
+            idea for (idea,) in s.query(models.ContentTask.idea)
+            .filter(models.ContentTask.blogger_id == blogger_id, models.ContentTask.idea.isnot(None))
+            .order_by(models.ContentTask.date.asc())
+        ]
+        index = IdeaIndex()
+        for idea in existing:
+            index.add(idea)
+
+        first = date.fromisoformat(start_date)
+        all_dates = [(first + timedelta(days=i)).isoformat() for i in range(days)]
+
+        rows = []
+        skipped = 0
+        empty_batches = []
+        for offset in range(0, len(all_dates), DAYS_PER_CALL):
+            batch = all_dates[offset:offset + DAYS_PER_CALL]
+            print(f"[Content Plan] Blogger #{blogger_id}: planning {batch[0]}..{batch[-1]}")
+            reply = generate_text(
+                _plan_prompt(blogger, batch, content_type, existing + [r["idea"] for r in rows]),
+                max_tokens=TOKENS_PER_DAY * len(batch),
+                timeout=PLAN_TIMEOUT,
+            )
+            ideas = _parse_ideas(reply)
+            if not ideas:
+                # generate_text falls back to a draft on timeouts/errors - that's no plan
+                print(f"[Content Plan] ❌ Blogger #{blogger_id}: no ideas returned for {batch[0]}..{batch[-1]}")
+                empty_batches.append(f"{batch[0]}..{batch[-1]}")
+                continue
+            wanted = set(batch)
+            for item in ideas:
+                day = str(item.get("date", ""))
+                idea = str(item.get("idea", "")).strip()
+                if day not in wanted or not idea:
+                    continue
+                if index.is_duplicate(idea):
+                    skipped += 1
+                    continue
+                wanted.discard(day)
+                index.add(idea)
+                rows.append({
+                    "blogger_id": blogger_id,
+                    "date": day,
+                    "content_type": content_type,
+                    "idea": idea,
+                    "status": "DRAFT",
+                })
+
+        if empty_batches and not rows:
+            # Fail the job instead of finishing "successfully" with nothing planned
+            raise RuntimeError(f"Content plan for blogger #{blogger_id} returned no ideas")
+
+        # One executemany INSERT, one commit
+        if rows:
+            s.execute(insert(models.ContentTask), rows)
+        s.commit()
+
+    print(f"[Content Plan] Blogger #{blogger_id}: {len(rows)} tasks created, {skipped} duplicates skipped, "
+          f"{len(empty_batches)} batches empty")
+    return {"created": len(rows), "skipped_duplicates": skipped, "empty_batches": empty_batches}
@@ -0,0 +1,29 @@
+"""
+Derivative worker - renders thumbnail/medium WebP copies of uploaded images
+"""
+from ..utils.image_processing import derivative_key, has_derivatives, render_derivatives
+from ..utils.queue import enqueue
+from ..utils.storage import download_bytes, upload_bytes
+
+
+def process_derivatives(key: str):
+    """Download the original once and upload every derivative under its predictable key"""
+    if not has_derivatives(key):
+        return False
+    data = download_bytes(key)
+    uploaded = {}
+    for size_name, blob in render_derivatives(data).items():
+        uploaded[size_name] = upload_bytes(derivative_key(key, size_name), blob, "image/webp")
+    print(f"[Derivatives] {key}: {', '.join(uploaded)}")
+    return uploaded
+
+
+def enqueue_derivatives(key: str):
+    """Schedule derivative rendering off the request path; never fails the caller"""
+    if not has_derivatives(key):
+        return None
+    try:
+        return enqueue(process_derivatives, key)
+    except Exception as e:
+        print(f"[Derivatives] Failed to enqueue {key}: {e}")
+        return None
@@ -1,11 +1,72 @@
 """
 Fashion post generation worker - generates main frame + 3 angle variations
+
+Each frame is a checkpointed stage: its URL and prompt are committed as soon
+as it exists, and task.generation_checkpoint lists the finished stages. A rerun
+after a failure skips those stages and resumes at the one that failed, as
+long as the inputs (outfit, location) haven't changed since.
 """
+import hashlib
+import json
+
 from sqlalchemy.orm import Session
 from ..db.connection import engine
 from ..db import models
 from ..utils.image_generation import generate_fashion_frame
 from ..utils.openai_chat import generate_text
+from ..utils.blogger_cache import get_blogger_context
+from ..utils.queue import JobCancelled, check_cancelled
+from .asset_worker import record_assets
+from .cancellation import restore_cancelled
+from .mirror_worker import enqueue_mirrors, record_mirrors
+
+ANGLES = {
+    "angle1": "close-up shot focusing on upper body and face, same outfit and location",
+    "angle2": "medium shot from waist up, slightly angled to the side",
+    "angle3": "detail shot focusing on outfit accessories and styling details",
+}
+STAGES = ("main", *ANGLES)
+
+
+def _inputs_fingerprint(task: models.ContentTask) -> str:
+    raw = json.dumps([task.outfit, task.location_id, task.location_description], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _completed_stages(task: models.ContentTask, fingerprint: str) -> list:
+    """Stages finished by an interrupted earlier run with the same inputs"""
+    checkpoint = task.generation_checkpoint or {}
+    if checkpoint.get("inputs") != fingerprint:
+        return []
+    images = task.generated_images or {}
+    prompts = task.prompts or {}
+    done = []
+    # Stages build on each other, so only a finished prefix can be reused
+    for stage in STAGES:
+        if stage not in checkpoint.get("stages", []) or not images.get(stage) or not prompts.get(stage):
+            break
+        done.append(stage)
+    return done
+
+
+def _save_stage(s: Session, task: models.ContentTask, stage: str, image_url: str, prompt: str,
+                fingerprint: str, done: list) -> None:
+    """
+    Commit one finished frame together with the checkpoint (JSON columns are
+    reassigned, not mutated). The frame is still a FAL URL; its S3 copy is
+    made in the background and swapped in by the mirror worker.
+    """
+    record_assets(s, task, stage, [image_url], prompt=prompt, replace=(stage == "main"))
+    prompts = dict(task.prompts or {})
+    prompts[stage] = prompt
+    task.prompts = prompts
+    done.append(stage)
+    task.generation_checkpoint = {"inputs": fingerprint, "stages": list(done)}
+    if stage == "main":
+        task.main_image_url = image_url
+    mirror_ids = record_mirrors(s, task.id, [image_url])
+    s.commit()
+    enqueue_mirrors(mirror_ids)
 
 
 def process_fashion_post(task_id: int):
@@ -16,40 +77,54 @@ def process_fashion_post(task_id: int):
     1. Generate main frame based on location + outfit
     2. Generate 3 angle variations using main frame as reference
     3. Update task status to REVIEW
+
+    Stages already completed by an interrupted run are skipped.
     """
     with Session(engine) as s:
         task = s.query(models.ContentTask).get(task_id)
         if not task:
             return False
         
+        stage = None
         try:
             task.status = "GENERATING"
             s.commit()
             
-            blogger = s.query(models.Blogger).get(task.blogger_id)
-            if not blogger:
-                raise Exception("Blogger not found")
-            
-            # Build context for main frame
-            location = None
-            if task.location_id is not None and blogger.locations:
-                location = blogger.locations[task.location_id] if task.location_id < len(blogger.locations) else None
-            elif task.location_description:
-                location = {"description": task.location_description}
-            
-            # Extract reference image from outfit if available
-            reference_image = None
-            if task.outfit:
-                for part_key in ["top", "bottom", "shoes", "accessories"]:
-                    part_data = task.outfit.get(part_key, {})
-                    if isinstance(part_data, dict) and part_data.get("type") == "url":
-                        part_value = part_data.get("value", "")
-                        if part_value and part_value.startswith("http"):
-                            reference_image = part_value
-                            break
-            
-            # Generate main frame prompt
-            main_prompt = generate_text(f"""Create a detailed SDXL prompt for a fashion blogger main frame image.
+            fingerprint = _inputs_fingerprint(task)
+            done = _completed_stages(task, fingerprint)
+            if done:
+                print(f"[Fashion Worker] Task #{task_id}: resuming after {', '.join(done)}")
+
+            if "main" in done:
+                main_prompt = task.prompts["main"]
+                main_image_url = task.generated_images["main"][-1]
+            else:
+                stage = "main"
+                check_cancelled()
+                blogger = get_blogger_context(s, task.blogger_id)
+                if not blogger:
+                    raise Exception("Blogger not found")
+                
+                # Build context for main frame
+                location = None
+                if task.location_id is not None and blogger.locations:
+                    location = blogger.location(task.location_id)
+                elif task.location_description:
+                    location = {"description": task.location_description}
+                
+                # Extract reference image from outfit if available
+                reference_image = None
+                if task.outfit:
+                    for part_key in ["top", "bottom", "shoes", "accessories"]:
+                        part_data = task.outfit.get(part_key, {})
+                        if isinstance(part_data, dict) and part_data.get("type") == "url":
+                            part_value = part_data.get("value", "")
+                            if part_value and part_value.startswith("http"):
+                                reference_image = part_value
+                                break
+                
+                # Generate main frame prompt
+                main_prompt = generate_text(f"""Create a detailed SDXL prompt for a fashion blogger main frame image.
 
 Context:
 - Blogger: {blogger.name} ({blogger.theme})
@@ -60,35 +135,21 @@ Context:
 Generate a single detailed prompt for SDXL 4.0 that creates a full-height fashion photo.
 Include: pose, angle, lighting, mood. Keep under 200 tokens.
 Only return the prompt text, nothing else.""")
-            
-            print(f"[Fashion Worker] Generating main frame for task #{task_id}")
-            print(f"[Fashion Worker] Prompt: {main_prompt[:100]}...")
-            
-            # Generate main frame (9:16 portrait)
-            main_image_url = generate_fashion_frame(main_prompt, "9:16", reference_image=reference_image)
-            
-            # Store main frame
-            if not task.generated_images:
-                task.generated_images = {}
-            task.generated_images["main"] = [main_image_url]
-            task.main_image_url = main_image_url
-            
-            if not task.prompts:
-                task.prompts = {}
-            task.prompts["main"] = main_prompt
-            
-            s.commit()
-            print(f"[Fashion Worker] Main frame generated: {main_image_url[:80]}...")
+                
+                print(f"[Fashion Worker] Generating main frame for task #{task_id}")
+                print(f"[Fashion Worker] Prompt: {main_prompt[:100]}...")
+                
+                # Generate main frame (9:16 portrait)
+                main_image_url = generate_fashion_frame(main_prompt, "9:16", reference_image=reference_image, mirror=False)
+                _save_stage(s, task, "main", main_image_url, main_prompt, fingerprint, done)
+                print(f"[Fashion Worker] Main frame generated: {main_image_url[:80]}...")
             
             # Generate 3 angle variations using main frame as reference
-            angles = [
-                "close-up shot focusing on upper body and face, same outfit and location",
-                "medium shot from waist up, slightly angled to the side",
-                "detail shot focusing on outfit accessories and styling details"
-            ]
-            
-            for i, angle_desc in enumerate(angles, 1):
-                angle_key = f"angle{i}"
+            for i, (angle_key, angle_desc) in enumerate(ANGLES.items(), 1):
+                if angle_key in done:
+                    continue
+                stage = angle_key
+                check_cancelled()
                 
                 print(f"[Fashion Worker] Generating {angle_key}...")
                 
@@ -102,29 +163,32 @@ Keep same style, lighting, location. Only change: {angle_desc}
 Return updated prompt only.""")
                 
                 # Generate image using main frame as reference (Seedream edit mode)
-                angle_image_url = generate_fashion_frame(angle_prompt, "4:5", reference_image=main_image_url)
-                
-                # Store angle frame
-                if angle_key not in task.generated_images:
-                    task.generated_images[angle_key] = []
-                task.generated_images[angle_key].append(angle_image_url)
-                task.prompts[angle_key] = angle_prompt
-                
-                s.commit()
+                angle_image_url = generate_fashion_frame(angle_prompt, "4:5", reference_image=main_image_url, mirror=False)
+                _save_stage(s, task, angle_key, angle_image_url, angle_prompt, fingerprint, done)
                 print(f"[Fashion Worker] {angle_key} generated: {angle_image_url[:80]}...")
             
-            # Mark as ready for review
+            # Mark as ready for review; the next run starts from scratch
+            task.generation_checkpoint = None
+            prompts = dict(task.prompts or {})
+            prompts.pop("error", None)
+            prompts.pop("failed_stage", None)
+            task.prompts = prompts
             task.status = "REVIEW"
             s.commit()
             
             print(f"[Fashion Worker] Task #{task_id} complete - 4 frames generated")
             return True
             
+        except JobCancelled as e:
+            print(f"[Fashion Worker] Task #{task_id} cancelled before stage {stage}")
+            return restore_cancelled(s, task_id, e)
         except Exception as e:
-            print(f"[Fashion Worker] Error processing task #{task_id}: {e}")
+            print(f"[Fashion Worker] Error processing task #{task_id} at stage {stage}: {e}")
+            s.rollback()  # Finished stages are already committed
             task.status = "DRAFT"  # Reset to draft on error
-            if not task.prompts:
-                task.prompts = {}
-            task.prompts["error"] = str(e)
+            prompts = dict(task.prompts or {})
+            prompts["error"] = str(e)
+            prompts["failed_stage"] = stage
+            task.prompts = prompts
             s.commit()
             return False
@@ -2,7 +2,11 @@ from sqlalchemy.orm import Session
 from ..db.connection import engine
 from ..db import models
 from ..utils.fal_ai import generate_image
-from ..utils.storage import upload_url_to_s3
+from ..utils.storage import stream_url
+from ..utils.storage.dedup import store_stream
+from ..utils.queue import JobCancelled, check_cancelled
+from .cancellation import restore_cancelled
+from .derivative_worker import enqueue_derivatives
 import os
 
 
@@ -11,13 +15,22 @@ def process_image(task_id: int, prompt: str | None = None):
         task = s.query(models.ContentTask).get(task_id)
         if not task:
             return False
-        url = generate_image(prompt or task.idea or "image")
+        try:
+            check_cancelled()  # Cancel may land just as the job is picked up
+            url = generate_image(prompt or task.idea or "image")
+            check_cancelled()  # ...or while the image was generating; it is then dropped
+        except JobCancelled as e:
+            return restore_cancelled(s, task_id, e)
         # If S3 configured, mirror into bucket for consistent hosting
         if os.getenv("AWS_S3_BUCKET") and os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
-            key = f"previews/task-{task_id}.jpg"
             try:
-                s3_url = upload_url_to_s3(url, key)
-                task.preview_url = s3_url
+                # One key per task, as for voice previews: regenerating leaves no orphaned objects.
+                # Identical bytes (a retried job) are not uploaded again
+                key = f"previews/task-{task_id}.jpg"
+                task.preview_url, uploaded = store_stream(stream_url(url), key, "image/jpeg")
+                if uploaded:
+                    # The key was overwritten, so TaskOut.derivatives must be rendered again
+                    enqueue_derivatives(key)
             except Exception:
                 task.preview_url = url
         else:
@@ -0,0 +1,148 @@
+"""
+Mirror worker - copies FAL results to S3 off the generation path
+
+Generation stores the FAL URL on the task right away and records a
+PendingMirror in the same transaction. process_mirror uploads the image to
+its predetermined key, swaps the S3 URL into the task and deletes the row.
+reconcile_mirrors (run periodically by worker_entry) retries rows whose job
+was lost or failed, well before FAL's 24-hour expiry.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from uuid import uuid4
+
+from sqlalchemy.orm import Session
+
+from ..db.connection import engine
+from ..db import models
+from ..utils.queue import enqueue
+from .asset_worker import swap_asset_url
+
+PROCESS_MIRROR = "backend.workers.mirror_worker.process_mirror"
+
+FAL_URL_TTL = timedelta(hours=24)
+# Younger rows are left to the job enqueued with them
+RECONCILE_MIN_AGE = timedelta(minutes=2)
+RECONCILE_BATCH = 100
+RECONCILE_CONCURRENCY = 8
+
+
+def record_mirrors(db: Session, task_id: int, fal_urls: Iterable[str]) -> List[int]:
+    """
+    Record FAL URLs stored on a task; commit together with the URLs, then
+    pass the returned ids to enqueue_mirrors.
+    """
+    rows = [
+        models.PendingMirror(task_id=task_id, fal_url=url, s3_key=f"fashion/fashion-{uuid4()}.jpg")
+        for url in fal_urls
+    ]
+    db.add_all(rows)
+    db.flush()
+    return [row.id for row in rows]
+
+
+def enqueue_mirrors(mirror_ids: Iterable[int]) -> None:
+    """Never fails the caller - a mirror that isn't queued is picked up by the reconciler"""
+    for mirror_id in mirror_ids:
+        try:
+            enqueue(PROCESS_MIRROR, mirror_id)
+        except Exception as e:
+            print(f"[Mirror] Failed to enqueue #{mirror_id}, leaving it to the reconciler: {e}")
+
+
+def _replace_url(value, old: str, new: str):
+    if value == old:
+        return new
+    if isinstance(value, list):
+        return [_replace_url(v, old, new) for v in value]
+    if isinstance(value, dict):
+        return {k: _replace_url(v, old, new) for k, v in value.items()}
+    return value
+
+
+def _upload(row: models.PendingMirror) -> str:
+    from ..utils.storage.dedup import store_url
+    from .derivative_worker import enqueue_derivatives
+
+    s3_url, uploaded = store_url(row.fal_url, key=row.s3_key, content_type="image/jpeg")
+    # A reused object already has its derivatives
+    if uploaded:
+        enqueue_derivatives(row.s3_key)
+    return s3_url
+
+
+def process_mirror(mirror_id: int) -> Optional[str]:
+    """Copy one FAL result to S3 and point the task at it; returns the S3 URL"""
+    with Session(engine) as s:
+        # SKIP LOCKED: a queued job and the reconciler never upload the same row twice
+        row = (
+            s.query(models.PendingMirror)
+            .filter(models.PendingMirror.id == mirror_id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not row:
+            return None
+        task_id = row.task_id
+        if not s.query(models.ContentTask.id).filter(models.ContentTask.id == row.task_id).first():
+            s.delete(row)
+            s.commit()
+            return None
+
+        try:
+            s3_url = _upload(row)
+        except Exception as e:
+            row.attempts = (row.attempts or 0) + 1
+            row.last_error = str(e)[:1000]
+            s.commit()
+            print(f"[Mirror] #{mirror_id} failed (attempt {row.attempts}): {e}")
+            return None
+
+        # Lock the task only after the upload so generation writes aren't blocked by it
+        task = (
+            s.query(models.ContentTask)
+            .filter(models.ContentTask.id == task_id)
+            .with_for_update()
+            .first()
+        )
+        if task:
+            task.generated_images = _replace_url(task.generated_images, row.fal_url, s3_url)
+            swap_asset_url(s, task_id, row.fal_url, s3_url)
+            if task.main_image_url == row.fal_url:
+                task.main_image_url = s3_url
+            if task.preview_url == row.fal_url:
+                task.preview_url = s3_url
+        s.delete(row)
+        s.commit()
+        print(f"[Mirror] Task #{task_id}: {s3_url[:80]}...")
+        return s3_url
+
+
+def reconcile_mirrors(now: Optional[datetime] = None) -> dict:
+    """Retry pending mirrors whose job never ran or failed; drop the ones FAL no longer serves"""
+    now = now or datetime.utcnow()
+    M = models.PendingMirror
+    with Session(engine) as s:
+        ids = [
+            mirror_id for (mirror_id,) in s.query(M.id)
+            .filter(M.created_at <= now - RECONCILE_MIN_AGE)
+            .order_by(M.created_at.asc())
+            .limit(RECONCILE_BATCH)
+        ]
+
+    mirrored = 0
+    if ids:
+        with ThreadPoolExecutor(max_workers=RECONCILE_CONCURRENCY) as pool:
+            mirrored = sum(1 for url in pool.map(process_mirror, ids) if url)
+
+    with Session(engine) as s:
+        expired = s.query(M).filter(M.created_at <= now - FAL_URL_TTL).all()
+        for row in expired:
+            print(f"[Mirror] Giving up on #{row.id} (task #{row.task_id}), FAL URL expired: {row.last_error}")
+            s.delete(row)
+        s.commit()
+
+    if ids or expired:
+        print(f"[Mirror] Reconciled {mirrored}/{len(ids)} pending, {len(expired)} expired")
+    return {"checked": len(ids), "mirrored": mirrored, "expired": len(expired)}
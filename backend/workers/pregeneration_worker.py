@@ -0,0 +1,129 @@
+"""
+Off-peak pre-generation of upcoming calendar content
+
+During the PREGENERATE_WINDOWS off-peak hours, pregenerate (run periodically
+by worker_entry) enqueues generation for SETUP_READY tasks dated within the
+next PREGENERATE_DAYS days, nearest first, PREGENERATE_BATCH per run, so
+editors open finished drafts instead of waiting and provider load is spread
+over the night.
+
+Everything goes through the governor like an editor's click (endpoint
+"pregenerate"); a run stops at the first refusal, and once today's spend
+reaches PREGENERATE_BUDGET_SHARE of the daily budget the rest is left to
+editors. Jobs go to the "pregenerate" queue, which workers serve only when
+"default" is empty.
+
+Run with: python -m backend.workers.pregeneration_worker [--force] [--dry-run]
+"""
+import argparse
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.orm import Session, load_only
+
+from ..db.connection import engine
+from ..db import models
+from ..utils import governor
+from ..utils.blogger_cache import get_blogger_context
+from ..utils.task_jobs import enqueue_generation
+
+PREGENERATE_ENABLED = os.getenv("PREGENERATE_ENABLED", "0") == "1"
+PREGENERATE_DAYS = int(os.getenv("PREGENERATE_DAYS", "3"))
+# Comma-separated HH:MM-HH:MM local times; a window may wrap past midnight
+PREGENERATE_WINDOWS = os.getenv("PREGENERATE_WINDOWS", "01:00-06:00")
+PREGENERATE_TZ = os.getenv("PREGENERATE_TZ", "UTC")
+# Tasks enqueued per run
+PREGENERATE_BATCH = int(os.getenv("PREGENERATE_BATCH", "10"))
+PREGENERATE_BUDGET_SHARE = float(os.getenv("PREGENERATE_BUDGET_SHARE", "0.5"))
+PREGENERATE_QUEUE = "pregenerate"
+
+
+def parse_windows(spec: str) -> List[Tuple[time, time]]:
+    windows = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, end = part.split("-")
+        windows.append((time.fromisoformat(start.strip()), time.fromisoformat(end.strip())))
+    return windows
+
+
+def in_window(now: time, windows: List[Tuple[time, time]]) -> bool:
+    for start, end in windows:
+        if start <= end:
+            if start <= now < end:
+                return True
+        elif now >= start or now < end:  # e.g. 22:00-04:00
+            return True
+    return False
+
+
+def _budget_left() -> bool:
+    """Pre-generation may only use its share of today's global budget"""
+    if not governor.DAILY_BUDGET_USD:
+        return True
+    return governor.spent_today() < governor.DAILY_BUDGET_USD * PREGENERATE_BUDGET_SHARE
+
+
+def due_tasks(s: Session, today: date, days: int, limit: int) -> List[models.ContentTask]:
+    """SETUP_READY tasks dated today..today+days, nearest first, with the fields dispatch needs"""
+    T = models.ContentTask
+    return (
+        s.query(T)
+        .options(load_only(T.id, T.blogger_id, T.date, T.content_type, T.script, T.idea, T.status, T.job_id))
+        .filter(
+            T.status == "SETUP_READY",
+            # YYYY-MM-DD strings compare in date order
+            T.date >= today.isoformat(),
+            T.date <= (today + timedelta(days=days)).isoformat(),
+        )
+        .order_by(T.date.asc(), T.id.asc())
+        .limit(limit)
+        .all()
+    )
+
+
+def pregenerate(now: Optional[datetime] = None, force: bool = False, dry_run: bool = False) -> dict:
+    """Enqueue generation for due tasks if inside an off-peak window; returns counts"""
+    now = (now or datetime.now(timezone.utc)).astimezone(ZoneInfo(PREGENERATE_TZ))
+    if not force:
+        if not PREGENERATE_ENABLED:
+            return {"enqueued": 0, "skipped": "disabled"}
+        if not in_window(now.time(), parse_windows(PREGENERATE_WINDOWS)):
+            return {"enqueued": 0, "skipped": "outside off-peak window"}
+
+    enqueued, stopped = [], None
+    with Session(engine) as s:
+        tasks = due_tasks(s, now.date(), PREGENERATE_DAYS, PREGENERATE_BATCH)
+        if dry_run:
+            return {"enqueued": 0, "due": [(t.id, t.date) for t in tasks]}
+        for task in tasks:
+            if not _budget_left():
+                stopped = "pre-generation budget share used"
+                break
+            task_id = task.id
+            try:
+                blogger = get_blogger_context(s, task.blogger_id)
+                enqueue_generation(task, blogger, "pregenerate", queue_name=PREGENERATE_QUEUE)
+            except governor.RateLimited as e:
+                # Rate or budget exhausted: the remaining tasks wait for a later run
+                stopped = e.reason
+                break
+            # Committed per task: a job already queued must be recorded on its task
+            s.commit()
+            enqueued.append(task_id)
+
+    if enqueued or stopped:
+        print(f"[Pregenerate] Enqueued {len(enqueued)} tasks" + (f", stopped: {stopped}" if stopped else ""))
+    return {"enqueued": len(enqueued), "task_ids": enqueued, "stopped": stopped}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate upcoming SETUP_READY tasks")
+    parser.add_argument("--force", action="store_true", help="Run outside the off-peak windows")
+    parser.add_argument("--dry-run", action="store_true", help="List the tasks that would be generated")
+    args = parser.parse_args()
+    print(pregenerate(force=args.force, dry_run=args.dry_run))
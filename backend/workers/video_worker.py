@@ -1,26 +1,36 @@
 from sqlalchemy.orm import Session
 from ..db.connection import engine
-from ..db import models
+from ..db import queries
+from ..utils.blogger_cache import get_blogger_context
 from ..utils.fal_ai import generate_video
-from ..utils.storage import upload_url_to_s3
+from ..utils.storage import stream_url
+from ..utils.storage.dedup import store_stream
+from ..utils.queue import JobCancelled, check_cancelled
+from .cancellation import restore_cancelled
 import os
 
 
 def process_video(task_id: int, prompt: str | None = None):
     with Session(engine) as s:
-        task = s.query(models.ContentTask).get(task_id)
+        task = queries.task_for_video(s, task_id)
         if not task:
             return False
-        # Simple preset selection based on blogger type
-        btype = (task.blogger.type if task.blogger else "").lower() if task else ""
-        mode = "seedream/edit" if "fashion" in btype else "infinitalk"
-        combined_prompt = f"[{mode}] {prompt or task.idea or 'video'}"
-        url = generate_video(combined_prompt)
+        try:
+            check_cancelled()  # Cancel may land just as the job is picked up
+            # Simple preset selection based on blogger type
+            blogger = get_blogger_context(s, task.blogger_id)
+            btype = (blogger.type if blogger else "").lower()
+            mode = "seedream/edit" if "fashion" in btype else "infinitalk"
+            combined_prompt = f"[{mode}] {prompt or task.idea or 'video'}"
+            url = generate_video(combined_prompt)
+            check_cancelled()  # Cancelled during the render: don't copy or save the video
+        except JobCancelled as e:
+            return restore_cancelled(s, task_id, e)
         if os.getenv("AWS_S3_BUCKET") and os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
-            key = f"previews/task-{task_id}.mp4"
             try:
-                s3_url = upload_url_to_s3(url, key)
-                task.preview_url = s3_url
+                # Spooled to disk while hashed, not buffered; the per-task key is overwritten
+                # on regeneration unless it already holds the same video
+                task.preview_url, _ = store_stream(stream_url(url), f"previews/task-{task_id}.mp4", "video/mp4")
             except Exception:
                 task.preview_url = url
         else:
@@ -1,17 +1,202 @@
+"""
+Worker process entry point.
+
+Jobs are I/O-bound (FAL, OpenAI, ElevenLabs, S3), so instead of one forking
+RQ worker per process this runs WORKER_CONCURRENCY in-process RQ workers,
+one per thread, sharing the imported SDKs, the DB engine pool and the S3/
+OpenAI clients.
+
+Background threads run periodic maintenance, one process at a time via a
+Redis lock: the mirror reconciler every MIRROR_RECONCILE_INTERVAL seconds,
+generated-asset retention every ASSET_RETENTION_INTERVAL seconds and
+off-peak pre-generation every PREGENERATE_INTERVAL seconds.
+
+A slot whose thread dies (an exception escaping RQ's own handling, a lost
+Redis connection) is replaced by a fresh worker, so the process keeps its
+full concurrency until it is drained.
+
+SIGTERM/SIGINT drains: every slot stops taking new jobs and finishes its
+current one; after DRAIN_TIMEOUT seconds (or a second signal) the process
+exits and unfinished jobs are left to RQ's abandoned-job handling.
+"""
+import importlib
+import itertools
 import os
+import signal
+import threading
+import time
+
 from redis import Redis
-from rq import Worker, Queue, Connection
+from rq import SimpleWorker
+from rq.timeouts import TimerDeathPenalty
+
+
+# In priority order: scheduled pre-generation only runs when editors' jobs are done
+listen = ["default", "pregenerate"]
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "10"))
+DRAIN_TIMEOUT = int(os.getenv("WORKER_DRAIN_TIMEOUT", "25"))
+# How often an idle slot checks for a drain request
+POLL_INTERVAL = 5
+MIRROR_RECONCILE_INTERVAL = int(os.getenv("MIRROR_RECONCILE_INTERVAL", "300"))
+RECONCILE_LOCK = "mirror_reconciler:lock"
+ASSET_RETENTION_INTERVAL = int(os.getenv("ASSET_RETENTION_INTERVAL", "3600"))
+RETENTION_LOCK = "asset_retention:lock"
+PREGENERATE_INTERVAL = int(os.getenv("PREGENERATE_INTERVAL", "900"))
+PREGENERATE_LOCK = "pregenerate:lock"
+
+# Imported once before the slots start so no job pays the import cost
+PRELOAD_MODULES = (
+    "backend.workers.image_worker",
+    "backend.workers.video_worker",
+    "backend.workers.voice_worker",
+    "backend.workers.fashion_worker",
+    "backend.workers.derivative_worker",
+    "backend.workers.content_plan_worker",
+    "backend.workers.mirror_worker",
+    "backend.workers.asset_worker",
+    "backend.workers.pregeneration_worker",
+    "backend.workers.animation_worker",
+    "fal_client",
+    "openai",
+    "boto3",
+    "PIL.Image",
+)
+
+
+class ThreadedWorker(SimpleWorker):
+    """
+    RQ worker that runs jobs in the calling thread.
+    Signals belong to the main thread, so timeouts use a timer instead of
+    SIGALRM and stop requests come from WorkerPool.drain().
+    """
+    death_penalty_class = TimerDeathPenalty
+
+    def _install_signal_handlers(self):
+        pass
+
+    def dequeue_job_and_maintain_ttl(self, timeout, max_idle_time=None):
+        # Block in short slices so an idle slot notices a drain request
+        while not self._stop_requested:
+            result = super().dequeue_job_and_maintain_ttl(POLL_INTERVAL, max_idle_time=POLL_INTERVAL)
+            if result is not None:
+                return result
+        return None
 
+    def drain(self):
+        self._stop_requested = True
 
-listen = ["default"]
+
+_generation = itertools.count(1)
+
+
+class WorkerPool:
+    def __init__(self, conn: Redis, concurrency: int):
+        self.conn = conn
+        self.stopped = threading.Event()
+        self.workers = [None] * concurrency
+        self.threads = [None] * concurrency
+        self._draining = False
+
+    def _spawn(self, slot: int):
+        # A new name every time: RQ refuses to register a name that is still alive in Redis
+        worker = ThreadedWorker(
+            listen, connection=self.conn, name=f"{os.uname().nodename}.{os.getpid()}.{slot}.{next(_generation)}"
+        )
+        thread = threading.Thread(target=worker.work, name=worker.name, daemon=True)
+        self.workers[slot] = worker
+        self.threads[slot] = thread
+        if self._draining:
+            worker.drain()
+        thread.start()
+
+    def start(self):
+        for slot in range(len(self.workers)):
+            self._spawn(slot)
+        from .asset_worker import prune_assets
+        from .mirror_worker import reconcile_mirrors
+        from .pregeneration_worker import pregenerate
+        for name, func, lock, interval in (
+            ("mirror-reconciler", reconcile_mirrors, RECONCILE_LOCK, MIRROR_RECONCILE_INTERVAL),
+            ("asset-retention", prune_assets, RETENTION_LOCK, ASSET_RETENTION_INTERVAL),
+            ("pregeneration", pregenerate, PREGENERATE_LOCK, PREGENERATE_INTERVAL),
+        ):
+            threading.Thread(
+                target=self._periodic_loop, args=(name, func, lock, interval), name=name, daemon=True
+            ).start()
+
+    def _periodic_loop(self, name, func, lock, interval):
+        while True:
+            try:
+                # The lock lives one interval, so the fleet runs func once per interval
+                if self.conn.set(lock, os.getpid(), nx=True, ex=interval):
+                    func()
+            except Exception as e:
+                print(f"[Worker] {name} failed: {e}")
+            if self.stopped.wait(interval):
+                return
+
+    def drain(self, signum=None, frame=None):
+        if self._draining:
+            print("[Worker] Second signal, exiting without waiting for running jobs")
+            os._exit(1)
+        self._draining = True
+        self.stopped.set()
+        print(f"[Worker] Draining {len(self.workers)} slots (up to {DRAIN_TIMEOUT}s)")
+        for worker in self.workers:
+            worker.drain()
+
+    def supervise(self):
+        """Respawn slots whose thread died outside a drain."""
+        for slot, thread in enumerate(self.threads):
+            if self._draining:
+                return
+            if not thread.is_alive():
+                print(f"[Worker] Slot {thread.name} died, starting a replacement")
+                self._spawn(slot)
+
+    def wait(self):
+        deadline = None
+        while any(t.is_alive() for t in self.threads) or not self._draining:
+            if self._draining and deadline is None:
+                deadline = time.monotonic() + DRAIN_TIMEOUT
+            if deadline is not None and time.monotonic() > deadline:
+                print("[Worker] Drain timeout, exiting with jobs still running")
+                return
+            self.supervise()
+            time.sleep(0.5)
+
+
+def _preload():
+    started = time.monotonic()
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"[Worker] Preload of {name} failed: {e}")
+    try:
+        from ..utils.storage import get_backend
+        get_backend().warm()
+    except Exception as e:
+        print(f"[Worker] Storage client not created: {e}")
+    print(f"[Worker] Preloaded modules in {time.monotonic() - started:.1f}s")
 
 
 def main():
+    # Jobs queue behind provider rate limits for longer than a request could
+    from ..utils import governor
+    governor.MAX_WAIT = float(os.getenv("GOVERNOR_WORKER_MAX_WAIT", "300"))
+
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     conn = Redis.from_url(redis_url)
-    with Connection(conn):
-        worker = Worker(list(map(Queue, listen)))
-        worker.work()
+    _preload()
+
+    pool = WorkerPool(conn, WORKER_CONCURRENCY)
+    signal.signal(signal.SIGTERM, pool.drain)
+    signal.signal(signal.SIGINT, pool.drain)
+    pool.start()
+    print(f"[Worker] {WORKER_CONCURRENCY} job slots listening on {', '.join(listen)}")
+    pool.wait()
 
 
 if __name__ == "__main__":
@@ -36,26 +36,40 @@ export default function ImageUpload({ value, onChange, multiple = false, label,
           throw new Error(`Файл ${file.name} не является изображением`);
         }
 
+        // 1. Ask the API for a presigned POST (no file bytes go through the API)
+        const presignRes = await fetch(`${API_BASE}/api/upload/presign`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ filename: file.name, content_type: file.type, size: file.size }),
+        });
+        if (!presignRes.ok) {
+          const errorData = await presignRes.json().catch(() => ({}));
+          throw new Error(errorData.detail || `Upload failed: ${presignRes.status}`);
+        }
+        const { url, fields, key, token } = await presignRes.json();
+
+        // 2. Upload straight to S3
         const formData = new FormData();
+        Object.entries(fields as Record<string, string>).forEach(([k, v]) => formData.append(k, v));
         formData.append("file", file);
 
-        console.log('Uploading to:', `${API_BASE}/api/upload/image`);
-        console.log('File:', file.name, file.type, file.size);
+        const s3Res = await fetch(url, { method: "POST", body: formData });
+        if (!s3Res.ok) {
+          throw new Error(`Upload failed: ${s3Res.status}`);
+        }
 
-        const res = await fetch(`${API_BASE}/api/upload/image`, {
+        // 3. Let the API verify and register the object
+        const completeRes = await fetch(`${API_BASE}/api/upload/complete`, {
           method: "POST",
-          body: formData,
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ key, token, filename: file.name }),
         });
-
-        console.log('Response status:', res.status);
-
-        if (!res.ok) {
-          const errorData = await res.json().catch(() => ({}));
+        if (!completeRes.ok) {
+          const errorData = await completeRes.json().catch(() => ({}));
           console.error('Upload error:', errorData);
-          throw new Error(errorData.detail || `Upload failed: ${res.status}`);
+          throw new Error(errorData.detail || `Upload failed: ${completeRes.status}`);
         }
-        const data = await res.json();
-        console.log('Upload success:', data);
+        const data = await completeRes.json();
         return data.url;
       });
 
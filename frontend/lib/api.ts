@@ -28,6 +28,38 @@ async function request<T>(path: string, init?: RequestInit): Promise<T> {
   return (await res.json()) as T;
 }
 
+// POST that reads a text/event-stream body: calls onDelta per token, resolves with the "done" payload
+async function streamRequest<T>(path: string, body: unknown, onDelta: (delta: string) => void): Promise<T> {
+  const res = await fetch(`${API_BASE}${path}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+    cache: "no-store",
+  });
+  if (!res.ok || !res.body) throw new Error(`API ${res.status}`);
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let done: T | null = null;
+  while (true) {
+    const { value, done: finished } = await reader.read();
+    if (finished) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const frame = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      const event = frame.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] || "{}");
+      if (event === "done") done = data as T;
+      else if (event === "error") throw new Error(data.detail || "Stream failed");
+      else if (data.delta) onDelta(data.delta);
+    }
+  }
+  if (!done) throw new Error("Stream ended early");
+  return done;
+}
+
 export type Blogger = {
   id: number;
   name: string;
@@ -39,6 +71,8 @@ export type Blogger = {
   content_schedule?: Record<string, any> | null;
   content_types?: Record<string, any> | null;
   locations?: Array<{ title: string; description: string; thumbnail?: string }> | null;
+  // Pre-sized WebP copies keyed by original URL; may 404 until the worker renders them
+  derivatives?: Record<string, { thumb: string; medium: string }>;
 };
 
 export type Task = {
@@ -56,6 +90,7 @@ export type Task = {
   main_image_url?: string | null;
   prompts?: Record<string, any> | null;
   generated_images?: Record<string, any> | null;
+  derivatives?: Record<string, { thumb: string; medium: string }>;
 };
 
 export const api = {
@@ -97,8 +132,17 @@ export const api = {
       request<Task>(`/api/tasks/${task_id}`, { method: "PUT", body: JSON.stringify({ status }) }),
     generate: (task_id: number) => request<{ queued: boolean; task_id: number; job_id: string }>(`/api/tasks/${task_id}/generate`, { method: "POST" }),
     generateScript: (task_id: number) => request<{ ok: boolean; task_id: number; status: string; full_script?: string; voiceover_text?: string }>(`/api/tasks/${task_id}/script`, { method: "POST" }),
+    generateScriptStream: (task_id: number, onDelta: (delta: string) => void) =>
+      streamRequest<{ ok: boolean; task_id: number; status: string; full_script?: string; voiceover_text?: string }>(`/api/tasks/${task_id}/script/stream`, {}, onDelta),
     updateContent: (task_id: number, data: { idea?: string; script?: string }) => request(`/api/tasks/${task_id}/content`, { method: "PUT", body: JSON.stringify(data) }),
     delete: (task_id: number) => request<{ ok: boolean }>(`/api/tasks/${task_id}`, { method: "DELETE" }),
+    // Bulk endpoints (one request / one transaction, per-item results)
+    bulkCreate: (tasks: Array<{ blogger_id: number; date: string; content_type: string; idea?: string; status?: string }>) =>
+      request<{ results: Array<{ index: number; ok: boolean; id?: number; error?: string }>; created: number }>("/api/tasks/bulk", { method: "POST", body: JSON.stringify({ tasks }) }),
+    bulkUpdate: (items: Array<{ id: number; status?: string; date?: string }>) =>
+      request<{ results: Array<{ id: number; ok: boolean; error?: string }>; updated: number }>("/api/tasks/bulk", { method: "PATCH", body: JSON.stringify({ items }) }),
+    bulkDelete: (ids: number[]) =>
+      request<{ results: Array<{ id: number; ok: boolean; error?: string }>; deleted: number }>("/api/tasks/bulk/delete", { method: "POST", body: JSON.stringify({ ids }) }),
     // Stats
     getStats: () => request<{
       total_tasks: number;
@@ -112,10 +156,10 @@ export const api = {
     // Fashion generation endpoints
     updateFashionSetup: (task_id: number, data: { location_id?: number | null; location_description?: string | null; outfit?: Record<string, any> | null }) =>
       request<Task>(`/api/tasks/${task_id}/fashion/setup`, { method: "PATCH", body: JSON.stringify(data) }),
-    generateMainFrame: (task_id: number, data: { prompt?: string; custom_instructions?: string }) =>
-      request<{ image_url: string; prompt: string; task_id: number }>(`/api/tasks/${task_id}/fashion/generate-main-frame`, { method: "POST", body: JSON.stringify(data) }),
-    approveFrame: (task_id: number, frame_type: string) =>
-      request<{ ok: boolean; approved: string }>(`/api/tasks/${task_id}/fashion/approve-frame`, { method: "POST", body: JSON.stringify({ frame_type }) }),
+    generateMainFrame: (task_id: number, data: { prompt?: string; custom_instructions?: string; candidates?: number; rank?: boolean }) =>
+      request<{ image_url: string; candidates: string[]; prompt: string; task_id: number }>(`/api/tasks/${task_id}/fashion/generate-main-frame`, { method: "POST", body: JSON.stringify(data) }),
+    approveFrame: (task_id: number, frame_type: string, image_url?: string) =>
+      request<{ ok: boolean; approved: string }>(`/api/tasks/${task_id}/fashion/approve-frame`, { method: "POST", body: JSON.stringify({ frame_type, image_url }) }),
     generateAdditionalFrames: (task_id: number, base_prompt?: string) =>
       request<{ frames: Array<{ angle: string; image_url: string; prompt: string }>; task_id: number }>(`/api/tasks/${task_id}/fashion/generate-additional-frames`, { method: "POST", body: JSON.stringify({ base_prompt }) }),
     // Podcaster generation endpoints